@@ -0,0 +1,404 @@
+# base_de_conocimiento/cargador_reglas.py
+import json
+import logging
+import os
+import string
+import threading
+import time
+from typing import Dict, Any, List, Tuple, Callable, Optional
+
+try:
+    import tomllib  # Python 3.11+
+except ImportError:
+    try:
+        import tomli as tomllib
+    except ImportError:  # sin soporte TOML: sólo se aceptan archivos .json
+        tomllib = None
+
+from sistema_experto_conectividad.base_de_conocimiento import reglas as reglas_mod
+from sistema_experto_conectividad.base_de_conocimiento.reglas import regla
+from sistema_experto_conectividad.motor_inferencia import compilador_reglas
+
+"""
+Reglas declaradas en archivos JSON o TOML (p. ej. reglas propias de una sede), que se suman a
+base_de_conocimiento.reglas.REGLAS sin reiniciar el programa.
+Formato (JSON; en TOML es la misma estructura con [[reglas]]):
+    {"reglas": [
+        {"nombre": "dns_sede_norte",
+         "prioridad": 92,
+         "si": {"todos": [{"hecho": "conexion", "op": "verdadero"},
+                          {"hecho": "latencia_ms", "op": ">", "valor": 150}]},
+         "mensaje": "Enlace de la sede lento ({latencia_ms} ms).",
+         "accion": {"titulo": "Revisar enlace", "detalle": "Gateway {gateway_ip}", "pasos": ["..."]}}
+    ]}
+Condiciones: {"todos": [...]}, {"alguno": [...]}, {"no": {...}} o {"hecho", "op", "valor"} con
+op en verdadero, falso (medido y falso: None no cuenta), presente, ausente, ==, !=, <, <=, >, >=, en.
+Las comparaciones numéricas no se cumplen si el hecho es None.
+Cada archivo se valida y se compila a funciones (con los metadatos de reglas.regla) al cargarlo;
+el motor compilado se construye antes de activar el conjunto, que se sustituye de una vez.
+"""
+
+logger = logging.getLogger("reglas")
+
+EXTENSIONES = (".json", ".toml")
+
+class ReglaInvalida(ValueError):
+    pass
+
+_OPS_VERDAD = {
+    "verdadero": lambda v, _: bool(v),
+    "falso": lambda v, _: v is not None and not v,
+    "presente": lambda v, _: v is not None,
+    "ausente": lambda v, _: v is None,
+}
+_OPS_COMPARACION = {
+    "==": lambda v, x: v == x,
+    "!=": lambda v, x: v != x,
+    "<": lambda v, x: v < x,
+    "<=": lambda v, x: v <= x,
+    ">": lambda v, x: v > x,
+    ">=": lambda v, x: v >= x,
+    "en": lambda v, x: v in x,
+}
+
+class _Faltantes(dict):
+    # Un hecho ausente o None se muestra como '?'
+    def __missing__(self, clave):
+        return "?"
+
+    def __getitem__(self, clave):
+        v = super().__getitem__(clave)
+        return "?" if v is None else v
+
+def _campos_plantilla(plantilla: str, donde: str) -> List[str]:
+    try:
+        return [campo.split(".")[0].split("[")[0] for _, campo, _, _ in string.Formatter().parse(plantilla) if campo]
+    except ValueError as e:
+        raise ReglaInvalida(f"{donde}: plantilla inválida ({e})")
+
+def _renderizar(plantilla: str, datos: Dict[str, Any]) -> str:
+    return plantilla.format_map(_Faltantes(datos))
+
+def _compilar_condicion(cond: Any, donde: str) -> Tuple[Callable[[Dict[str, Any]], bool], set, set, bool]:
+    """
+    Devuelve (predicado, hechos leídos, hechos requeridos, sólo_verdad).
+    'requeridos' son hechos que tienen que ser no None para que la condición se cumpla;
+    'sólo_verdad' indica que sólo se mira si los hechos son verdaderos/falsos/None.
+    """
+    if not isinstance(cond, dict) or not cond:
+        raise ReglaInvalida(f"{donde}: se esperaba un objeto con la condición")
+    for clave in ("todos", "alguno"):
+        if clave in cond:
+            partes = cond[clave]
+            if len(cond) != 1 or not isinstance(partes, list) or not partes:
+                raise ReglaInvalida(f"{donde}.{clave}: se esperaba una lista no vacía de condiciones")
+            hijos = [_compilar_condicion(c, f"{donde}.{clave}[{i}]") for i, c in enumerate(partes)]
+            preds = tuple(h[0] for h in hijos)
+            hechos = set().union(*(h[1] for h in hijos))
+            verdad = all(h[3] for h in hijos)
+            if clave == "todos":
+                return (lambda d: all(p(d) for p in preds)), hechos, set().union(*(h[2] for h in hijos)), verdad
+            return (lambda d: any(p(d) for p in preds)), hechos, set.intersection(*(h[2] for h in hijos)), verdad
+    if "no" in cond:
+        if len(cond) != 1:
+            raise ReglaInvalida(f"{donde}.no: no admite otras claves")
+        pred, hechos, _, verdad = _compilar_condicion(cond["no"], f"{donde}.no")
+        return (lambda d: not pred(d)), hechos, set(), verdad
+
+    hecho, op = cond.get("hecho"), cond.get("op")
+    if not isinstance(hecho, str) or not hecho:
+        raise ReglaInvalida(f"{donde}: falta 'hecho'")
+    desconocidas = set(cond) - {"hecho", "op", "valor"}
+    if desconocidas:
+        raise ReglaInvalida(f"{donde}: claves desconocidas {sorted(desconocidas)}")
+    if op in _OPS_VERDAD:
+        if "valor" in cond:
+            raise ReglaInvalida(f"{donde}: el operador '{op}' no lleva 'valor'")
+        fn = _OPS_VERDAD[op]
+        requeridos = {hecho} if op in ("verdadero", "falso", "presente") else set()
+        return (lambda d: fn(d.get(hecho), None)), {hecho}, requeridos, True
+    if op in _OPS_COMPARACION:
+        if "valor" not in cond:
+            raise ReglaInvalida(f"{donde}: el operador '{op}' necesita 'valor'")
+        valor = cond["valor"]
+        if op == "en":
+            if not isinstance(valor, list):
+                raise ReglaInvalida(f"{donde}: 'en' necesita una lista")
+            valor = tuple(valor)
+        elif op not in ("==", "!=") and (isinstance(valor, bool) or not isinstance(valor, (int, float))):
+            raise ReglaInvalida(f"{donde}: '{op}' necesita un valor numérico")
+        fn = _OPS_COMPARACION[op]
+
+        def _comparar(d, fn=fn, valor=valor):
+            v = d.get(hecho)
+            if v is None:
+                return False
+            try:
+                return bool(fn(v, valor))
+            except TypeError:
+                return False
+        return _comparar, {hecho}, {hecho}, False
+    raise ReglaInvalida(f"{donde}: operador desconocido {op!r}")
+
+def compilar_regla(definicion: Dict[str, Any], donde: str) -> Callable[[Dict[str, Any]], Tuple[bool, str, int]]:
+    """
+    Convierte la definición de una regla en una función como las de reglas.REGLAS.
+    """
+    if not isinstance(definicion, dict):
+        raise ReglaInvalida(f"{donde}: se esperaba un objeto")
+    desconocidas = set(definicion) - {"nombre", "prioridad", "si", "mensaje", "accion"}
+    if desconocidas:
+        raise ReglaInvalida(f"{donde}: claves desconocidas {sorted(desconocidas)}")
+    nombre = definicion.get("nombre")
+    if not isinstance(nombre, str) or not nombre:
+        raise ReglaInvalida(f"{donde}: falta 'nombre'")
+    prioridad = definicion.get("prioridad")
+    if isinstance(prioridad, bool) or not isinstance(prioridad, int):
+        raise ReglaInvalida(f"{donde} ({nombre}): 'prioridad' debe ser un entero")
+    mensaje = definicion.get("mensaje")
+    if not isinstance(mensaje, str) or not mensaje:
+        raise ReglaInvalida(f"{donde} ({nombre}): falta 'mensaje'")
+    if "si" not in definicion:
+        raise ReglaInvalida(f"{donde} ({nombre}): falta la condición 'si'")
+    pred, hechos, requeridos, verdad = _compilar_condicion(definicion["si"], f"{donde}.si")
+    campos = _campos_plantilla(mensaje, f"{donde}.mensaje")
+
+    accion = definicion.get("accion")
+    if accion is not None:
+        if isinstance(accion, str):
+            accion = {"detalle": accion}
+        if not isinstance(accion, dict) or set(accion) - {"titulo", "detalle", "pasos"}:
+            raise ReglaInvalida(f"{donde}.accion: se esperaba texto o {{titulo, detalle, pasos}}")
+        pasos = accion.get("pasos", [])
+        if not isinstance(pasos, list) or not all(isinstance(p, str) for p in pasos):
+            raise ReglaInvalida(f"{donde}.accion.pasos: se esperaba una lista de textos")
+        for p in [accion.get("titulo") or "", accion.get("detalle") or ""] + pasos:
+            _campos_plantilla(p, f"{donde}.accion")
+
+    # Con un mensaje fijo y sólo condiciones de verdad, el compilador puede tabular la regla
+    @regla(hechos=tuple(sorted(hechos | set(campos))), requiere=tuple(sorted(requeridos)), tabulable=verdad and not campos)
+    def _regla(datos: Dict[str, Any]) -> Tuple[bool, str, int]:
+        if pred(datos):
+            return True, _renderizar(mensaje, datos) if campos else mensaje, prioridad
+        return False, "", 0
+
+    _regla.__name__ = nombre
+    _regla.mensaje = mensaje
+    _regla.accion = accion
+    _regla.prioridad = prioridad
+    return _regla
+
+def _leer_archivo(ruta: str) -> Dict[str, Any]:
+    if ruta.lower().endswith(".toml"):
+        if tomllib is None:
+            raise ReglaInvalida(f"{ruta}: leer TOML requiere Python 3.11+ o el paquete 'tomli'")
+        with open(ruta, "rb") as f:
+            return tomllib.load(f)
+    with open(ruta, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def _archivos(ruta: str) -> List[str]:
+    if os.path.isdir(ruta):
+        return sorted(os.path.join(ruta, n) for n in os.listdir(ruta) if n.lower().endswith(EXTENSIONES))
+    return [ruta]
+
+def firma_ruta(ruta: str) -> Tuple:
+    """
+    (nombre, mtime_ns, tamaño) de cada archivo de reglas; cambia cuando se edita alguno.
+    """
+    firma = []
+    for a in _archivos(ruta):
+        try:
+            st = os.stat(a)
+            firma.append((a, st.st_mtime_ns, st.st_size))
+        except OSError:
+            firma.append((a, None, None))
+    return tuple(firma)
+
+class ConjuntoReglas:
+    """
+    Reglas cargadas de un archivo (o directorio) junto con el motor compilado que las incluye.
+    """
+
+    def __init__(self, ruta: str, reglas: List[Callable], firma: Tuple, tiempo_carga_ms: float):
+        self.ruta = ruta
+        self.reglas = reglas
+        self.firma = firma
+        self.tiempo_carga_ms = tiempo_carga_ms
+        self.cargado_en = time.time()
+        self._lock = threading.Lock()
+        self._base: Tuple = ()
+        self._motor: Optional[compilador_reglas.MotorReglas] = None
+        self.evaluaciones = 0
+        self.tiempo_evaluacion_s = 0.0
+
+    def motor(self) -> compilador_reglas.MotorReglas:
+        """
+        Motor con REGLAS + las reglas del archivo; se recompila si REGLAS cambió.
+        """
+        motor, base = self._motor, tuple(reglas_mod.REGLAS)
+        if motor is None or self._base != base:
+            motor = compilador_reglas.compilar(base + tuple(self.reglas))
+            self._base, self._motor = base, motor
+        return motor
+
+    def evaluar(self, datos: Dict[str, Any]) -> List[compilador_reglas.Hallazgo]:
+        motor = self.motor()
+        t0 = time.perf_counter()
+        hallazgos = motor.evaluar(datos)
+        dt = time.perf_counter() - t0
+        with self._lock:
+            self.evaluaciones += 1
+            self.tiempo_evaluacion_s += dt
+        return hallazgos
+
+    def accion_para(self, mensaje: str, datos: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Paso de acción (formato de engine.generar_pasos_accion) de la regla que produjo 'mensaje'.
+        """
+        for r in self.reglas:
+            if r.accion is None:
+                continue
+            if r.mensaje == mensaje or _renderizar(r.mensaje, datos) == mensaje:
+                return {
+                    "title": _renderizar(r.accion.get("titulo") or r.__name__, datos),
+                    "detalle": _renderizar(r.accion.get("detalle") or mensaje, datos),
+                    "paso_a_paso": [_renderizar(p, datos) for p in r.accion.get("pasos", [])],
+                    "prioridad": r.prioridad,
+                }
+        return None
+
+    def estadisticas(self) -> Dict[str, Any]:
+        motor = self._motor
+        return {
+            "ruta": self.ruta,
+            "reglas": len(self.reglas),
+            "tiempo_carga_ms": round(self.tiempo_carga_ms, 3),
+            "tiempo_compilacion_motor_ms": round(motor.tiempo_compilacion_ms, 3) if motor else None,
+            "evaluaciones": self.evaluaciones,
+            "evaluacion_media_us": (round(self.tiempo_evaluacion_s / self.evaluaciones * 1e6, 2)
+                                    if self.evaluaciones else None),
+            "cargado_en": self.cargado_en,
+        }
+
+def cargar(ruta: str) -> ConjuntoReglas:
+    """
+    Lee, valida y compila las reglas de 'ruta' (archivo .json/.toml o directorio con varios).
+    Lanza ReglaInvalida (o OSError) sin tocar el conjunto activo.
+    """
+    t0 = time.perf_counter()
+    firma = firma_ruta(ruta)
+    reglas: List[Callable] = []
+    nombres = set()
+    for archivo in _archivos(ruta):
+        try:
+            contenido = _leer_archivo(archivo)
+        except (ValueError, UnicodeDecodeError) as e:
+            raise ReglaInvalida(f"{archivo}: no se pudo leer ({e})")
+        definiciones = contenido.get("reglas") if isinstance(contenido, dict) else None
+        if not isinstance(definiciones, list):
+            raise ReglaInvalida(f"{archivo}: se esperaba una lista 'reglas'")
+        for i, d in enumerate(definiciones):
+            r = compilar_regla(d, f"{os.path.basename(archivo)}:reglas[{i}]")
+            if r.__name__ in nombres:
+                raise ReglaInvalida(f"{archivo}: regla duplicada {r.__name__!r}")
+            nombres.add(r.__name__)
+            reglas.append(r)
+    conjunto = ConjuntoReglas(ruta, reglas, firma, 0.0)
+    conjunto.motor()
+    conjunto.tiempo_carga_ms = (time.perf_counter() - t0) * 1000.0
+    return conjunto
+
+_activo: Optional[ConjuntoReglas] = None
+
+def activo() -> Optional[ConjuntoReglas]:
+    return _activo
+
+def activar(ruta: str) -> ConjuntoReglas:
+    """
+    Carga 'ruta' y, si es válida, la pone en uso (sustitución atómica de la referencia).
+    """
+    global _activo
+    conjunto = cargar(ruta)
+    _activo = conjunto
+    logger.info("Reglas cargadas desde %s: %s", ruta, conjunto.estadisticas())
+    return conjunto
+
+def desactivar() -> None:
+    global _activo
+    _activo = None
+
+def motor() -> compilador_reglas.MotorReglas:
+    """
+    Motor compilado en uso: REGLAS más las reglas declaradas activas (si las hay).
+    """
+    conjunto = _activo
+    if conjunto is None:
+        return compilador_reglas.motor_para(reglas_mod.REGLAS)
+    return conjunto.motor()
+
+def evaluar(datos: Dict[str, Any]) -> List[compilador_reglas.Hallazgo]:
+    """
+    Hallazgos de REGLAS más las reglas declaradas activas (si las hay).
+    """
+    conjunto = _activo
+    if conjunto is None:
+        return compilador_reglas.motor_para(reglas_mod.REGLAS).evaluar(datos)
+    return conjunto.evaluar(datos)
+
+def accion_para(mensaje: str, datos: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    conjunto = _activo
+    return conjunto.accion_para(mensaje, datos) if conjunto is not None else None
+
+class VigilanteReglas(threading.Thread):
+    """
+    Hilo que revisa cada 'intervalo' segundos si cambió el archivo de reglas y lo recarga.
+    Si la nueva versión no es válida se registra el error y sigue activa la anterior.
+    """
+
+    def __init__(self, ruta: str, intervalo: float = 2.0):
+        super().__init__(name="vigilante-reglas", daemon=True)
+        self.ruta = ruta
+        self.intervalo = intervalo
+        self.recargas = 0
+        self.errores = 0
+        self.ultimo_error: Optional[str] = None
+        self._parar = threading.Event()
+        self._firma = _activo.firma if _activo is not None and _activo.ruta == ruta else None
+
+    def revisar(self) -> bool:
+        """
+        Recarga si la firma cambió. Devuelve True si se activó una versión nueva.
+        """
+        firma = firma_ruta(self.ruta)
+        if firma == self._firma:
+            return False
+        self._firma = firma
+        try:
+            activar(self.ruta)
+        except (ReglaInvalida, OSError) as e:
+            self.errores += 1
+            self.ultimo_error = str(e)
+            logger.error("Reglas no recargadas (%s); se mantiene la versión anterior", e)
+            return False
+        self.recargas += 1
+        return True
+
+    def run(self) -> None:
+        while not self._parar.wait(self.intervalo):
+            try:
+                self.revisar()
+            except Exception:
+                logger.exception("Error vigilando %s", self.ruta)
+
+    def detener(self) -> None:
+        self._parar.set()
+
+def vigilar(ruta: str, intervalo: float = 2.0) -> VigilanteReglas:
+    """
+    Activa las reglas de 'ruta' y arranca un hilo que las recarga cuando cambian.
+    """
+    activar(ruta)
+    vigilante = VigilanteReglas(ruta, intervalo)
+    vigilante.start()
+    return vigilante
@@ -6,35 +6,72 @@ Reglas declarativas del sistema experto.
 Contiene reglas 'simbólicas' (si-entonces) y plantillas que el motor de inferencia consume.
 """
 
+def regla(hechos: Tuple[str, ...], requiere: Tuple[str, ...] = (), tabulable: bool = True, mascara=None):
+    """
+    Decorador con los metadatos que usa el compilador de reglas (motor_inferencia.compilador_reglas):
+    - hechos: claves de 'datos' que lee la regla.
+    - requiere: hechos que deben estar presentes (no None) para que la regla pueda cumplirse.
+    - tabulable: la regla sólo depende de si cada hecho es verdadero, falso o None (y su mensaje
+      es fijo), así que puede precalcularse en una tabla de decisión. Las reglas sin decorador
+      se siguen evaluando en cada diagnóstico.
+    - mascara: versión vectorizada opcional para inferencia por lotes (motor_inferencia.inferencia_lotes).
+      Recibe las columnas numéricas (NaN = None) y devuelve un array bool que debe marcar al
+      menos todas las filas donde la regla se cumple; el mensaje lo da luego la propia regla.
+    """
+    def _decorar(fn):
+        fn.hechos = tuple(hechos)
+        fn.requiere = tuple(requiere)
+        fn.tabulable = tabulable
+        fn.mascara = mascara
+        return fn
+    return _decorar
+
+def _falso(datos: Dict[str, Any], hecho: str) -> bool:
+    # Falló de verdad: un hecho desconocido (None, p. ej. presupuesto agotado) no cuenta como fallo
+    v = datos.get(hecho)
+    return v is not None and not v
+
 # Regla simple: prioridad (mayor = primero)
 # Cada regla devuelve (match_bool, mensaje, prioridad)
+@regla(hechos=("conexion", "dns", "gateway"))
 def regla_sin_conexion(datos: Dict[str, Any]) -> Tuple[bool, str, int]:
-    if not datos.get("conexion") and not datos.get("dns") and not datos.get("gateway"):
+    if _falso(datos, "conexion") and _falso(datos, "dns") and _falso(datos, "gateway"):
         return True, "Sin conexión: posible desconexión física o adaptador deshabilitado.", 100
     return False, "", 0
 
+@regla(hechos=("gateway", "conexion", "puertos_http", "puertos_https"))
 def regla_gateway_inaccesible(datos: Dict[str, Any]) -> Tuple[bool, str, int]:
-    if not datos.get("gateway") and datos.get("conexion") and (not datos.get("puertos_http") or not datos.get("puertos_https")):
+    if _falso(datos, "gateway") and datos.get("conexion") and (_falso(datos, "puertos_http") or _falso(datos, "puertos_https")):
         return True, "Gateway inaccesible o puertos bloqueados: posible fallo del router o reglas de firewall.", 90
-    if not datos.get("gateway") and not datos.get("conexion"):
+    if _falso(datos, "gateway") and _falso(datos, "conexion"):
         return True, "Gateway inaccesible: posible fallo del router o red local.", 90
     return False, "", 0
 
+@regla(hechos=("conexion", "dns"))
 def regla_fallo_dns(datos: Dict[str, Any]) -> Tuple[bool, str, int]:
-    if datos.get("conexion") and not datos.get("dns"):
+    if datos.get("conexion") and _falso(datos, "dns"):
         return True, "Fallo de DNS: revisar configuración del servidor DNS o resolver local.", 95
     return False, "", 0
 
+@regla(hechos=("conexion", "puertos_http"))
 def regla_puerto_http_bloqueado(datos: Dict[str, Any]) -> Tuple[bool, str, int]:
-    if datos.get("conexion") and not datos.get("puertos_http"):
+    if datos.get("conexion") and _falso(datos, "puertos_http"):
         return True, "Puerto HTTP (80) bloqueado: revisar firewall/proxy.", 85
     return False, "", 0
 
+@regla(hechos=("conexion", "puertos_https"))
 def regla_puerto_https_bloqueado(datos: Dict[str, Any]) -> Tuple[bool, str, int]:
-    if datos.get("conexion") and not datos.get("puertos_https"):
+    if datos.get("conexion") and _falso(datos, "puertos_https"):
         return True, "Puerto HTTPS (443) bloqueado: revisar firewall/proxy.", 85
     return False, "", 0
 
+def _mascara_latencia_alta(col) -> Any:
+    # Comparar con NaN da False, así que 'lat == lat' equivale a 'lat is not None'
+    lat, pérdida = col["latencia_ms"], col["perdida_pct"]
+    return (lat == lat) & ((lat > 300) | (pérdida > 10))
+
+@regla(hechos=("latencia_ms", "perdida_pct"), requiere=("latencia_ms",), tabulable=False,
+       mascara=_mascara_latencia_alta)
 def regla_latencia_alta(datos: Dict[str, Any]) -> Tuple[bool, str, int]:
     # datos puede contener 'latencia_ms' y 'perdida_pct'
     lat = datos.get("latencia_ms")
@@ -43,6 +80,40 @@ def regla_latencia_alta(datos: Dict[str, Any]) -> Tuple[bool, str, int]:
         return True, f"Conexión inestable: latencia alta ({lat} ms) o pérdida de paquetes ({pérdida}%).", 80
     return False, "", 0
 
+# Umbrales de variabilidad del RTT: jitter (RFC 3550) y distancia p95 - mínimo (colas llenas, bufferbloat)
+JITTER_ALTO_MS = 30.0
+COLA_ALTA_MS = 100.0
+
+def _mascara_latencia_variable(col) -> Any:
+    jit = col["jitter_ms"]
+    return (jit == jit) & ((jit > JITTER_ALTO_MS) | (col["rtt_p95_ms"] - col["rtt_min_ms"] > COLA_ALTA_MS))
+
+@regla(hechos=("jitter_ms", "rtt_p95_ms", "rtt_min_ms"), requiere=("jitter_ms",), tabulable=False,
+       mascara=_mascara_latencia_variable)
+def regla_latencia_variable(datos: Dict[str, Any]) -> Tuple[bool, str, int]:
+    jit = datos.get("jitter_ms")
+    p95, minimo = datos.get("rtt_p95_ms"), datos.get("rtt_min_ms")
+    cola = p95 - minimo if p95 is not None and minimo is not None else None
+    if jit is not None and (jit > JITTER_ALTO_MS or (cola is not None and cola > COLA_ALTA_MS)):
+        return True, (f"Latencia variable (jitter {jit} ms, p95 {p95} ms frente a mínimo {minimo} ms): "
+                      "posible saturación del enlace (bufferbloat) o Wi-Fi inestable."), 78
+    return False, "", 0
+
+@regla(hechos=("hechos_desconocidos",), requiere=("hechos_desconocidos",), tabulable=False)
+def regla_diagnostico_parcial(datos: Dict[str, Any]) -> Tuple[bool, str, int]:
+    # Pruebas sin resultado (presupuesto de tiempo agotado): el diagnóstico puede estar incompleto
+    desconocidos = datos.get("hechos_desconocidos")
+    if desconocidos:
+        return True, f"Diagnóstico parcial: sin resultado para {', '.join(desconocidos)} (tiempo agotado).", 5
+    return False, "", 0
+
+@regla(hechos=("conexion", "ipv6_ok", "ipv4_ok"))
+def regla_ipv6_rota(datos: Dict[str, Any]) -> Tuple[bool, str, int]:
+    # El servicio tiene IPv6 y la máquina ruta IPv6, pero sólo conecta por IPv4 (no es un bloqueo de HTTPS)
+    if datos.get("conexion") and _falso(datos, "ipv6_ok") and datos.get("ipv4_ok"):
+        return True, "IPv6 roto: HTTPS responde por IPv4 pero no por IPv6; revisar la ruta IPv6 del router o del proveedor.", 80
+    return False, "", 0
+
 # Lista de reglas (el motor puede recorrerlas y priorizar)
 REGLAS = [
     regla_sin_conexion,
@@ -51,4 +122,7 @@ REGLAS = [
     regla_puerto_http_bloqueado,
     regla_puerto_https_bloqueado,
     regla_latencia_alta,
+    regla_ipv6_rota,
+    regla_latencia_variable,
+    regla_diagnostico_parcial,
 ]
@@ -0,0 +1,65 @@
+# benchmarks/bench_gateway.py
+import argparse
+import re
+import subprocess
+import time
+from typing import Callable, Dict, Optional
+
+from sistema_experto_conectividad.motor_inferencia import rutas
+
+"""
+Compara la detección del gateway lanzando 'ip route' (método anterior) con la lectura de
+/proc/net/route, sin caché y con el caché invalidado por netlink.
+Uso (Linux):
+    python -m sistema_experto_conectividad.benchmarks.bench_gateway --llamadas 200
+"""
+
+# --- Implementación anterior ('ip route' en cada llamada) reproducida para comparar ---
+def _gateway_ip_route() -> Optional[str]:
+    out = subprocess.check_output(["ip", "route"], stderr=subprocess.DEVNULL, universal_newlines=True, timeout=2)
+    m = re.search(r'default via (\d+\.\d+\.\d+\.\d+)', out)
+    return m.group(1) if m else None
+
+def _medir(fn: Callable, llamadas: int) -> float:
+    """
+    Tiempo medio por llamada (ms).
+    """
+    t0 = time.perf_counter()
+    for _ in range(llamadas):
+        fn()
+    return (time.perf_counter() - t0) * 1000.0 / llamadas
+
+def ejecutar(llamadas: int) -> Dict[str, Dict[str, object]]:
+    sin_cache = rutas.TablaRutas(usar_netlink=False, ttl_sin_netlink=0.0)
+    con_cache = rutas.TablaRutas()
+    metodos = {
+        "subprocess ip route": _gateway_ip_route,
+        "/proc sin caché": sin_cache.gateway,
+        "/proc + caché netlink": con_cache.gateway,
+    }
+    res = {}
+    for nombre, fn in metodos.items():
+        try:
+            gw = fn()
+            res[nombre] = {"gateway": gw, "ms": _medir(fn, llamadas)}
+        except (OSError, subprocess.SubprocessError) as e:
+            res[nombre] = {"gateway": f"error: {e}", "ms": None}
+    res["/proc + caché netlink"]["netlink"] = con_cache.estadisticas()["netlink"]
+    con_cache.cerrar()
+    return res
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de detección del gateway")
+    parser.add_argument("--llamadas", type=int, default=200)
+    args = parser.parse_args()
+    res = ejecutar(args.llamadas)
+    print(f"\n== {args.llamadas} llamadas (ms por llamada) ==")
+    print(f"{'método':<24}{'ms':>12}  gateway")
+    for nombre, r in res.items():
+        ms = f"{r['ms']:>12.4f}" if r["ms"] is not None else f"{'-':>12}"
+        print(f"{nombre:<24}{ms}  {r['gateway']}")
+    if not res["/proc + caché netlink"]["netlink"]:
+        print("(sin socket netlink: el caché caduca por TTL)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+# benchmarks/bench_historial.py
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from typing import Dict, Any, List, Callable
+
+from sistema_experto_conectividad.storage import historial, historial_sqlite
+
+"""
+Compara el historial antiguo (array JSON reescrito entero), el log JSONL y el backend SQLite.
+Uso:
+    python -m sistema_experto_conectividad.benchmarks.bench_historial --tamanos 10000 100000 1000000
+Trabaja en un directorio temporal; no toca el historial real.
+"""
+
+DIAGNOSTICOS = [
+    "Fallo no identificado: requiere diagnóstico avanzado.",
+    "Fallo de DNS: revisar configuración del servidor DNS o resolver local.",
+    "Puerto HTTPS (443) bloqueado: revisar firewall/proxy.",
+    "Conexión inestable: latencia alta (420.0 ms) o pérdida de paquetes (12.0%).",
+]
+
+def _registro_sintetico(i: int) -> Dict[str, Any]:
+    r = {k: random.random() < 0.8 for k in historial.CLAVES_BOOL}
+    r["latencia_ms"] = random.uniform(5, 600)
+    r["perdida_pct"] = random.choice([0.0, 0.0, 0.0, random.uniform(0, 40)])
+    r["severidad"] = random.choice(["baja", "media", "alta"])
+    r["gateway_ip"] = f"10.{i % 200}.0.1"
+    r["diagnostico"] = random.choice(DIAGNOSTICOS)
+    r["solucion_aplicada"] = None
+    r["timestamp"] = f"2025-01-01T00:00:00.{i:07d}Z"
+    return r
+
+def _medir(fn: Callable, repeticiones: int = 3) -> float:
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        fn()
+        mejor = min(mejor, time.perf_counter() - t0)
+    return mejor * 1000.0
+
+# --- Implementación anterior (array JSON) reproducida para comparar ---
+def _json_leer(ruta: str) -> List[Dict[str, Any]]:
+    with open(ruta, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def _json_escribir(ruta: str, items: List[Dict[str, Any]]) -> None:
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump(items, f, indent=2, ensure_ascii=False)
+
+def _bench_json(ruta: str, consulta: Dict[str, Any], muestra: Dict[str, Any]) -> Dict[str, float]:
+    def registrar():
+        items = _json_leer(ruta)
+        items.append(dict(muestra))
+        _json_escribir(ruta, items)
+
+    def similares():
+        scored = [(s, it) for it in _json_leer(ruta) for s in [historial._score_similitud(consulta, it)] if s >= 0.45]
+        scored.sort(key=lambda x: -x[0])
+        return scored[:3]
+
+    def aplicar():
+        items = _json_leer(ruta)
+        for it in items:
+            if it.get("timestamp") == muestra["timestamp"]:
+                it["solucion_aplicada"] = "reinicio"
+                break
+        _json_escribir(ruta, items)
+
+    def filtrar():
+        return [it for it in _json_leer(ruta) if "dns" in it["diagnostico"].lower()][-50:]
+
+    return {
+        "registrar": _medir(registrar, 1),
+        "leer_historial(50)": _medir(lambda: _json_leer(ruta)[-50:]),
+        "buscar_casos_similares": _medir(similares),
+        "aplicar_solucion": _medir(aplicar, 1),
+        "buscar_historial": _medir(filtrar),
+    }
+
+def _bench_api(consulta: Dict[str, Any], muestra: Dict[str, Any]) -> Dict[str, float]:
+    return {
+        "registrar": _medir(lambda: historial.registrar_diagnostico(consulta, "bench")),
+        "leer_historial(50)": _medir(lambda: historial.leer_historial(50)),
+        "buscar_casos_similares": _medir(lambda: historial.buscar_casos_similares(consulta, top_n=3, min_score=0.45)),
+        "aplicar_solucion": _medir(lambda: historial.aplicar_solucion_a_caso(muestra, "reinicio")),
+        "buscar_historial": _medir(lambda: historial.buscar_historial("dns", 50)),
+    }
+
+def ejecutar(tamano: int, directorio: str) -> Dict[str, Dict[str, float]]:
+    random.seed(tamano)
+    items = [_registro_sintetico(i) for i in range(tamano)]
+    consulta = {k: v for k, v in _registro_sintetico(0).items() if k in historial.CLAVES_BOOL + ["latencia_ms", "perdida_pct"]}
+    muestra = items[tamano // 2]
+    res = {}
+
+    ruta_json = os.path.join(directorio, f"h{tamano}.json")
+    _json_escribir(ruta_json, items)
+    res["json"] = _bench_json(ruta_json, consulta, muestra)
+
+    historial.configurar_backend(None)
+    historial.HISTORY_FILE = os.path.join(directorio, f"h{tamano}.jsonl")
+    historial.LEGACY_HISTORY_FILE = ruta_json + ".no-migrar"
+    historial._escribir_raw(items)
+    res["jsonl"] = _bench_api(consulta, muestra)
+
+    historial_sqlite.DB_FILE = os.path.join(directorio, f"h{tamano}.sqlite3")
+    historial_sqlite.insertar_muchos(items)
+    historial.configurar_backend("sqlite", historial_sqlite.DB_FILE)
+    res["sqlite"] = _bench_api(consulta, muestra)
+    historial.configurar_backend(None)
+    historial._cerrar()
+    return res
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de backends del historial")
+    parser.add_argument("--tamanos", type=int, nargs="+", default=[10_000, 100_000])
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as d:
+        for n in args.tamanos:
+            res = ejecutar(n, d)
+            print(f"\n== {n} registros (ms, mejor de 3) ==")
+            ops = list(res["json"].keys())
+            print(f"{'operación':<26}" + "".join(f"{b:>12}" for b in res))
+            for op in ops:
+                print(f"{op:<26}" + "".join(f"{res[b][op]:>12.2f}" for b in res))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+# motor_inferencia/cliente_dns.py
+import asyncio
+import random
+import selectors
+import socket
+import struct
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+from sistema_experto_conectividad.motor_inferencia import sockets_async
+
+"""
+Cliente DNS mínimo sobre UDP para la prueba de DNS.
+socket.gethostbyname no tiene timeout (espera el ciclo completo de reintentos del resolver
+del sistema) y sólo prueba un dominio cada vez. Aquí se envían a la vez las consultas A de
+todos los dominios de prueba a cada resolutor configurado (/etc/resolv.conf) por un socket
+UDP no bloqueante, y se espera como mucho 'timeout' desde el envío.
+De cada resolutor se guarda si respondió y su tiempo medio de respuesta, que pasan a los
+hechos 'dns_resolutores' y 'tiempo_dns_ms'.
+Resolutores y puerto son parámetros, así que se puede probar contra un servidor UDP local.
+"""
+
+RESOLV_CONF = "/etc/resolv.conf"
+PUERTO_DNS = 53
+TIPO_A = 1
+CLASE_IN = 1
+RCODE_NOERROR = 0
+
+def resolutores_sistema(ruta: str = RESOLV_CONF) -> List[str]:
+    """
+    Servidores 'nameserver' de resolv.conf (lista vacía si no existe, p. ej. en Windows).
+    """
+    resolutores = []
+    try:
+        with open(ruta, "r", encoding="utf-8", errors="replace") as f:
+            for linea in f:
+                partes = linea.split("#", 1)[0].split()
+                if len(partes) >= 2 and partes[0] == "nameserver":
+                    resolutores.append(partes[1])
+    except OSError:
+        pass
+    return list(dict.fromkeys(resolutores))
+
+def _nombre(dominio: str) -> bytes:
+    partes = [p for p in dominio.rstrip(".").split(".") if p]
+    return b"".join(bytes([len(p)]) + p.encode("idna") for p in partes) + b"\x00"
+
+def construir_consulta(dominio: str, ident: int, tipo: int = TIPO_A) -> bytes:
+    # Cabecera: id, flags (RD = recursión deseada), 1 pregunta
+    return struct.pack("!HHHHHH", ident, 0x0100, 1, 0, 0, 0) + _nombre(dominio) + struct.pack("!HH", tipo, CLASE_IN)
+
+def _saltar_nombre(data: bytes, pos: int) -> int:
+    while True:
+        if pos >= len(data):
+            raise ValueError("Nombre truncado")
+        n = data[pos]
+        if n == 0:
+            return pos + 1
+        if n & 0xC0 == 0xC0:  # puntero de compresión: el nombre termina aquí
+            return pos + 2
+        pos += n + 1
+
+def _leer_nombre(data: bytes, pos: int) -> str:
+    etiquetas = []
+    for _ in range(128):  # límite contra punteros en bucle
+        n = data[pos]
+        if n == 0:
+            return ".".join(etiquetas)
+        if n & 0xC0 == 0xC0:
+            pos = struct.unpack("!H", data[pos:pos + 2])[0] & 0x3FFF
+            continue
+        etiquetas.append(data[pos + 1:pos + 1 + n].decode("ascii", "replace"))
+        pos += n + 1
+    raise ValueError("Nombre con demasiadas etiquetas")
+
+def parsear_respuesta(data: bytes) -> Dict[str, Any]:
+    """
+    {id, rcode, pregunta, direcciones (A), ttl (mínimo de las respuestas A o None)}.
+    Lanza ValueError si el paquete no es una respuesta DNS válida.
+    """
+    if len(data) < 12:
+        raise ValueError("Respuesta demasiado corta")
+    ident, flags, qd, an, _, _ = struct.unpack("!HHHHHH", data[:12])
+    if not flags & 0x8000:
+        raise ValueError("No es una respuesta")
+    pos = 12
+    pregunta = None
+    for _ in range(qd):
+        if pregunta is None:
+            pregunta = _leer_nombre(data, pos).lower()
+        pos = _saltar_nombre(data, pos) + 4
+    direcciones, ttls = [], []
+    for _ in range(an):
+        pos = _saltar_nombre(data, pos)
+        if pos + 10 > len(data):
+            raise ValueError("Registro truncado")
+        tipo, clase, ttl, largo = struct.unpack("!HHIH", data[pos:pos + 10])
+        pos += 10
+        rdata = data[pos:pos + largo]
+        pos += largo
+        if tipo == TIPO_A and clase == CLASE_IN and len(rdata) == 4:
+            direcciones.append(socket.inet_ntoa(rdata))
+            ttls.append(ttl)
+    return {"id": ident, "rcode": flags & 0x000F, "pregunta": pregunta,
+            "direcciones": direcciones, "ttl": min(ttls) if ttls else None}
+
+def _direccion(resolutor: str, puerto: int) -> Tuple[int, Tuple]:
+    info = socket.getaddrinfo(resolutor, puerto, type=socket.SOCK_DGRAM,
+                              flags=socket.AI_NUMERICHOST)[0]
+    return info[0], info[4]
+
+class _Ronda:
+    """
+    Estado de una ronda de consultas (compartido por la versión síncrona y la asíncrona).
+    """
+
+    def __init__(self, dominios: List[str], resolutores: List[str], puerto: int):
+        self.dominios = dominios
+        self.resolutores = resolutores
+        self.puerto = puerto
+        self.salida: Dict[str, Dict[str, Any]] = {
+            r: {"consultas": 0, "respondidas": 0, "resueltas": [], "tiempo_ms": None, "direcciones": {}}
+            for r in resolutores
+        }
+        self.sockets: Dict[int, socket.socket] = {}
+        # id de consulta -> (resolutor, dirección, dominio, instante de envío)
+        self.pendientes: Dict[int, Tuple[str, Tuple, str, float]] = {}
+        self._tiempos: Dict[str, List[float]] = {r: [] for r in resolutores}
+
+    def _socket(self, familia: int) -> socket.socket:
+        sock = self.sockets.get(familia)
+        if sock is None:
+            sock = self.sockets[familia] = socket.socket(familia, socket.SOCK_DGRAM)
+            sock.setblocking(False)
+        return sock
+
+    def enviar(self) -> None:
+        for r in self.resolutores:
+            try:
+                familia, direccion = _direccion(r, self.puerto)
+                sock = self._socket(familia)
+                for d in self.dominios:
+                    ident = random.getrandbits(16)
+                    while ident in self.pendientes:
+                        ident = random.getrandbits(16)
+                    self.pendientes[ident] = (r, direccion, d.rstrip(".").lower(), time.perf_counter())
+                    sock.sendto(construir_consulta(d, ident), direccion)
+                    self.salida[r]["consultas"] += 1
+            except OSError as e:
+                self.salida[r]["error"] = str(e)
+
+    def recibir(self, data: bytes, origen: Tuple) -> None:
+        t = time.perf_counter()
+        try:
+            resp = parsear_respuesta(data)
+        except (ValueError, IndexError, struct.error):
+            return
+        consulta = self.pendientes.get(resp["id"])
+        # Se descartan respuestas de otro origen o a otra pregunta (id reutilizado, spoofing)
+        if consulta is None or origen[:2] != consulta[1][:2] or resp["pregunta"] != consulta[2]:
+            return
+        del self.pendientes[resp["id"]]
+        r, _, d, t_envio = consulta
+        self._tiempos[r].append((t - t_envio) * 1000.0)
+        self.salida[r]["respondidas"] += 1
+        if resp["rcode"] == RCODE_NOERROR and resp["direcciones"]:
+            self.salida[r]["resueltas"].append(d)
+            self.salida[r]["direcciones"][d] = resp["direcciones"]
+
+    def cerrar(self) -> Dict[str, Dict[str, Any]]:
+        for sock in self.sockets.values():
+            sock.close()
+        for r, ts in self._tiempos.items():
+            if ts:
+                self.salida[r]["tiempo_ms"] = round(sum(ts) / len(ts), 2)
+        return self.salida
+
+def consultar(dominios: List[str], resolutores: Optional[List[str]] = None, timeout: float = 2.0,
+              puerto: int = PUERTO_DNS) -> Dict[str, Dict[str, Any]]:
+    """
+    Envía a la vez una consulta A por dominio a cada resolutor y espera las respuestas hasta
+    'timeout' segundos. Devuelve por resolutor:
+    {consultas, respondidas, resueltas (dominios con alguna A), tiempo_ms (medio) o None,
+     direcciones {dominio: [ips]}, error (si no se pudo enviar)}.
+    """
+    ronda = _Ronda(dominios, resolutores if resolutores is not None else resolutores_sistema(), puerto)
+    sel = selectors.DefaultSelector()
+    try:
+        ronda.enviar()
+        for sock in ronda.sockets.values():
+            sel.register(sock, selectors.EVENT_READ)
+        limite = time.perf_counter() + timeout
+        while ronda.pendientes:
+            restante = limite - time.perf_counter()
+            if restante <= 0:
+                break
+            for clave, _ in sel.select(restante):
+                try:
+                    data, origen = clave.fileobj.recvfrom(4096)
+                except OSError:
+                    continue
+                ronda.recibir(data, origen)
+    finally:
+        sel.close()
+        salida = ronda.cerrar()
+    return salida
+
+async def consultar_async(dominios: List[str], resolutores: Optional[List[str]] = None, timeout: float = 2.0,
+                          puerto: int = PUERTO_DNS) -> Dict[str, Dict[str, Any]]:
+    """
+    Como consultar, pero esperando las respuestas en el bucle de eventos (sin hilos).
+    """
+    loop = asyncio.get_running_loop()
+    ronda = _Ronda(dominios, resolutores if resolutores is not None else resolutores_sistema(), puerto)
+
+    async def _leer(sock: socket.socket) -> None:
+        while ronda.pendientes:
+            try:
+                data, origen = await sockets_async.recvfrom(loop, sock, 4096)
+            except OSError:
+                return
+            ronda.recibir(data, origen)
+
+    try:
+        ronda.enviar()
+        lectores = [asyncio.ensure_future(_leer(sock)) for sock in ronda.sockets.values()]
+        if lectores:
+            _, sin_terminar = await asyncio.wait(lectores, timeout=timeout)
+            for t in sin_terminar:
+                t.cancel()
+            await asyncio.gather(*sin_terminar, return_exceptions=True)
+    finally:
+        salida = ronda.cerrar()
+    return salida
+
+def _resumir(res: Dict[str, Dict[str, Any]]) -> Tuple[Optional[bool], Optional[float], Dict[str, Optional[float]]]:
+    por_resolutor = {r: v["tiempo_ms"] for r, v in res.items()}
+    respondidos = [t for t in por_resolutor.values() if t is not None]
+    ok = any(v["resueltas"] for v in res.values())
+    return ok, (min(respondidos) if respondidos else None), por_resolutor
+
+def medir(dominios: List[str], resolutores: Optional[List[str]] = None, timeout: float = 2.0,
+          puerto: int = PUERTO_DNS) -> Tuple[Optional[bool], Optional[float], Dict[str, Optional[float]]]:
+    """
+    Resultado de la prueba de DNS: (dns_ok, tiempo_dns_ms, {resolutor: tiempo_ms o None}).
+    dns_ok es True si algún resolutor resolvió algún dominio; tiempo_dns_ms es el tiempo
+    medio del resolutor más rápido. Sin resolutores configurados devuelve (None, None, {}).
+    """
+    resolutores = resolutores if resolutores is not None else resolutores_sistema()
+    if not resolutores:
+        return None, None, {}
+    return _resumir(consultar(dominios, resolutores, timeout=timeout, puerto=puerto))
+
+async def medir_async(dominios: List[str], resolutores: Optional[List[str]] = None, timeout: float = 2.0,
+                      puerto: int = PUERTO_DNS) -> Tuple[Optional[bool], Optional[float], Dict[str, Optional[float]]]:
+    resolutores = resolutores if resolutores is not None else resolutores_sistema()
+    if not resolutores:
+        return None, None, {}
+    return _resumir(await consultar_async(dominios, resolutores, timeout=timeout, puerto=puerto))
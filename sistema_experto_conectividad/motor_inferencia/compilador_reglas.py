@@ -0,0 +1,255 @@
+# motor_inferencia/compilador_reglas.py
+import itertools
+import logging
+import time
+from typing import Dict, Any, List, Tuple, Callable, Iterable, Optional
+
+"""
+Compilador de reglas: convierte la lista de reglas en tablas de decisión indexadas por hecho.
+- Las reglas 'tabulables' (decorador reglas.regla) sólo dependen de si cada hecho que leen es
+  verdadero, falso o None, así que se precalculan: para cada combinación de estados se guarda
+  el hallazgo que producen. Evaluarlas es construir una clave y buscarla en un dict.
+- Al tabular se averiguan los hechos 'activadores' de cada regla: los que tienen que estar
+  presentes (no None) para que la regla pueda cumplirse. Las reglas se agrupan en nodos
+  compartidos por su activador menos común, y un nodo sólo se visita si su activador está en
+  'datos'. Así el coste crece con los hechos presentes y no con el número de reglas.
+- El resto (p. ej. umbrales numéricos) se evalúa llamando a la regla, sólo si están presentes
+  los hechos que declara en 'requiere'.
+El resultado es el mismo que recorrer REGLAS y ordenar por prioridad (empates en el orden de REGLAS).
+En las tablas 0/1 cuentan como False/True (son la misma clave de dict), así que una regla que
+los distingue (p. ej. con 'is False') no se tabula; si un hecho trae otro valor que no es bool
+ni None, el nodo se evalúa regla a regla.
+"""
+
+logger = logging.getLogger("motor")
+
+# Hechos por nodo: 3^8 = 6561 entradas como máximo por tabla
+MAX_HECHOS_TABLA = 8
+
+_ESTADOS = (None, False, True)
+
+Hallazgo = Tuple[int, int, str]  # (-prioridad, índice de la regla en REGLAS, mensaje)
+
+class _DatosVigilados(dict):
+    """
+    dict que anota las claves consultadas; sirve para comprobar que una regla sólo lee sus hechos.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.leidos = set()
+
+    def get(self, clave, defecto=None):
+        self.leidos.add(clave)
+        return super().get(clave, defecto)
+
+    def __getitem__(self, clave):
+        self.leidos.add(clave)
+        return super().__getitem__(clave)
+
+    def __contains__(self, clave):
+        self.leidos.add(clave)
+        return super().__contains__(clave)
+
+def _evaluar_regla(idx: int, fn: Callable, datos: Dict[str, Any], salida: List[Hallazgo]) -> None:
+    try:
+        matched, msg, prio = fn(datos)
+        if matched:
+            salida.append((-prio, idx, msg))
+    except Exception as e:
+        logger.exception("Error evaluando regla: %s", e)
+
+class _ReglaTabulada:
+    """
+    Tabla de una sola regla sobre sus propios hechos: combinación -> hallazgo (sólo las que se cumplen).
+    """
+    __slots__ = ("idx", "fn", "hechos", "filas", "activadores")
+
+    def __init__(self, idx: int, fn: Callable):
+        self.idx, self.fn = idx, fn
+        self.hechos = tuple(sorted(set(fn.hechos)))
+        declarados = set(self.hechos)
+        self.filas: Dict[tuple, Hallazgo] = {}
+        for c in itertools.product(_ESTADOS, repeat=len(self.hechos)):
+            datos = _DatosVigilados(zip(self.hechos, c))
+            matched, msg, prio = fn(datos)
+            if not datos.leidos <= declarados:
+                raise ValueError(f"lee hechos no declarados: {sorted(datos.leidos - declarados)}")
+            if matched:
+                self.filas[c] = (-prio, idx, msg)
+            # 0/1 comparten clave con False/True en la tabla: la regla tiene que tratarlos igual
+            enteros = fn(dict(zip(self.hechos, (v if v is None else int(v) for v in c))))
+            if bool(enteros[0]) != bool(matched) or (matched and tuple(enteros[1:]) != (msg, prio)):
+                raise ValueError("distingue 0/1 de False/True")
+        self.activadores = {h for j, h in enumerate(self.hechos) if all(c[j] is not None for c in self.filas)}
+
+class _ReglaDirecta:
+    __slots__ = ("idx", "fn", "requiere")
+
+    def __init__(self, idx: int, fn: Callable):
+        self.idx, self.fn = idx, fn
+        self.requiere = tuple(getattr(fn, "requiere", ()) or ())
+
+    def evaluar(self, datos: Dict[str, Any], salida: List[Hallazgo]) -> None:
+        for h in self.requiere:
+            if datos.get(h) is None:
+                return
+        _evaluar_regla(self.idx, self.fn, datos, salida)
+
+class NodoTabla:
+    """
+    Nodo compartido por varias reglas tabuladas: una tabla sobre la unión de sus hechos.
+    """
+    __slots__ = ("hechos", "reglas", "tabla", "activador")
+
+    def __init__(self, activador: Optional[str], reglas: List[_ReglaTabulada]):
+        self.activador = activador
+        self.reglas = reglas
+        self.hechos = tuple(sorted({h for r in reglas for h in r.hechos}))
+        self.tabla: Dict[tuple, Tuple[Hallazgo, ...]] = {}
+
+    def compilar(self) -> None:
+        pos = {h: j for j, h in enumerate(self.hechos)}
+        proyecciones = [(r, [pos[h] for h in r.hechos]) for r in sorted(self.reglas, key=lambda r: r.idx)]
+        self.tabla = {}
+        for c in itertools.product(_ESTADOS, repeat=len(self.hechos)):
+            fila = []
+            for r, js in proyecciones:
+                h = r.filas.get(tuple(c[j] for j in js))
+                if h is not None:
+                    fila.append(h)
+            self.tabla[c] = tuple(fila)
+
+    def evaluar(self, datos: Dict[str, Any], salida: List[Hallazgo]) -> None:
+        try:
+            fila = self.tabla.get(tuple(map(datos.get, self.hechos)))
+        except TypeError:  # valor no hashable
+            fila = None
+        if fila is not None:
+            salida.extend(fila)
+        else:
+            for r in self.reglas:
+                _evaluar_regla(r.idx, r.fn, datos, salida)
+
+class MotorReglas:
+    """
+    Reglas compiladas. evaluar(datos) devuelve los hallazgos ordenados como engine.inferir.
+    """
+
+    def __init__(self, reglas: Iterable[Callable], max_hechos_tabla: int = MAX_HECHOS_TABLA):
+        t0 = time.perf_counter()
+        self.reglas = tuple(reglas)
+        self.nodos: List[NodoTabla] = []
+        self.directas: List[_ReglaDirecta] = []
+        # hecho -> nodos/reglas que sólo pueden dar hallazgos si ese hecho no es None
+        self.indice_hechos: Dict[str, List[Any]] = {}
+        self._siempre: List[Any] = []
+
+        tabuladas: List[_ReglaTabulada] = []
+        for idx, fn in enumerate(self.reglas):
+            hechos = getattr(fn, "hechos", None)
+            if hechos is not None and getattr(fn, "tabulable", False) and len(set(hechos)) <= max_hechos_tabla:
+                try:
+                    tabuladas.append(_ReglaTabulada(idx, fn))
+                    continue
+                except Exception as e:
+                    logger.warning("Regla %s no tabulable (%s): se evaluará directamente", fn.__name__, e)
+            self.directas.append(_ReglaDirecta(idx, fn))
+
+        # Cada regla se cuelga de su activador menos compartido (None = se evalúa siempre)
+        frecuencia: Dict[str, int] = {}
+        for r in tabuladas:
+            for h in r.activadores:
+                frecuencia[h] = frecuencia.get(h, 0) + 1
+        grupos: Dict[Optional[str], List[_ReglaTabulada]] = {}
+        for r in tabuladas:
+            activador = min(r.activadores, key=lambda h: (frecuencia[h], h)) if r.activadores else None
+            grupos.setdefault(activador, []).append(r)
+
+        # Dentro de cada grupo, las reglas se reparten en nodos mientras la unión de hechos quepa
+        for activador, miembros in grupos.items():
+            abiertos: List[List[_ReglaTabulada]] = []
+            for r in miembros:
+                for nodo in abiertos:
+                    if len({h for x in nodo for h in x.hechos} | set(r.hechos)) <= max_hechos_tabla:
+                        nodo.append(r)
+                        break
+                else:
+                    abiertos.append([r])
+            self.nodos.extend(NodoTabla(activador, n) for n in abiertos)
+
+        # Un nodo cuyos hechos ya cubre un nodo que se evalúa siempre se funde con él (una búsqueda menos)
+        siempre = [n for n in self.nodos if n.activador is None]
+        for nodo in [n for n in self.nodos if n.activador is not None]:
+            for destino in siempre:
+                if set(nodo.hechos) <= set(destino.hechos):
+                    destino.reglas.extend(nodo.reglas)
+                    self.nodos.remove(nodo)
+                    break
+
+        for nodo in self.nodos:
+            nodo.compilar()
+            if nodo.activador is None:
+                self._siempre.append(nodo)
+            else:
+                self.indice_hechos.setdefault(nodo.activador, []).append(nodo)
+        for r in self.directas:
+            if r.requiere:
+                self.indice_hechos.setdefault(r.requiere[0], []).append(r)
+            else:
+                self._siempre.append(r)
+        # Unidades de evaluación (nodos y reglas directas) y de qué hechos depende cada una,
+        # para reevaluar sólo lo afectado por un cambio (motor_inferencia.sesion)
+        self.unidades: List[Any] = list(self.nodos) + list(self.directas)
+        self.dependencias: Dict[str, List[int]] = {}
+        self.sin_dependencias: List[int] = []
+        for i, u in enumerate(self.unidades):
+            hechos = u.hechos if isinstance(u, NodoTabla) else getattr(u.fn, "hechos", None)
+            if hechos is None:
+                self.sin_dependencias.append(i)
+                continue
+            for h in set(hechos):
+                self.dependencias.setdefault(h, []).append(i)
+        self.tiempo_compilacion_ms = (time.perf_counter() - t0) * 1000.0
+
+    def evaluar(self, datos: Dict[str, Any]) -> List[Hallazgo]:
+        hallazgos: List[Hallazgo] = []
+        for c in self._siempre:
+            c.evaluar(datos, hallazgos)
+        indice = self.indice_hechos
+        for k, v in datos.items():
+            if v is not None and k in indice:
+                for c in indice[k]:
+                    c.evaluar(datos, hallazgos)
+        hallazgos.sort()
+        return hallazgos
+
+    def evaluar_unidad(self, i: int, datos: Dict[str, Any]) -> List[Hallazgo]:
+        salida: List[Hallazgo] = []
+        self.unidades[i].evaluar(datos, salida)
+        return salida
+
+    def resumen(self) -> Dict[str, Any]:
+        return {
+            "reglas": len(self.reglas),
+            "nodos": [{"activador": n.activador, "hechos": n.hechos, "reglas": len(n.reglas), "entradas": len(n.tabla)}
+                      for n in self.nodos],
+            "directas": len(self.directas),
+            "tiempo_compilacion_ms": round(self.tiempo_compilacion_ms, 3),
+        }
+
+def compilar(reglas: Iterable[Callable], max_hechos_tabla: int = MAX_HECHOS_TABLA) -> MotorReglas:
+    return MotorReglas(reglas, max_hechos_tabla)
+
+_motor: Optional[MotorReglas] = None
+
+def motor_para(reglas: List[Callable]) -> MotorReglas:
+    """
+    Motor compilado para la lista dada; se recompila si la lista cambió desde la última llamada.
+    """
+    global _motor
+    actual = _motor
+    if actual is None or actual.reglas != tuple(reglas):
+        actual = _motor = compilar(reglas)
+        logger.info("Reglas compiladas: %s", actual.resumen())
+    return actual
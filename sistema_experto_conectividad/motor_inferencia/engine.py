@@ -1,64 +1,229 @@
 # motor_inferencia/engine.py
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Tuple, Iterable
+from concurrent.futures import ThreadPoolExecutor, wait
 import logging
+import time
 from sistema_experto_conectividad.base_de_conocimiento import reglas as reglas_mod
+from sistema_experto_conectividad.base_de_conocimiento import cargador_reglas
 import sistema_experto_conectividad.motor_inferencia.pruebas_red as pruebas_red
 import sistema_experto_conectividad.motor_inferencia.fuzzificacion as fuzzificacion
+from sistema_experto_conectividad.motor_inferencia import inferencia_difusa
+from sistema_experto_conectividad.motor_inferencia import estadisticas_rtt
+from sistema_experto_conectividad.motor_inferencia.presupuesto import Presupuesto
 from sistema_experto_conectividad.storage import historial
 from sistema_experto_conectividad.storage.historial import registrar_diagnostico
 
 logger = logging.getLogger("engine")
 logger.setLevel(logging.INFO)
 
-def ejecutar_diagnostico(gateway_ip: str = None, auto_detect_gateway: bool = True) -> Dict[str, Any]:
+# Número máximo de pruebas de red simultáneas en modo concurrente
+MAX_WORKERS_PRUEBAS = 8
+
+# Hechos de 'datos' que aporta cada prueba
+HECHOS_PRUEBA = {
+    "gateway": ("gateway",),
+    "conexion": ("conexion", "latencia_ms", "perdida_pct", "rtts_ms"),
+    "dns": ("dns", "tiempo_dns_ms", "dns_resolutores"),
+    "estado_adaptadores": ("estado_adaptadores",),
+    "puertos_http": ("puertos_http",),
+    "puertos_https": ("puertos_https", "tiempo_handshake_ms", "familia_ganadora",
+                      "conexion_ipv6_ms", "conexion_ipv4_ms", "ipv6_ok", "ipv4_ok"),
+    "servicios": ("servicios",),
+}
+# Pruebas que salen de una sola pasada del escáner TCP (prueba 'tcp')
+PRUEBAS_TCP = ("puertos_http", "puertos_https", "servicios")
+# Resultado crudo de una prueba que no llegó a ejecutarse (sus hechos quedan desconocidos)
+SIN_RESULTADO = {
+    "gateway": (None, None),
+    "conexion": (None, None, None, []),
+    "dns": (None, None, {}),
+    "estado_adaptadores": {},
+    "puertos_http": None,
+    "puertos_https": (None,) * 7,
+    "servicios": {},
+}
+SIN_RESULTADO["tcp"] = {n: SIN_RESULTADO[n] for n in PRUEBAS_TCP}
+
+def _medir(fn, *args, **kwargs) -> Tuple[Any, float]:
     """
-    Ejecuta pruebas y devuelve dict con resultados.
-    Si gateway_ip es None y auto_detect_gateway True, intenta detectarlo automáticamente.
+    Ejecuta fn y devuelve (resultado, duracion_ms).
+    """
+    t0 = time.perf_counter()
+    res = fn(*args, **kwargs)
+    return res, (time.perf_counter() - t0) * 1000.0
+
+def _probar_gateway(gateway_ip: str, auto_detect_gateway: bool, presupuesto: Presupuesto = None) -> Tuple[str, bool]:
+    """
+    Detecta (si procede) y prueba el gateway. Devuelve (gateway_usado, gateway_ok).
     """
     used_gateway = gateway_ip
     if not gateway_ip and auto_detect_gateway:
-        gw = pruebas_red.detectar_gateway_sistema()
-        used_gateway = gw
-
-    conn_ok, lat_ms, perdida = pruebas_red.verificar_conexion()
-    dns_ok = pruebas_red.verificar_dns()
+        used_gateway = pruebas_red.detectar_gateway_sistema()
     gw_ok = False
     if used_gateway:
-        gw_ok = pruebas_red.verificar_gateway(used_gateway)
-    estado_adaptadores = pruebas_red.estado_adaptadores()
-    puertos_http = pruebas_red.comprobar_puerto("www.google.com", 80)
-    puertos_https = pruebas_red.comprobar_puerto("www.google.com", 443)
-    servicios = pruebas_red.probar_servicios()
+        gw_ok = pruebas_red.verificar_gateway(used_gateway, presupuesto=presupuesto)
+    return used_gateway, gw_ok
+
+def _sin_resultado(nombre: str, res: Any) -> bool:
+    """
+    True si la prueba no llegó a dar su resultado (p. ej. se agotó el presupuesto).
+    """
+    if nombre == "gateway":
+        return res[1] is None
+    if nombre in ("conexion", "dns", "puertos_https"):
+        return res[0] is None
+    if nombre == "servicios":
+        return any(v is None for v in res.values())
+    if nombre == "estado_adaptadores":
+        return False
+    return res is None
 
-    severidad = fuzzificacion.evaluar_severidad(lat_ms, perdida)
+def repartir_tcp(resultados: Dict[str, Any], tiempos: Dict[str, float], desconocidas: set) -> None:
+    """
+    Sustituye el resultado de la pasada TCP ('tcp') por los de puertos_http, puertos_https y
+    servicios (su duración queda en tiempos['tcp']).
+    """
+    resultados.update(resultados.pop("tcp"))
+    if "tcp" in desconocidas:
+        desconocidas.discard("tcp")
+        desconocidas.update(PRUEBAS_TCP)
+
+def armar_datos(resultados: Dict[str, Any], tiempos: Dict[str, float],
+                desconocidas: Iterable[str] = ()) -> Dict[str, Any]:
+    """
+    Construye el dict 'datos' a partir de los resultados crudos de cada prueba
+    (compartido por la versión síncrona y la asíncrona).
+    Los hechos de las pruebas en 'desconocidas' se listan en datos['hechos_desconocidos'].
+    """
+    used_gateway, gw_ok = resultados["gateway"]
+    conn_ok, lat_ms, perdida, rtts = resultados["conexion"]
+    dns_ok, tiempo_dns, dns_resolutores = resultados["dns"]
+    # HTTPS con doble pila: qué familia ganó la carrera y cómo respondió cada una
+    https_ok, tiempo_handshake, familia, ipv6_ms, ipv4_ms, ipv6_ok, ipv4_ok = resultados["puertos_https"]
+
+    # min/max/jitter/EWMA/percentiles de las muestras de ping
+    rtt = estadisticas_rtt.hechos_rtt(rtts)
+    severidad = fuzzificacion.evaluar_severidad(lat_ms, perdida, rtt["jitter_ms"])
 
     datos = {
         "conexion": conn_ok,
         "latencia_ms": lat_ms,
         "perdida_pct": perdida,
+        "rtts_ms": rtts,
+        **rtt,
         "dns": dns_ok,
+        "tiempo_dns_ms": tiempo_dns,
+        "dns_resolutores": dns_resolutores,
         "gateway": gw_ok,
         "gateway_ip": used_gateway,
-        "estado_adaptadores": estado_adaptadores,
-        "puertos_http": puertos_http,
-        "puertos_https": puertos_https,
-        "servicios": servicios,
-        "severidad": severidad
+        "estado_adaptadores": resultados["estado_adaptadores"],
+        "puertos_http": resultados["puertos_http"],
+        "puertos_https": https_ok,
+        "tiempo_handshake_ms": tiempo_handshake,
+        "familia_ganadora": familia,
+        "conexion_ipv6_ms": ipv6_ms,
+        "conexion_ipv4_ms": ipv4_ms,
+        "ipv6_ok": ipv6_ok,
+        "ipv4_ok": ipv4_ok,
+        "servicios": resultados["servicios"],
+        "severidad": severidad,
+        "tiempos_pruebas": {k: round(v, 1) for k, v in tiempos.items()},
+        "hechos_desconocidos": sorted(h for n in desconocidas for h in HECHOS_PRUEBA[n]),
     }
+    # Índice 0..100 del sistema difuso completo (usa también jitter/DNS/handshake si están)
+    datos.update(inferencia_difusa.indice_severidad(datos))
     return datos
 
-def inferir(datos: Dict[str, Any]) -> List[str]:
-    hallazgos = []
-    # Usamos las reglas definidas en base_de_conocimiento.reglas.REGLAS
-    for r in reglas_mod.REGLAS:
+def ejecutar_diagnostico(gateway_ip: str = None, auto_detect_gateway: bool = True,
+                         concurrente: bool = False, max_workers: int = MAX_WORKERS_PRUEBAS,
+                         perezoso: bool = False, presupuesto: Any = None,
+                         ping_adaptativo: bool = False) -> Dict[str, Any]:
+    """
+    Ejecuta pruebas y devuelve dict con resultados.
+    Si gateway_ip es None y auto_detect_gateway True, intenta detectarlo automáticamente.
+    Con concurrente=True las pruebas independientes se lanzan a la vez en un pool de
+    hilos acotado (max_workers), de modo que el tiempo total ~ la prueba más lenta.
+    En 'tiempos_pruebas' se devuelve la duración (ms) de cada prueba.
+    Con perezoso=True sólo se ejecutan las pruebas que pueden cambiar las inferencias
+    (motor_inferencia.planificador); las omitidas se listan en 'pruebas_omitidas'.
+    Con presupuesto (segundos o presupuesto.Presupuesto) el diagnóstico termina en ese tiempo:
+    cada prueba usa su parte del tiempo restante y las que no terminan quedan como hechos
+    desconocidos (None), listados en 'hechos_desconocidos'.
+    Con ping_adaptativo=True la prueba de conexión muestrea hasta tener intervalos de confianza
+    estrechos (pinger.ping_adaptativo) en lugar de enviar siempre 3 pings.
+    """
+    if perezoso:
+        # Import local: planificador importa este módulo
+        from sistema_experto_conectividad.motor_inferencia import planificador
+        return planificador.diagnosticar_perezoso(gateway_ip, auto_detect_gateway, presupuesto=presupuesto,
+                                                  ping_adaptativo=ping_adaptativo)
+    presupuesto = Presupuesto.crear(presupuesto)
+    pruebas = {
+        "gateway": (_probar_gateway, (gateway_ip, auto_detect_gateway)),
+        "conexion": (pruebas_red.medir_conexion, ()),
+        "dns": (pruebas_red.medir_dns, ()),
+        "estado_adaptadores": (pruebas_red.estado_adaptadores, ()),
+        # Puertos y servicios en una sola pasada del escáner TCP
+        "tcp": (pruebas_red.escanear_puertos_y_servicios, ("www.google.com", 80, 443)),
+    }
+
+    # estado_adaptadores es local (psutil) y no recibe presupuesto
+    extra = {} if presupuesto is None else {"presupuesto": presupuesto}
+    kwargs = {nombre: (extra if nombre != "estado_adaptadores" else {}) for nombre in pruebas}
+    if ping_adaptativo:
+        kwargs["conexion"] = dict(kwargs["conexion"], adaptativo=True)
+
+    resultados: Dict[str, Any] = {}
+    tiempos: Dict[str, float] = {}
+    desconocidas = set()
+    t0 = time.perf_counter()
+    if concurrente:
+        pool = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="prueba")
         try:
-            matched, msg, prio = r(datos)
-            if matched:
-                hallazgos.append((prio, msg))
-        except Exception as e:
-            logger.exception("Error evaluando regla: %s", e)
-    hallazgos.sort(key=lambda x: -x[0])
-    return [h[1] for h in hallazgos] if hallazgos else ["Fallo no identificado: requiere diagnóstico avanzado."]
+            futuros = {nombre: pool.submit(_medir, fn, *args, **kwargs[nombre])
+                       for nombre, (fn, args) in pruebas.items()}
+            if presupuesto is not None:
+                wait(futuros.values(), timeout=presupuesto.restante())
+            for nombre, fut in futuros.items():
+                if presupuesto is not None and not fut.done():
+                    fut.cancel()
+                    resultados[nombre], tiempos[nombre] = SIN_RESULTADO[nombre], None
+                    desconocidas.add(nombre)
+                else:
+                    resultados[nombre], tiempos[nombre] = fut.result()
+        finally:
+            # Con presupuesto no se espera a las pruebas rezagadas (terminan solas en segundo plano)
+            pool.shutdown(wait=presupuesto is None, cancel_futures=True)
+    else:
+        # Cada prueba con presupuesto recibe su parte del tiempo que queda entre las que faltan
+        pendientes = [n for n in pruebas if "presupuesto" in kwargs[n]]
+        for nombre, (fn, args) in pruebas.items():
+            if nombre in pendientes:
+                if presupuesto.agotado():
+                    resultados[nombre], tiempos[nombre] = SIN_RESULTADO[nombre], None
+                    desconocidas.add(nombre)
+                    pendientes.remove(nombre)
+                    continue
+                kwargs[nombre] = dict(kwargs[nombre], presupuesto=presupuesto.parte(len(pendientes)))
+                pendientes.remove(nombre)
+            resultados[nombre], tiempos[nombre] = _medir(fn, *args, **kwargs[nombre])
+    tiempos["total"] = (time.perf_counter() - t0) * 1000.0
+    tiempos = {k: v for k, v in tiempos.items() if v is not None}
+
+    repartir_tcp(resultados, tiempos, desconocidas)
+    desconocidas.update(n for n, res in resultados.items() if _sin_resultado(n, res))
+    datos = armar_datos(resultados, tiempos, desconocidas)
+    if presupuesto is not None:
+        datos.update(presupuesto.resumen())
+    logger.info("Pruebas completadas en %.0f ms (concurrente=%s, desconocidos=%s)",
+                tiempos["total"], concurrente, datos["hechos_desconocidos"])
+    return datos
+
+def inferir(datos: Dict[str, Any]) -> List[str]:
+    # Usamos las reglas definidas en base_de_conocimiento.reglas.REGLAS (más las declaradas en
+    # archivo, si hay), compiladas en tablas de decisión que se recompilan solas si cambian
+    hallazgos = cargador_reglas.evaluar(datos)
+    return [h[2] for h in hallazgos] if hallazgos else ["Fallo no identificado: requiere diagnóstico avanzado."]
 
 def generar_pasos_accion(datos: Dict[str, Any], inferencias: List[str]) -> List[Dict[str, Any]]:
     """
@@ -68,7 +233,21 @@ def generar_pasos_accion(datos: Dict[str, Any], inferencias: List[str]) -> List[
     pasos = []
     # Ejemplos mapeados
     for msg in inferencias:
-        if "Sin conexión" in msg:
+        declarada = cargador_reglas.accion_para(msg, datos)
+        if declarada:
+            pasos.append(declarada)
+        # Antes que el resto: el mensaje lista hechos como 'latencia_ms' que casarían otras ramas
+        elif msg.startswith("Diagnóstico parcial"):
+            pasos.append({
+                "title": "Diagnóstico incompleto",
+                "detalle": f"Sin resultado por falta de tiempo: {', '.join(datos.get('hechos_desconocidos') or [])}.",
+                "paso_a_paso": [
+                    "Repite el diagnóstico con un presupuesto de tiempo mayor.",
+                    "Si se repite, la prueba que no responde suele indicar dónde está el problema."
+                ],
+                "prioridad": 5
+            })
+        elif "Sin conexión" in msg:
             pasos.append({
                 "title": "Verifica conexión física / adaptador",
                 "detalle": ("El sistema no detecta conexión ni resolución DNS. "
@@ -91,6 +270,18 @@ def generar_pasos_accion(datos: Dict[str, Any], inferencias: List[str]) -> List[
                 ],
                 "prioridad": 95
             })
+        elif "IPv6 roto" in msg:
+            pasos.append({
+                "title": "Conectividad IPv6 rota",
+                "detalle": (f"HTTPS por IPv4: {datos.get('conexion_ipv4_ms')} ms; por IPv6: sin conexión. "
+                            "Los programas que prueban IPv6 primero pueden tardar en abrir las páginas."),
+                "paso_a_paso": [
+                    "Reinicia el router para que renueve el prefijo IPv6 del proveedor.",
+                    "Comprueba 'ip -6 route' (o 'route print -6'): debe haber una ruta por defecto IPv6.",
+                    "Si el proveedor no da IPv6 de verdad, desactívalo en el router o en el adaptador."
+                ],
+                "prioridad": 80
+            })
         elif "HTTP" in msg or "HTTPS" in msg:
             pasos.append({
                 "title": "Puertos HTTP/HTTPS bloqueados",
@@ -102,6 +293,18 @@ def generar_pasos_accion(datos: Dict[str, Any], inferencias: List[str]) -> List[
                 ],
                 "prioridad": 90
             })
+        elif "Latencia variable" in msg:
+            pasos.append({
+                "title": "Latencia variable (jitter)",
+                "detalle": (f"Jitter: {datos.get('jitter_ms')} ms, p95: {datos.get('rtt_p95_ms')} ms, "
+                            f"mínimo: {datos.get('rtt_min_ms')} ms. Afecta sobre todo a llamadas y videollamadas."),
+                "paso_a_paso": [
+                    "Comprueba si otra descarga o copia de seguridad satura el enlace y repite la prueba sin ella.",
+                    "Activa SQM / control de colas (fq_codel, cake) en el router si lo permite.",
+                    "En Wi-Fi, cambia de canal o usa cable para descartar interferencias."
+                ],
+                "prioridad": 78
+            })
         elif "latencia" in msg or "inestable" in msg:
             pasos.append({
                 "title": "Latencia alta o pérdida de paquetes",
@@ -134,11 +337,7 @@ def generar_pasos_accion(datos: Dict[str, Any], inferencias: List[str]) -> List[
     pasos.sort(key=lambda x: -x.get("prioridad", 0))
     return pasos
 
-def diagnosticar_y_registrar(gateway_ip: str = None, auto_detect_gateway: bool = True) -> Dict[str, Any]:
-    datos = ejecutar_diagnostico(gateway_ip=gateway_ip, auto_detect_gateway=auto_detect_gateway)
-    inferencias = inferir(datos)
-    pasos = generar_pasos_accion(datos, inferencias)
-    diagnostico_final = "; ".join(inferencias)
+def registrar_en_historial(datos: Dict[str, Any], diagnostico_final: str) -> None:
     # Guardamos sin solucion_aplicada (se podrá añadir desde la UI)
     registrar_diagnostico({
         "conexion": datos["conexion"],
@@ -150,6 +349,17 @@ def diagnosticar_y_registrar(gateway_ip: str = None, auto_detect_gateway: bool =
         "perdida_pct": datos["perdida_pct"],
         "severidad": datos["severidad"]
     }, diagnostico_final, solucion_aplicada=None)
+
+def diagnosticar_y_registrar(gateway_ip: str = None, auto_detect_gateway: bool = True,
+                             concurrente: bool = False, perezoso: bool = False,
+                             presupuesto: Any = None, ping_adaptativo: bool = False) -> Dict[str, Any]:
+    datos = ejecutar_diagnostico(gateway_ip=gateway_ip, auto_detect_gateway=auto_detect_gateway,
+                                 concurrente=concurrente, perezoso=perezoso, presupuesto=presupuesto,
+                                 ping_adaptativo=ping_adaptativo)
+    inferencias = inferir(datos)
+    pasos = generar_pasos_accion(datos, inferencias)
+    diagnostico_final = "; ".join(inferencias)
+    registrar_en_historial(datos, diagnostico_final)
     datos["diagnostico"] = diagnostico_final
     datos["inferencias"] = inferencias
     datos["pasos"] = pasos
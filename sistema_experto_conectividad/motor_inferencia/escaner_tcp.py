@@ -0,0 +1,380 @@
+# motor_inferencia/escaner_tcp.py
+import asyncio
+import errno
+import ipaddress
+import itertools
+import selectors
+import socket
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, Any, List, Optional, Tuple, Iterable
+
+from sistema_experto_conectividad.motor_inferencia.resolutor import RESOLUTOR
+
+"""
+Escáner de conexiones TCP no bloqueante para las pruebas de puertos y servicios.
+socket.create_connection bloquea un hilo por conexión y prueba los objetivos de uno en uno.
+Aquí se lanzan a la vez hasta 'max_simultaneos' connect() no bloqueantes y se atienden con
+un único selector (o con el bucle de eventos en la versión asíncrona):
+- 'timeout' es el plazo de todo el escaneo, resolución de nombres incluida: se fija un
+  instante límite al entrar y ni la espera de getaddrinfo ni ningún objetivo pasan de él
+  (así un escaneo respeta el presupuesto del diagnóstico);
+- doble pila al estilo happy eyeballs (RFC 8305): las direcciones se intercalan por familia
+  empezando por IPv6 y cada intento arranca 'retraso' (250 ms) después del anterior, o en
+  cuanto falla el que está en curso, sin cancelar los anteriores. Gana el primero que conecta.
+  La otra familia se sigue midiendo dentro del mismo plazo, así que de cada objetivo se sabe
+  qué familia ganó y el tiempo de handshake de cada una (o por qué falló) sin timeouts seguidos;
+- un error inmediato de connect() por falta de ruta (ENETUNREACH, EADDRNOTAVAIL, EAFNOSUPPORT)
+  significa que la máquina no tiene esa familia: no cuenta como fallo de la familia;
+- todos los sockets se cierran en cuanto se resuelven, y en cualquier caso al terminar
+  el escaneo (también si se interrumpe), así que no quedan descriptores abiertos.
+"""
+
+TIMEOUT_S = 3.0
+MAX_SIMULTANEOS = 256
+MAX_HILOS_RESOLUCION = 32
+RETRASO_INTENTO_S = 0.25     # "Connection Attempt Delay" recomendado por RFC 8305
+
+FAMILIAS = ("ipv6", "ipv4")
+
+Objetivo = Tuple[str, int]
+
+# connect() no bloqueante en curso (10035 = WSAEWOULDBLOCK en Windows)
+_EN_CURSO = {errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY, 10035}
+# Errores inmediatos de connect() que indican que no hay ruta local para la familia
+_SIN_RUTA = {errno.ENETUNREACH, errno.EADDRNOTAVAIL, errno.EAFNOSUPPORT}
+
+def _familia(ip: str) -> str:
+    return "ipv6" if ipaddress.ip_address(ip.split("%", 1)[0]).version == 6 else "ipv4"
+
+def intercalar(direcciones: List[str]) -> List[str]:
+    """
+    Orden de intentos de RFC 8305 (sección 4): IPv6 primero y luego alternando familias.
+    """
+    por_familia = {f: [ip for ip in direcciones if _familia(ip) == f] for f in FAMILIAS}
+    orden = []
+    for par in itertools.zip_longest(por_familia["ipv6"], por_familia["ipv4"]):
+        orden.extend(ip for ip in par if ip is not None)
+    return orden
+
+def _nombre_error(err: int) -> str:
+    return errno.errorcode.get(err, str(err))
+
+class _Objetivo:
+    """
+    Estado de la conexión a un (host, puerto): intentos pendientes, en curso y resultado por familia.
+    """
+
+    def __init__(self, clave: Objetivo, direcciones: List[str]):
+        self.clave = clave
+        self.direcciones = intercalar(direcciones)
+        self.siguiente = 0
+        self.plazo: Optional[float] = None
+        self.proximo = 0.0                  # instante a partir del cual puede salir el siguiente intento
+        self.en_curso = 0
+        self.familias: Dict[str, Dict[str, Any]] = {
+            f: {"abierto": None, "ip": None, "tiempo_ms": None, "error": None}
+            for f in FAMILIAS if any(_familia(ip) == f for ip in self.direcciones)
+        }
+        self.fallos = dict.fromkeys(self.familias, 0)
+        self.ganadora: Optional[str] = None
+
+    def pendiente(self) -> Optional[str]:
+        """
+        Siguiente dirección a intentar (saltando las de familias que ya conectaron), o None.
+        """
+        while self.siguiente < len(self.direcciones):
+            ip = self.direcciones[self.siguiente]
+            if not self.familias[_familia(ip)]["abierto"]:
+                return ip
+            self.siguiente += 1
+        return None
+
+    def terminado(self) -> bool:
+        return self.en_curso == 0 and self.pendiente() is None
+
+class _Escaneo:
+    """
+    Estado de un escaneo (compartido por la versión síncrona y la asíncrona).
+    'al_retirar' se llama con cada socket en curso justo antes de cerrarlo, para que quien
+    lo vigila (selector o bucle de eventos) deje de hacerlo.
+    """
+
+    def __init__(self, objetivos: List[Objetivo], timeout: float, max_simultaneos: int,
+                 retraso: float = RETRASO_INTENTO_S):
+        self.limite = time.perf_counter() + timeout
+        self.retraso = retraso
+        self.max_simultaneos = max(1, max_simultaneos)
+        self.resultados: Dict[Objetivo, Dict[str, Any]] = {
+            obj: {"abierto": None, "ip": None, "tiempo_ms": None, "familia": None, "familias": {}, "error": None}
+            for obj in objetivos
+        }
+        self.cola: deque = deque()                 # objetivos que aún no han empezado
+        self.abiertos: List[_Objetivo] = []        # objetivos empezados y sin terminar
+        # socket -> (objetivo, ip, instante del connect)
+        self.activos: Dict[socket.socket, Tuple[_Objetivo, str, float]] = {}
+        self.al_retirar = lambda sock: None
+
+    def agregar(self, obj: Objetivo, direcciones: Optional[List[str]]) -> None:
+        """
+        direcciones None = la resolución no terminó a tiempo (resultado desconocido).
+        """
+        if direcciones is None:
+            self.resultados[obj]["error"] = "resolucion_sin_terminar"
+        elif not direcciones:
+            self.resultados[obj].update(abierto=False, error="resolucion")
+        else:
+            self.cola.append(_Objetivo(obj, direcciones))
+
+    def _retirar(self, sock: socket.socket) -> Tuple[_Objetivo, str, float]:
+        entrada = self.activos.pop(sock)
+        entrada[0].en_curso -= 1
+        self.al_retirar(sock)
+        sock.close()
+        return entrada
+
+    def _fallo(self, o: _Objetivo, ip: str, error: str, real: bool = True) -> None:
+        f = _familia(ip)
+        fam = o.familias[f]
+        fam["ip"] = ip
+        if real or fam["error"] is None:
+            fam["error"] = error
+        if real:
+            o.fallos[f] += 1
+        # Como en RFC 8305, si un intento falla el siguiente sale ya
+        o.proximo = 0.0
+
+    def _exito(self, o: _Objetivo, ip: str, inicio: float) -> None:
+        f = _familia(ip)
+        o.familias[f].update(abierto=True, ip=ip, error=None,
+                             tiempo_ms=round((time.perf_counter() - inicio) * 1000.0, 3))
+        if o.ganadora is None:
+            o.ganadora = f
+            # Carrera decidida: la otra familia ya no necesita ventaja, sólo se mide
+            o.proximo = 0.0
+        # Los demás intentos en curso de la misma familia sobran
+        for sock in [s for s, (otro, ip_otro, _) in self.activos.items() if otro is o and _familia(ip_otro) == f]:
+            self._retirar(sock)
+
+    def _intentar(self, o: _Objetivo, ip: str) -> Optional[socket.socket]:
+        o.siguiente += 1
+        ahora = time.perf_counter()
+        o.proximo = ahora + self.retraso
+        try:
+            sock = socket.socket(socket.AF_INET6 if _familia(ip) == "ipv6" else socket.AF_INET, socket.SOCK_STREAM)
+        except OSError as e:
+            self._fallo(o, ip, _nombre_error(e.errno) if e.errno else str(e), real=False)
+            return None
+        try:
+            sock.setblocking(False)
+            err = sock.connect_ex((ip, o.clave[1]))
+        except OSError as e:
+            err = e.errno or -1
+        if err in _EN_CURSO:
+            self.activos[sock] = (o, ip, ahora)
+            o.en_curso += 1
+            return sock
+        sock.close()
+        if err == 0:
+            self._exito(o, ip, ahora)
+        else:
+            self._fallo(o, ip, _nombre_error(err), real=err not in _SIN_RUTA)
+        return None
+
+    def lanzar(self) -> List[socket.socket]:
+        """
+        Cierra los objetivos terminados o vencidos e inicia los intentos que tocan (sin pasar de
+        'max_simultaneos' sockets); devuelve los sockets en curso nuevos.
+        """
+        self._cerrar_terminados()
+        while self.cola and len(self.activos) < self.max_simultaneos:
+            o = self.cola.popleft()
+            o.plazo = self.limite
+            self.abiertos.append(o)
+            if len(self.abiertos) >= self.max_simultaneos:
+                break
+        nuevos = []
+        for o in self.abiertos:
+            while len(self.activos) < self.max_simultaneos and o.proximo <= time.perf_counter() < o.plazo:
+                ip = o.pendiente()
+                if ip is None:
+                    break
+                sock = self._intentar(o, ip)
+                if sock is not None:
+                    nuevos.append(sock)
+        self._cerrar_terminados()
+        return nuevos
+
+    def _cerrar_terminados(self) -> None:
+        ahora = time.perf_counter()
+        for o in list(self.abiertos):
+            if ahora >= o.plazo:
+                for sock in [s for s, entrada in self.activos.items() if entrada[0] is o]:
+                    _, ip, _ = self._retirar(sock)
+                    self._fallo(o, ip, "timeout")
+            elif not o.terminado():
+                continue
+            self.abiertos.remove(o)
+            self._resumir(o)
+
+    def _resumir(self, o: _Objetivo) -> None:
+        for f, fam in o.familias.items():
+            if fam["abierto"] is None and o.fallos[f]:
+                fam["abierto"] = False
+        res = self.resultados[o.clave]
+        res["familias"] = o.familias
+        res["familia"] = o.ganadora
+        if o.ganadora is not None:
+            gan = o.familias[o.ganadora]
+            res.update(abierto=True, ip=gan["ip"], tiempo_ms=gan["tiempo_ms"], error=None)
+        else:
+            errores = [fam["error"] for fam in o.familias.values() if fam["error"]]
+            res.update(abierto=False, ip=o.direcciones[max(0, o.siguiente - 1)],
+                       error=errores[0] if errores else "timeout")
+
+    def completar(self, sock: socket.socket) -> None:
+        """
+        El socket es escribible: el connect terminó, bien o con error (SO_ERROR). Lo cierra.
+        """
+        if sock not in self.activos:
+            return
+        try:
+            err = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+        except OSError as e:
+            err = e.errno or -1
+        o, ip, inicio = self._retirar(sock)
+        if err == 0:
+            self._exito(o, ip, inicio)
+        else:
+            self._fallo(o, ip, _nombre_error(err))
+
+    def restante(self) -> float:
+        return max(0.0, self.limite - time.perf_counter())
+
+    def pendientes(self) -> bool:
+        return bool(self.abiertos or self.cola)
+
+    def espera(self) -> float:
+        """
+        Segundos hasta el próximo plazo o el próximo intento escalonado.
+        """
+        instantes = [o.plazo for o in self.abiertos]
+        instantes += [o.proximo for o in self.abiertos if o.pendiente() is not None]
+        if not instantes:
+            return 0.0
+        return max(0.0, min(instantes) - time.perf_counter())
+
+    def cerrar(self) -> Dict[Objetivo, Dict[str, Any]]:
+        for sock in list(self.activos):
+            self._retirar(sock)
+        for o in self.abiertos:
+            self._resumir(o)
+        self.abiertos.clear()
+        return self.resultados
+
+def _resolver(hosts: List[str], timeout: float) -> Dict[str, Optional[List[str]]]:
+    """
+    {host: direcciones ([] si no resuelve, None si no terminó en 'timeout')}, todos a la vez.
+    """
+    if not hosts:
+        return {}
+    pool = ThreadPoolExecutor(max_workers=min(MAX_HILOS_RESOLUCION, len(hosts)), thread_name_prefix="resolver")
+    try:
+        futuros = {h: pool.submit(RESOLUTOR.direcciones, h) for h in hosts}
+        wait(futuros.values(), timeout=timeout)
+        salida = {}
+        for h, fut in futuros.items():
+            if not fut.done():
+                salida[h] = None
+            else:
+                try:
+                    salida[h] = fut.result()
+                except (OSError, UnicodeError):
+                    salida[h] = []
+        return salida
+    finally:
+        # getaddrinfo no se puede interrumpir: las rezagadas terminan solas (y quedan en el caché)
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def escanear(objetivos: Iterable[Objetivo], timeout: float = TIMEOUT_S,
+             max_simultaneos: int = MAX_SIMULTANEOS) -> Dict[Objetivo, Dict[str, Any]]:
+    """
+    Intenta conectar con cada (host, puerto) y devuelve por objetivo:
+    {abierto (True/False, None si no dio tiempo a resolver el nombre), ip y familia ganadoras
+     (o la última ip probada), tiempo_ms (handshake TCP de la ganadora), error,
+     familias {'ipv6'/'ipv4': {abierto, ip, tiempo_ms, error}} (sólo las familias del host;
+     abierto None si no se llegó a intentar o la máquina no tiene esa familia)}.
+    """
+    objetivos = list(dict.fromkeys(objetivos))
+    escaneo = _Escaneo(objetivos, timeout, max_simultaneos)
+    direcciones = _resolver(list(dict.fromkeys(h for h, _ in objetivos)), escaneo.restante())
+    for obj in objetivos:
+        escaneo.agregar(obj, direcciones[obj[0]])
+    sel = selectors.DefaultSelector()
+    escaneo.al_retirar = sel.unregister
+    try:
+        while True:
+            for sock in escaneo.lanzar():
+                sel.register(sock, selectors.EVENT_WRITE)
+            if not escaneo.pendientes():
+                break
+            if not escaneo.activos:
+                # Sólo quedan intentos escalonados por salir
+                time.sleep(escaneo.espera())
+                continue
+            for clave, _ in sel.select(escaneo.espera()):
+                escaneo.completar(clave.fileobj)
+    finally:
+        salida = escaneo.cerrar()
+        sel.close()
+    return salida
+
+async def escanear_async(objetivos: Iterable[Objetivo], timeout: float = TIMEOUT_S,
+                         max_simultaneos: int = MAX_SIMULTANEOS) -> Dict[Objetivo, Dict[str, Any]]:
+    """
+    Como escanear, pero esperando las conexiones en el bucle de eventos (sin hilos salvo getaddrinfo).
+    """
+    loop = asyncio.get_running_loop()
+    if isinstance(loop, getattr(asyncio, "ProactorEventLoop", ())):
+        # El bucle Proactor (Windows) no tiene add_writer: el escaneo síncrono corre en un hilo
+        return await loop.run_in_executor(None, escanear, objetivos, timeout, max_simultaneos)
+    objetivos = list(dict.fromkeys(objetivos))
+    escaneo = _Escaneo(objetivos, timeout, max_simultaneos)
+    hosts = list(dict.fromkeys(h for h, _ in objetivos))
+    tareas = {h: asyncio.ensure_future(RESOLUTOR.direcciones_async(h)) for h in hosts}
+    if tareas:
+        await asyncio.wait(list(tareas.values()), timeout=escaneo.restante())
+    for obj in objetivos:
+        tarea = tareas[obj[0]]
+        if not tarea.done():
+            direcciones = None
+        elif tarea.exception() is not None:
+            direcciones = []
+        else:
+            direcciones = tarea.result()
+        escaneo.agregar(obj, direcciones)
+    for tarea in tareas.values():
+        tarea.cancel()
+
+    evento = asyncio.Event()
+
+    def _listo(sock: socket.socket) -> None:
+        escaneo.completar(sock)
+        evento.set()
+
+    escaneo.al_retirar = loop.remove_writer
+    try:
+        while True:
+            for sock in escaneo.lanzar():
+                loop.add_writer(sock, _listo, sock)
+            if not escaneo.pendientes():
+                break
+            evento.clear()
+            try:
+                await asyncio.wait_for(evento.wait(), escaneo.espera())
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        salida = escaneo.cerrar()
+    return salida
@@ -0,0 +1,219 @@
+# motor_inferencia/estadisticas_rtt.py
+import math
+from statistics import NormalDist
+from typing import Dict, Any, List, Optional, Iterable, Tuple
+
+"""
+Estadísticas de RTT en streaming: se alimentan con una muestra cada vez y usan memoria
+constante, así que sirven igual para los 3 pings de un diagnóstico que para horas de
+monitorización.
+- mínimo, máximo, media y desviación (Welford);
+- jitter al estilo RFC 3550: J += (|D| - J) / 16, con D la diferencia entre RTT consecutivos.
+  Se inicializa con la primera |D| (en lugar de 0) para que sea útil con pocas muestras;
+- EWMA del RTT (alfa = 1/8, como el SRTT de TCP);
+- p50/p95/p99 aproximados con el estimador P² (Jain y Chlamtac, 1985): 5 marcadores por cuantil.
+Las muestras perdidas (None) sólo cuentan para la pérdida y rompen la serie del jitter.
+También da intervalos de confianza: Wilson para la pérdida y t de Student para la latencia media.
+"""
+
+ALFA_EWMA = 0.125
+CUANTILES = (0.50, 0.95, 0.99)
+CONFIANZA = 0.95
+
+def _z(confianza: float) -> float:
+    return NormalDist().inv_cdf(0.5 + confianza / 2)
+
+def _t(confianza: float, gl: int) -> float:
+    """
+    Cuantil t de Student (bilateral) aproximado por la expansión de Cornish-Fisher;
+    error < 1% desde 3 grados de libertad, suficiente para decidir cuándo parar.
+    """
+    z = _z(confianza)
+    return z + (z ** 3 + z) / (4 * gl) + (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * gl ** 2)
+
+def intervalo_wilson(exitos: int, n: int, confianza: float = CONFIANZA) -> Tuple[Optional[float], Optional[float]]:
+    """
+    Intervalo de Wilson para una proporción (se comporta bien con 0 o n éxitos y n pequeño).
+    """
+    if n <= 0:
+        return None, None
+    z = _z(confianza)
+    p = exitos / n
+    centro = (p + z * z / (2 * n)) / (1 + z * z / n)
+    margen = z / (1 + z * z / n) * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n))
+    return max(0.0, centro - margen), min(1.0, centro + margen)
+
+class EstimadorP2:
+    """
+    Cuantil p aproximado sin guardar las muestras (algoritmo P²). Con menos de 5 muestras es exacto.
+    """
+
+    def __init__(self, p: float):
+        if not 0.0 < p < 1.0:
+            raise ValueError("El cuantil debe estar entre 0 y 1")
+        self.p = p
+        self.n = 0
+        self._q: List[float] = []                 # alturas de los marcadores
+        self._pos = [1, 2, 3, 4, 5]               # posiciones reales
+        self._deseada = [1.0, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5.0]
+        self._incremento = [0.0, p / 2, p, (1 + p) / 2, 1.0]
+
+    def agregar(self, x: float) -> None:
+        self.n += 1
+        q = self._q
+        if self.n <= 5:
+            q.append(x)
+            q.sort()
+            return
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = max(q[4], x)
+            k = 3
+        else:
+            k = 0
+            while x >= q[k + 1]:
+                k += 1
+        for i in range(k + 1, 5):
+            self._pos[i] += 1
+        for i in range(5):
+            self._deseada[i] += self._incremento[i]
+        for i in (1, 2, 3):
+            d = self._deseada[i] - self._pos[i]
+            if (d >= 1 and self._pos[i + 1] - self._pos[i] > 1) or (d <= -1 and self._pos[i - 1] - self._pos[i] < -1):
+                s = 1 if d > 0 else -1
+                nuevo = self._parabolico(i, s)
+                if not q[i - 1] < nuevo < q[i + 1]:
+                    nuevo = q[i] + s * (q[i + s] - q[i]) / (self._pos[i + s] - self._pos[i])
+                q[i] = nuevo
+                self._pos[i] += s
+
+    def _parabolico(self, i: int, s: int) -> float:
+        q, n = self._q, self._pos
+        return q[i] + s / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + s) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - s) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+
+    def valor(self) -> Optional[float]:
+        if self.n == 0:
+            return None
+        if self.n <= 5:
+            # Exacto por interpolación lineal (como numpy.percentile)
+            h = (self.n - 1) * self.p
+            i = int(math.floor(h))
+            if i + 1 >= self.n:
+                return self._q[self.n - 1]
+            return self._q[i] + (h - i) * (self._q[i + 1] - self._q[i])
+        return self._q[2]
+
+class EstadisticasRTT:
+    """
+    Acumulador de muestras de RTT (ms); None = paquete perdido.
+    """
+
+    def __init__(self, cuantiles: Iterable[float] = CUANTILES, alfa: float = ALFA_EWMA):
+        self.alfa = alfa
+        self.enviados = 0
+        self.recibidos = 0
+        self.minimo: Optional[float] = None
+        self.maximo: Optional[float] = None
+        self.media: Optional[float] = None
+        self._m2 = 0.0
+        self.jitter: Optional[float] = None
+        self.ewma: Optional[float] = None
+        self._anterior: Optional[float] = None
+        self.cuantiles = {p: EstimadorP2(p) for p in cuantiles}
+
+    def agregar(self, rtt: Optional[float]) -> None:
+        self.enviados += 1
+        if rtt is None:
+            self._anterior = None
+            return
+        rtt = float(rtt)
+        self.recibidos += 1
+        self.minimo = rtt if self.minimo is None else min(self.minimo, rtt)
+        self.maximo = rtt if self.maximo is None else max(self.maximo, rtt)
+        if self.media is None:
+            self.media = rtt
+        else:
+            delta = rtt - self.media
+            self.media += delta / self.recibidos
+            self._m2 += delta * (rtt - self.media)
+        self.ewma = rtt if self.ewma is None else self.ewma + self.alfa * (rtt - self.ewma)
+        if self._anterior is not None:
+            d = abs(rtt - self._anterior)
+            self.jitter = d if self.jitter is None else self.jitter + (d - self.jitter) / 16.0
+        self._anterior = rtt
+        for est in self.cuantiles.values():
+            est.agregar(rtt)
+
+    def extender(self, rtts: Iterable[Optional[float]]) -> "EstadisticasRTT":
+        for rtt in rtts:
+            self.agregar(rtt)
+        return self
+
+    @property
+    def desviacion(self) -> Optional[float]:
+        if self.recibidos < 2:
+            return None
+        return math.sqrt(self._m2 / (self.recibidos - 1))
+
+    @property
+    def perdida_pct(self) -> Optional[float]:
+        if not self.enviados:
+            return None
+        return (self.enviados - self.recibidos) / self.enviados * 100.0
+
+    def cuantil(self, p: float) -> Optional[float]:
+        return self.cuantiles[p].valor()
+
+    def intervalo_perdida(self, confianza: float = CONFIANZA) -> Tuple[Optional[float], Optional[float]]:
+        """
+        Intervalo de confianza de la pérdida, en %.
+        """
+        inf, sup = intervalo_wilson(self.enviados - self.recibidos, self.enviados, confianza)
+        return (None, None) if inf is None else (inf * 100.0, sup * 100.0)
+
+    def intervalo_latencia(self, confianza: float = CONFIANZA) -> Tuple[Optional[float], Optional[float]]:
+        """
+        Intervalo de confianza de la latencia media (ms); hacen falta al menos dos respuestas.
+        """
+        if self.recibidos < 2:
+            return None, None
+        margen = _t(confianza, self.recibidos - 1) * self.desviacion / math.sqrt(self.recibidos)
+        return max(0.0, self.media - margen), self.media + margen
+
+    def hechos(self) -> Dict[str, Any]:
+        """
+        Hechos para 'datos': rtt_min_ms, rtt_max_ms, rtt_desv_ms, rtt_ewma_ms, jitter_ms, rtt_pXX_ms,
+        muestras_ping y los intervalos de confianza (95%) de pérdida y latencia media
+        (None si no hay muestras suficientes).
+        """
+        def _r(x):
+            return None if x is None else round(x, 3)
+        hechos = {
+            "rtt_min_ms": _r(self.minimo),
+            "rtt_max_ms": _r(self.maximo),
+            "rtt_desv_ms": _r(self.desviacion),
+            "rtt_ewma_ms": _r(self.ewma),
+            "jitter_ms": _r(self.jitter),
+        }
+        for p, est in self.cuantiles.items():
+            hechos[f"rtt_p{int(round(p * 100))}_ms"] = _r(est.valor())
+        perdida_inf, perdida_sup = self.intervalo_perdida()
+        latencia_inf, latencia_sup = self.intervalo_latencia()
+        hechos.update({
+            "muestras_ping": self.enviados,
+            "perdida_ic_inf_pct": _r(perdida_inf),
+            "perdida_ic_sup_pct": _r(perdida_sup),
+            "latencia_ic_inf_ms": _r(latencia_inf),
+            "latencia_ic_sup_ms": _r(latencia_sup),
+        })
+        return hechos
+
+def hechos_rtt(rtts: Iterable[Optional[float]]) -> Dict[str, Any]:
+    """
+    Atajo: hechos de estadísticas de una serie de muestras.
+    """
+    return EstadisticasRTT().extender(rtts).hechos()
@@ -0,0 +1,137 @@
+# motor_inferencia/flota.py
+import asyncio
+import json
+import logging
+import time
+from typing import Dict, Any, List, Iterable, Iterator, AsyncIterator, Union
+
+from sistema_experto_conectividad.motor_inferencia import engine
+from sistema_experto_conectividad.motor_inferencia.pruebas_red import DEFAULT_PING_HOST
+from sistema_experto_conectividad.motor_inferencia.pruebas_red_async import ejecutar_diagnostico_async
+
+"""
+Diagnóstico de una flota de objetivos (gateways de sucursales) con concurrencia acotada.
+Cada objetivo es un dict:
+    {"gateway_ip": "10.1.0.1", "ping_host": "8.8.8.8", "http_hosts": ["www.google.com", ...], "nombre": "..."}
+Solo 'gateway_ip' es obligatorio. Los resultados se entregan a medida que termina cada objetivo
+y cada uno pasa por las mismas reglas (base_de_conocimiento.reglas.REGLAS) vía engine.inferir.
+"""
+
+logger = logging.getLogger("flota")
+
+DEFAULT_CONCURRENCIA = 32
+DEFAULT_HTTP_HOST = "www.google.com"
+
+def normalizar_objetivo(obj: Union[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Acepta un string (IP del gateway) o un dict y devuelve un objetivo completo.
+    """
+    if isinstance(obj, str):
+        obj = {"gateway_ip": obj}
+    if not obj.get("gateway_ip"):
+        raise ValueError(f"Objetivo sin gateway_ip: {obj!r}")
+    http_hosts = obj.get("http_hosts") or [DEFAULT_HTTP_HOST]
+    if isinstance(http_hosts, str):
+        http_hosts = [h for h in http_hosts.split(",") if h]
+    return {
+        "nombre": obj.get("nombre") or obj["gateway_ip"],
+        "gateway_ip": obj["gateway_ip"],
+        "ping_host": obj.get("ping_host") or DEFAULT_PING_HOST,
+        "http_hosts": list(http_hosts),
+    }
+
+def cargar_objetivos(ruta: str) -> List[Dict[str, Any]]:
+    """
+    Lee objetivos desde un archivo:
+    - .json: lista de strings o dicts
+    - texto: una línea por objetivo 'gateway [ping_host [host1,host2,...]]' ('#' = comentario)
+    """
+    with open(ruta, "r", encoding="utf-8") as f:
+        if ruta.lower().endswith(".json"):
+            return [normalizar_objetivo(o) for o in json.load(f)]
+        objetivos = []
+        for linea in f:
+            linea = linea.split("#", 1)[0].strip()
+            if not linea:
+                continue
+            partes = linea.split()
+            obj = {"gateway_ip": partes[0]}
+            if len(partes) > 1:
+                obj["ping_host"] = partes[1]
+            if len(partes) > 2:
+                obj["http_hosts"] = partes[2]
+            objetivos.append(normalizar_objetivo(obj))
+        return objetivos
+
+async def _diagnosticar_objetivo(objetivo: Dict[str, Any], registrar: bool, opciones: Dict[str, Any]) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    try:
+        datos = await ejecutar_diagnostico_async(
+            gateway_ip=objetivo["gateway_ip"],
+            auto_detect_gateway=False,
+            ping_host=objetivo["ping_host"],
+            host_puertos=objetivo["http_hosts"][0],
+            servicios=objetivo["http_hosts"],
+            **opciones
+        )
+        inferencias = engine.inferir(datos)
+        datos["diagnostico"] = "; ".join(inferencias)
+        datos["inferencias"] = inferencias
+        if registrar:
+            await asyncio.to_thread(engine.registrar_en_historial, datos, datos["diagnostico"])
+    except Exception as e:
+        logger.exception("Error diagnosticando %s", objetivo.get("nombre"))
+        datos = {"error": str(e), "diagnostico": f"Error en diagnóstico: {e}", "inferencias": []}
+    datos["objetivo"] = objetivo
+    datos["duracion_ms"] = round((time.perf_counter() - t0) * 1000.0, 1)
+    return datos
+
+async def diagnosticar_flota_async(objetivos: Iterable[Union[str, Dict[str, Any]]],
+                                   concurrencia: int = DEFAULT_CONCURRENCIA, registrar: bool = False,
+                                   **opciones) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Diagnostica todos los objetivos con como mucho 'concurrencia' en vuelo y entrega cada
+    resultado en cuanto termina. Cada resultado lleva en 'flota' el progreso y el
+    rendimiento acumulado (objetivos/s). 'opciones' se pasan a ejecutar_diagnostico_async.
+    """
+    objetivos = [normalizar_objetivo(o) for o in objetivos]
+    semaforo = asyncio.Semaphore(max(1, concurrencia))
+
+    async def _con_limite(obj):
+        async with semaforo:
+            return await _diagnosticar_objetivo(obj, registrar, opciones)
+
+    t0 = time.perf_counter()
+    tareas = [asyncio.ensure_future(_con_limite(o)) for o in objetivos]
+    try:
+        for i, fut in enumerate(asyncio.as_completed(tareas), start=1):
+            res = await fut
+            transcurrido = time.perf_counter() - t0
+            res["flota"] = {
+                "completados": i,
+                "total": len(tareas),
+                "transcurrido_s": round(transcurrido, 3),
+                "objetivos_por_s": round(i / transcurrido, 2) if transcurrido > 0 else None,
+            }
+            yield res
+    finally:
+        for t in tareas:
+            t.cancel()
+
+def diagnosticar_flota(objetivos: Iterable[Union[str, Dict[str, Any]]], concurrencia: int = DEFAULT_CONCURRENCIA,
+                       registrar: bool = False, **opciones) -> Iterator[Dict[str, Any]]:
+    """
+    Versión síncrona (generador) de diagnosticar_flota_async, con su propio bucle de eventos.
+    Las pruebas solo avanzan mientras se consume el generador.
+    """
+    loop = asyncio.new_event_loop()
+    agen = diagnosticar_flota_async(objetivos, concurrencia=concurrencia, registrar=registrar, **opciones)
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(agen.__anext__())
+            except StopAsyncIteration:
+                break
+    finally:
+        loop.run_until_complete(agen.aclose())
+        loop.close()
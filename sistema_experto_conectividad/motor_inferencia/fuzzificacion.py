@@ -1,12 +1,19 @@
 # motor_inferencia/fuzzificacion.py
 from typing import Dict, Any
 
+try:
+    import numpy as np
+except ImportError:  # numpy es opcional: sólo lo usan las versiones *_array y TablaSeveridad
+    np = None
+
 """
 Fuzzificación simple sin dependencia externa pesada.
 Define categorías para latencia y pérdida de paquetes:
 - latencia: baja (<=50ms), media (~50-300ms), alta (>300ms)
 - perdida: baja (<1%), media (1-10%), alta (>10%)
+- jitter: bajo (<=10ms), medio (10-30ms), alto (>30ms), opcional
 Devuelve grados (0..1) y una recomendación difusa.
+Con numpy instalado hay versiones para arrays (series de RTT por ping, recálculo del historial).
 """
 
 def membership_latencia(lat_ms: float) -> Dict[str, float]:
@@ -30,15 +37,118 @@ def membership_perdida(pct: float) -> Dict[str, float]:
     alta = 1.0 if pct > 10 else max(0.0, (pct - 1) / 9) if pct > 1 else 0.0
     return {"baja": baja, "media": media, "alta": alta}
 
-def evaluar_severidad(lat_ms: float, perdida_pct: float) -> str:
+def membership_jitter(jitter_ms: float) -> Dict[str, float]:
+    # Sin jitter (menos de dos respuestas) no aporta severidad
+    if jitter_ms is None:
+        return {"bajo": 1.0, "medio": 0.0, "alto": 0.0}
+    bajo = 1.0 if jitter_ms <= 10 else max(0.0, (30 - jitter_ms) / 20)
+    medio = (jitter_ms - 10) / (30 - 10) if 10 < jitter_ms <= 30 else 0.0
+    alto = 1.0 if jitter_ms > 30 else max(0.0, (jitter_ms - 10) / 20)
+    return {"bajo": bajo, "medio": medio, "alto": alto}
+
+def evaluar_severidad(lat_ms: float, perdida_pct: float, jitter_ms: float = None) -> str:
     """
-    Agrega ambas fuzzificaciones y entrega una severidad textual: 'baja','media','alta'
+    Agrega las fuzzificaciones y entrega una severidad textual: 'baja','media','alta'
     Método simple: si cualquiera tiene grado alto>0.6 => 'alta', else if any media>0.5 => 'media' else 'baja'
+    El jitter es opcional: sin él el resultado es el de latencia y pérdida (y el de las versiones *_array).
     """
     lat = membership_latencia(lat_ms)
     per = membership_perdida(perdida_pct)
-    if lat["alta"] > 0.6 or per["alta"] > 0.6:
+    jit = membership_jitter(jitter_ms)
+    if lat["alta"] > 0.6 or per["alta"] > 0.6 or jit["alto"] > 0.6:
         return "alta"
-    if lat["media"] > 0.5 or per["media"] > 0.5:
+    if lat["media"] > 0.5 or per["media"] > 0.5 or jit["medio"] > 0.5:
         return "media"
     return "baja"
+
+# --- Versiones vectorizadas (NumPy) -------------------------------------------------------
+# Mismas fórmulas que las funciones escalares, aplicadas a arrays completos (NaN = None).
+# La severidad es separable: evaluar_severidad(l, p) = max(nivel_latencia(l), nivel_perdida(p))
+# con niveles 0='baja', 1='media', 2='alta'.
+
+SEVERIDADES = ("baja", "media", "alta")
+
+def _array(x):
+    if np is None:
+        raise RuntimeError("Las versiones vectorizadas requieren numpy")
+    return np.asarray(x, dtype=np.float64)
+
+def membership_latencia_array(lat_ms) -> Dict[str, Any]:
+    lat = _array(lat_ms)
+    nulo = np.isnan(lat)
+    rampa = (lat - 50) / (300 - 50)
+    baja = np.where(lat <= 50, np.clip((50 - lat) / 50, 0.0, 1.0), 0.0)
+    media = np.where((lat > 50) & (lat <= 300), np.clip(rampa, 0.0, 1.0), 0.0)
+    alta = np.where(lat > 300, 1.0, np.maximum(rampa, 0.0))
+    alta[nulo] = 1.0
+    return {"baja": baja, "media": media, "alta": alta}
+
+def membership_perdida_array(pct) -> Dict[str, Any]:
+    per = _array(pct)
+    nulo = np.isnan(per)
+    rampa = (per - 1) / 9
+    baja = np.where(per <= 1, 1.0, np.where(per <= 10, np.maximum((10 - per) / 9, 0.0), 0.0))
+    media = np.where((per > 1) & (per <= 10), (per - 1) / (10 - 1), 0.0)
+    alta = np.where(per > 10, 1.0, np.where(per > 1, np.maximum(rampa, 0.0), 0.0))
+    baja[nulo] = 1.0
+    return {"baja": baja, "media": media, "alta": alta}
+
+def _nivel(grados: Dict[str, Any]):
+    nivel = np.zeros(grados["alta"].shape, dtype=np.int8)
+    nivel[grados["media"] > 0.5] = 1
+    nivel[grados["alta"] > 0.6] = 2
+    return nivel
+
+def nivel_latencia(lat_ms):
+    """
+    Nivel de severidad que aporta la latencia (0/1/2) para cada muestra.
+    """
+    return _nivel(membership_latencia_array(lat_ms))
+
+def nivel_perdida(pct):
+    return _nivel(membership_perdida_array(pct))
+
+def evaluar_severidad_array(lat_ms, perdida_pct, codigos: bool = False):
+    """
+    evaluar_severidad para arrays (se admiten escalares, que se expanden). Devuelve un array de
+    textos ('baja','media','alta') o, con codigos=True, de niveles 0/1/2 (int8).
+    """
+    nivel = np.maximum(nivel_latencia(lat_ms), nivel_perdida(perdida_pct))
+    return nivel if codigos else np.array(SEVERIDADES)[nivel]
+
+class TablaSeveridad:
+    """
+    Tabla precalculada (una por variable, gracias a la separabilidad) para evaluar la severidad
+    con un índice por muestra. Cada celda de 'paso' toma el nivel de su extremo izquierdo, así que
+    puede diferir del cálculo exacto sólo en las celdas que contienen un umbral
+    (p. ej. 175 o 200 ms con paso 0.1: [175.0, 175.1) da 'baja' aunque 175.05 sea 'media').
+    Fuera de [0, maximo) se usa el cálculo exacto.
+    """
+
+    def __init__(self, paso_lat: float = 0.1, max_lat: float = 2000.0,
+                 paso_per: float = 0.01, max_per: float = 100.0):
+        _array(0)
+        self.paso_lat, self.max_lat = paso_lat, max_lat
+        self.paso_per, self.max_per = paso_per, max_per
+        self._lat = nivel_latencia(np.arange(int(np.ceil(max_lat / paso_lat))) * paso_lat)
+        self._per = nivel_perdida(np.arange(int(np.ceil(max_per / paso_per))) * paso_per)
+
+    @staticmethod
+    def _buscar(tabla, x, paso: float, maximo: float, exacto):
+        x = _array(x)
+        dentro = (x >= 0) & (x < maximo)
+        idx = np.zeros(x.shape, dtype=np.intp)
+        np.floor_divide(x, paso, out=idx, where=dentro, casting="unsafe")
+        np.minimum(idx, len(tabla) - 1, out=idx)
+        nivel = tabla[idx]
+        if not dentro.all():
+            fuera = ~dentro
+            nivel[fuera] = exacto(x[fuera])
+        return nivel
+
+    def niveles(self, lat_ms, perdida_pct):
+        return np.maximum(self._buscar(self._lat, lat_ms, self.paso_lat, self.max_lat, nivel_latencia),
+                          self._buscar(self._per, perdida_pct, self.paso_per, self.max_per, nivel_perdida))
+
+    def evaluar(self, lat_ms, perdida_pct):
+        return np.array(SEVERIDADES)[self.niveles(lat_ms, perdida_pct)]
@@ -0,0 +1,288 @@
+# motor_inferencia/inferencia_difusa.py
+import math
+from typing import Dict, Any, List, Tuple, Optional, Callable
+
+try:
+    import numpy as np
+except ImportError:  # numpy es opcional: Mamdani recurre a listas de Python
+    np = None
+
+"""
+Inferencia difusa (Mamdani y Sugeno) para calcular un índice de severidad 0..100.
+- Funciones de pertenencia configurables: triangulo, trapecio (admite -inf/inf como hombros)
+  y gaussiana.
+- Reglas 'si <var> es <término> [y|o ...] entonces <término de salida>' con peso.
+- Mamdani: mínimo para 'y', máximo para 'o', implicación por mínimo, agregación por máximo
+  y desfuzzificación por centroide sobre el universo de salida discretizado.
+- Sugeno: salida de cada regla constante o lineal en las entradas; media ponderada.
+Al construir el sistema se precompila todo lo que no depende de las entradas (términos usados,
+reglas como índices, curvas de salida muestreadas), así que evaluar cuesta microsegundos.
+Una entrada ausente (None) toma los grados de 'ausente' de su variable (por defecto 0 en todos
+los términos, así que las reglas con 'y' que la usan no se activan).
+"""
+
+# --- Funciones de pertenencia ---------------------------------------------------------
+
+class FuncionPertenencia:
+    __slots__ = ("tipo", "params", "_fn")
+
+    def __init__(self, tipo: str, params: Tuple[float, ...], fn: Callable[[float], float]):
+        self.tipo, self.params, self._fn = tipo, params, fn
+
+    def __call__(self, x: float) -> float:
+        return self._fn(x)
+
+    def __repr__(self) -> str:
+        return f"{self.tipo}{self.params}"
+
+def trapecio(a: float, b: float, c: float, d: float) -> FuncionPertenencia:
+    """
+    0 fuera de [a, d], 1 en [b, c] y rampas lineales entre medias. a=b=-inf o c=d=inf dan hombros.
+    """
+    if not a <= b <= c <= d:
+        raise ValueError(f"trapecio requiere a <= b <= c <= d: {(a, b, c, d)}")
+
+    def fn(x: float) -> float:
+        if x < b:
+            return 0.0 if x <= a else (x - a) / (b - a)
+        if x > c:
+            return 0.0 if x >= d else (d - x) / (d - c)
+        return 1.0
+    return FuncionPertenencia("trapecio", (a, b, c, d), fn)
+
+def triangulo(a: float, b: float, c: float) -> FuncionPertenencia:
+    f = trapecio(a, b, b, c)
+    f.tipo, f.params = "triangulo", (a, b, c)
+    return f
+
+def gaussiana(centro: float, sigma: float) -> FuncionPertenencia:
+    if sigma <= 0:
+        raise ValueError("gaussiana requiere sigma > 0")
+    k = -0.5 / (sigma * sigma)
+    return FuncionPertenencia("gaussiana", (centro, sigma), lambda x: math.exp(k * (x - centro) ** 2))
+
+_TIPOS = {"trapecio": trapecio, "triangulo": triangulo, "gaussiana": gaussiana}
+
+def funcion_desde_config(spec: Any) -> FuncionPertenencia:
+    """
+    ["trapecio", [a, b, c, d]] / ["triangulo", [a, b, c]] / ["gaussiana", [c, s]]; "inf"/"-inf" valen.
+    """
+    if isinstance(spec, FuncionPertenencia):
+        return spec
+    tipo, params = spec
+    if tipo not in _TIPOS:
+        raise ValueError(f"Función de pertenencia desconocida: {tipo!r}")
+    return _TIPOS[tipo](*(float(p) for p in params))
+
+# --- Variables y reglas -----------------------------------------------------------------
+
+class VariableDifusa:
+    def __init__(self, nombre: str, terminos: Dict[str, Any], ausente: Optional[Dict[str, float]] = None,
+                 rango: Optional[Tuple[float, float]] = None):
+        self.nombre = nombre
+        self.terminos = {t: funcion_desde_config(f) for t, f in terminos.items()}
+        self.ausente = dict(ausente or {})
+        self.rango = tuple(rango) if rango else None
+        desconocidos = set(self.ausente) - set(self.terminos)
+        if desconocidos:
+            raise ValueError(f"{nombre}: 'ausente' usa términos inexistentes {sorted(desconocidos)}")
+
+class ReglaDifusa:
+    """
+    si: [(variable, término), ...] unidos por 'y' u 'o'; entonces: término de salida (Mamdani)
+    o salida Sugeno: constante o (c0, {variable: coeficiente}).
+    """
+
+    def __init__(self, si: List[Tuple[str, str]], entonces: Any, op: str = "y", peso: float = 1.0):
+        if op not in ("y", "o"):
+            raise ValueError(f"Conectivo desconocido: {op!r}")
+        if not si:
+            raise ValueError("La regla necesita al menos un antecedente")
+        self.si = [tuple(a) for a in si]
+        self.entonces = entonces
+        self.op = op
+        self.peso = float(peso)
+
+class SistemaDifuso:
+    """
+    Sistema Mamdani o Sugeno precompilado. evaluar(entradas) -> {valor, etiqueta, activaciones}.
+    """
+
+    def __init__(self, tipo: str, entradas: List[VariableDifusa], reglas: List[ReglaDifusa],
+                 salida: Optional[VariableDifusa] = None, puntos: int = 201):
+        if tipo not in ("mamdani", "sugeno"):
+            raise ValueError(f"Tipo de sistema desconocido: {tipo!r}")
+        self.tipo = tipo
+        self.entradas = {v.nombre: v for v in entradas}
+        self.salida = salida
+        self.reglas = list(reglas)
+        if salida is None:
+            raise ValueError("Falta la variable de salida (términos para Mamdani/etiquetas; rango)")
+        if salida.rango is None:
+            raise ValueError("La variable de salida necesita 'rango'")
+
+        # Sólo se calculan los grados de los términos que usa alguna regla
+        usados: Dict[Tuple[str, str], int] = {}
+        self._reglas_c = []
+        for r in self.reglas:
+            idxs = []
+            for var, term in r.si:
+                if var not in self.entradas or term not in self.entradas[var].terminos:
+                    raise ValueError(f"Regla con antecedente desconocido: {var} es {term}")
+                idxs.append(usados.setdefault((var, term), len(usados)))
+            if tipo == "mamdani":
+                if r.entonces not in salida.terminos:
+                    raise ValueError(f"Regla con consecuente desconocido: {r.entonces!r}")
+                consecuente = list(salida.terminos).index(r.entonces)
+            else:
+                consecuente = self._salida_sugeno(r.entonces)
+            self._reglas_c.append((tuple(idxs), r.op == "y", r.peso, consecuente))
+        self._terminos = [(var, term, self.entradas[var].terminos[term], self.entradas[var].ausente.get(term, 0.0))
+                          for (var, term) in usados]
+
+        # Universo de salida muestreado y curvas de cada término (para Mamdani y para la etiqueta)
+        lo, hi = salida.rango
+        self.universo = [lo + (hi - lo) * i / (puntos - 1) for i in range(puntos)]
+        self._nombres_salida = list(salida.terminos)
+        curvas = [[f(y) for y in self.universo] for f in salida.terminos.values()]
+        if np is not None:
+            self._y = np.array(self.universo)
+            self._curvas = np.array(curvas)
+        else:
+            self._y, self._curvas = self.universo, curvas
+
+    def _salida_sugeno(self, entonces: Any) -> Tuple[float, Tuple[Tuple[str, float], ...]]:
+        if isinstance(entonces, (int, float)):
+            return float(entonces), ()
+        c0, coefs = entonces
+        for v in coefs:
+            if v not in self.entradas:
+                raise ValueError(f"Salida Sugeno con variable desconocida: {v!r}")
+        return float(c0), tuple((v, float(c)) for v, c in coefs.items())
+
+    def _grados(self, entradas: Dict[str, Any]) -> List[float]:
+        grados = []
+        for var, _, fn, ausente in self._terminos:
+            x = entradas.get(var)
+            grados.append(ausente if x is None else fn(x))
+        return grados
+
+    def evaluar(self, entradas: Dict[str, Any]) -> Dict[str, Any]:
+        grados = self._grados(entradas)
+        activaciones = []
+        for idxs, es_y, peso, _ in self._reglas_c:
+            g = [grados[i] for i in idxs]
+            activaciones.append((min(g) if es_y else max(g)) * peso)
+        valor = self._mamdani(activaciones) if self.tipo == "mamdani" else self._sugeno(activaciones, entradas)
+        return {"valor": valor, "etiqueta": self.etiqueta(valor), "activaciones": activaciones}
+
+    def _mamdani(self, activaciones: List[float]) -> Optional[float]:
+        # Activación por término de salida (máximo de las reglas que lo concluyen)
+        alfas = [0.0] * len(self._nombres_salida)
+        for a, (_, _, _, t) in zip(activaciones, self._reglas_c):
+            if a > alfas[t]:
+                alfas[t] = a
+        if not any(alfas):
+            return None
+        if np is not None:
+            agregada = np.minimum(np.array(alfas)[:, None], self._curvas).max(axis=0)
+            total = agregada.sum()
+            return float(agregada @ self._y / total) if total > 0 else None
+        agregada = [max(min(a, c[i]) for a, c in zip(alfas, self._curvas)) for i in range(len(self._y))]
+        total = sum(agregada)
+        return sum(m * y for m, y in zip(agregada, self._y)) / total if total > 0 else None
+
+    def _sugeno(self, activaciones: List[float], entradas: Dict[str, Any]) -> Optional[float]:
+        num = den = 0.0
+        for a, (_, _, _, (c0, coefs)) in zip(activaciones, self._reglas_c):
+            if a <= 0.0:
+                continue
+            z = c0
+            for v, c in coefs:
+                x = entradas.get(v)
+                z += c * (x if x is not None else 0.0)
+            num += a * z
+            den += a
+        if den == 0.0:
+            return None
+        lo, hi = self.salida.rango
+        return min(hi, max(lo, num / den))
+
+    def etiqueta(self, valor: Optional[float]) -> Optional[str]:
+        """
+        Término de salida con mayor pertenencia en 'valor'.
+        """
+        if valor is None:
+            return None
+        return max(self.salida.terminos.items(), key=lambda t: t[1](valor))[0]
+
+def sistema_desde_config(cfg: Dict[str, Any]) -> SistemaDifuso:
+    """
+    Construye un sistema desde un dict (apto para JSON):
+    {"tipo": "mamdani"|"sugeno", "puntos": 201,
+     "entradas": {nombre: {"terminos": {t: ["trapecio", [a,b,c,d]]}, "ausente": {t: grado}}},
+     "salida": {"nombre": "severidad", "rango": [0, 100], "terminos": {...}},
+     "reglas": [{"si": [[var, t], ...], "op": "y"|"o", "entonces": t | c | [c0, {var: coef}], "peso": 1}]}
+    """
+    entradas = [VariableDifusa(n, v["terminos"], v.get("ausente"), v.get("rango")) for n, v in cfg["entradas"].items()]
+    s = cfg["salida"]
+    salida = VariableDifusa(s.get("nombre", "salida"), s["terminos"], rango=s["rango"])
+    reglas = [ReglaDifusa(r["si"], r["entonces"], r.get("op", "y"), r.get("peso", 1.0)) for r in cfg["reglas"]]
+    return SistemaDifuso(cfg.get("tipo", "mamdani"), entradas, reglas, salida, cfg.get("puntos", 201))
+
+# --- Sistema por defecto para la severidad -------------------------------------------------
+
+INF = float("inf")
+
+CONFIG_SEVERIDAD: Dict[str, Any] = {
+    "tipo": "mamdani",
+    "entradas": {
+        # Sin latencia (no hubo respuesta) se considera alta, como en fuzzificacion
+        "latencia_ms": {"terminos": {"baja": ["trapecio", [-INF, -INF, 30, 80]],
+                                     "media": ["trapecio", [30, 80, 150, 300]],
+                                     "alta": ["trapecio", [150, 300, INF, INF]]},
+                        "ausente": {"alta": 1.0}},
+        "perdida_pct": {"terminos": {"baja": ["trapecio", [-INF, -INF, 0.5, 2]],
+                                     "media": ["trapecio", [0.5, 2, 5, 10]],
+                                     "alta": ["trapecio", [5, 10, INF, INF]]},
+                        "ausente": {"baja": 1.0}},
+        "jitter_ms": {"terminos": {"bajo": ["trapecio", [-INF, -INF, 5, 15]],
+                                   "medio": ["trapecio", [5, 15, 30, 60]],
+                                   "alto": ["trapecio", [30, 60, INF, INF]]}},
+        "tiempo_dns_ms": {"terminos": {"rapido": ["trapecio", [-INF, -INF, 50, 150]],
+                                       "lento": ["trapecio", [50, 150, 500, 1500]],
+                                       "muy_lento": ["trapecio", [500, 1500, INF, INF]]}},
+        "tiempo_handshake_ms": {"terminos": {"rapido": ["trapecio", [-INF, -INF, 80, 200]],
+                                             "lento": ["trapecio", [80, 200, 500, 1000]],
+                                             "muy_lento": ["trapecio", [500, 1000, INF, INF]]}},
+    },
+    "salida": {"nombre": "severidad", "rango": [0, 100],
+               "terminos": {"baja": ["trapecio", [-INF, -INF, 15, 35]],
+                            "media": ["triangulo", [25, 50, 75]],
+                            "alta": ["trapecio", [65, 85, INF, INF]]}},
+    "reglas": [
+        {"si": [["latencia_ms", "alta"], ["perdida_pct", "alta"]], "op": "o", "entonces": "alta"},
+        {"si": [["latencia_ms", "media"], ["perdida_pct", "media"]], "op": "o", "entonces": "media"},
+        {"si": [["latencia_ms", "baja"], ["perdida_pct", "baja"]], "op": "y", "entonces": "baja"},
+        {"si": [["jitter_ms", "alto"]], "entonces": "alta", "peso": 0.8},
+        {"si": [["jitter_ms", "medio"]], "entonces": "media"},
+        {"si": [["tiempo_dns_ms", "muy_lento"], ["tiempo_handshake_ms", "muy_lento"]], "op": "o", "entonces": "alta", "peso": 0.7},
+        {"si": [["tiempo_dns_ms", "lento"], ["tiempo_handshake_ms", "lento"]], "op": "o", "entonces": "media", "peso": 0.7},
+    ],
+}
+
+_sistema: Optional[SistemaDifuso] = None
+
+def sistema_severidad() -> SistemaDifuso:
+    global _sistema
+    if _sistema is None:
+        _sistema = sistema_desde_config(CONFIG_SEVERIDAD)
+    return _sistema
+
+def indice_severidad(datos: Dict[str, Any], sistema: Optional[SistemaDifuso] = None) -> Dict[str, Any]:
+    """
+    {'indice_severidad': 0..100 o None, 'severidad_difusa': etiqueta o None} para los hechos de 'datos'.
+    """
+    res = (sistema or sistema_severidad()).evaluar(datos)
+    valor = res["valor"]
+    return {"indice_severidad": None if valor is None else round(valor, 1), "severidad_difusa": res["etiqueta"]}
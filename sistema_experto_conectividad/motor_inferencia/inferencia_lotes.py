@@ -0,0 +1,292 @@
+# motor_inferencia/inferencia_lotes.py
+from typing import Dict, Any, List, Iterable, Optional
+
+try:
+    import numpy as np
+except ImportError:  # numpy es opcional: sin él sólo está disponible engine.inferir
+    np = None
+
+from sistema_experto_conectividad.base_de_conocimiento import cargador_reglas
+from sistema_experto_conectividad.motor_inferencia.compilador_reglas import MotorReglas, NodoTabla, Hallazgo
+
+"""
+Inferencia por lotes: aplica el motor compilado (REGLAS + reglas en archivo) a muchos
+diagnósticos a la vez, guardados por columnas (un array NumPy por hecho, una fila por diagnóstico).
+- Nodos de tablas: cada fila se codifica como índice de la tabla (None/False/True por hecho) y
+  se agrupan las filas por índice; cada grupo recibe los hallazgos de su entrada.
+- Reglas directas: se filtran las filas con los hechos de 'requiere' presentes y, si la regla
+  tiene 'mascara' (reglas.regla), con su versión vectorizada; la regla se llama sólo en esas
+  filas, así que el mensaje y la decisión final son los de la regla escalar.
+El resultado de cada fila es el mismo que engine.inferir sobre lote.fila(i). En las columnas,
+NaN (o None en arrays object) significa hecho ausente, y en lote.fila(i) la clave no aparece.
+"""
+
+FALLO_NO_IDENTIFICADO = "Fallo no identificado: requiere diagnóstico avanzado."
+
+# Códigos de estado por fila: índice en (None, False, True) como en compilador_reglas; -1 = otro valor
+_OTRO = -1
+_CODIGO = {False: 1, True: 2}
+
+def disponible() -> bool:
+    return np is not None
+
+def _es_nulo(v: Any) -> bool:
+    return v is None or (isinstance(v, float) and v != v)
+
+def _estado(v: Any) -> int:
+    if _es_nulo(v):
+        return 0
+    try:
+        # Misma búsqueda que la tabla del nodo: 0/1 (y 0.0/1.0) coinciden con False/True
+        return _CODIGO.get(v, _OTRO)
+    except TypeError:
+        return _OTRO
+
+class Lote:
+    """
+    Diagnósticos por columnas: {hecho: array de longitud n}.
+    """
+
+    def __init__(self, columnas: Dict[str, Any]):
+        if np is None:
+            raise RuntimeError("La inferencia por lotes requiere numpy")
+        self.columnas = {k: np.asarray(v) for k, v in columnas.items()}
+        tamanos = {len(v) for v in self.columnas.values()}
+        if len(tamanos) > 1:
+            raise ValueError(f"Columnas de distinta longitud: {sorted(tamanos)}")
+        self.n = tamanos.pop() if tamanos else 0
+        self._estados: Dict[str, Any] = {}
+        self._numericas: Dict[str, Any] = {}
+        self._listas: Dict[str, List[Any]] = {}
+
+    def __len__(self) -> int:
+        return self.n
+
+    def _lista(self, hecho: str) -> List[Any]:
+        # Columna como lista de objetos Python (None en lugar de NaN), calculada una vez
+        lista = self._listas.get(hecho)
+        if lista is None:
+            col = self.columnas[hecho]
+            lista = col.tolist()
+            if col.dtype.kind == "f":
+                for j in np.flatnonzero(np.isnan(col)).tolist():
+                    lista[j] = None
+            elif col.dtype.kind == "O":
+                lista = [None if _es_nulo(v) else v for v in lista]
+            self._listas[hecho] = lista
+        return lista
+
+    def fila(self, i: int, hechos: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """
+        La fila i como el dict 'datos' que recibiría engine.inferir (los ausentes no aparecen).
+        Con 'hechos' sólo se incluyen esos.
+        """
+        fila = {}
+        for k in (self.columnas if hechos is None else hechos):
+            if k in self.columnas:
+                v = self._lista(k)[i]
+                if v is not None:
+                    fila[k] = v
+        return fila
+
+    def estados(self, hecho: str):
+        e = self._estados.get(hecho)
+        if e is not None:
+            return e
+        col = self.columnas.get(hecho)
+        if col is None:
+            e = np.zeros(self.n, dtype=np.int8)
+        elif col.dtype == np.bool_:
+            e = col.astype(np.int8) + 1
+        elif col.dtype.kind in "iuf":
+            e = np.full(self.n, _OTRO, dtype=np.int8)
+            e[col == 0] = 1
+            e[col == 1] = 2
+            if col.dtype.kind == "f":
+                e[np.isnan(col)] = 0
+        else:
+            e = np.fromiter((_estado(v) for v in col), dtype=np.int8, count=self.n)
+        self._estados[hecho] = e
+        return e
+
+    def presente(self, hecho: str):
+        return self.estados(hecho) != 0
+
+    def numerica(self, hecho: str):
+        """
+        Columna como float64 con NaN para los ausentes. Lanza TypeError/ValueError si no es numérica.
+        """
+        c = self._numericas.get(hecho)
+        if c is not None:
+            return c
+        col = self.columnas.get(hecho)
+        if col is None:
+            c = np.full(self.n, np.nan)
+        elif col.dtype.kind in "biuf":
+            c = col.astype(np.float64)
+        else:
+            c = np.array([np.nan if _es_nulo(v) else float(v) for v in col], dtype=np.float64)
+        self._numericas[hecho] = c
+        return c
+
+class _VistaNumerica:
+    """
+    Acceso col["hecho"] para las máscaras de reglas.regla.
+    """
+
+    def __init__(self, lote: Lote):
+        self._lote = lote
+
+    def __getitem__(self, hecho: str):
+        return self._lote.numerica(hecho)
+
+def columnas_desde_registros(registros: Iterable[Dict[str, Any]], hechos: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Pasa una lista de dicts (p. ej. el historial) a columnas. Cada columna queda como bool si
+    todos sus valores son bool, float64 (NaN = ausente) si todos son números o None, y object si no.
+    """
+    if np is None:
+        raise RuntimeError("La inferencia por lotes requiere numpy")
+    registros = list(registros)
+    if hechos is None:
+        hechos = list(dict.fromkeys(k for r in registros for k in r))
+    columnas = {}
+    for h in hechos:
+        valores = [r.get(h) for r in registros]
+        if all(v is True or v is False for v in valores):
+            columnas[h] = np.array(valores, dtype=np.bool_)
+        elif all(v is None or (isinstance(v, (int, float)) and not isinstance(v, bool)) for v in valores):
+            columnas[h] = np.array([np.nan if v is None else v for v in valores], dtype=np.float64)
+        else:
+            col = np.empty(len(valores), dtype=object)
+            col[:] = valores
+            columnas[h] = col
+    return columnas
+
+class _Salida:
+    """
+    Hallazgos acumulados como columnas (fila, -prioridad, índice de regla, id de mensaje).
+    """
+
+    def __init__(self):
+        self.filas: List[Any] = []
+        self.prios: List[Any] = []
+        self.idxs: List[Any] = []
+        self.msgs: List[Any] = []
+        self.sueltos: List[tuple] = []  # hallazgos de reglas evaluadas fila a fila
+        self.mensajes: List[str] = []
+        self._ids: Dict[str, int] = {}
+
+    def _id(self, msg: str) -> int:
+        j = self._ids.get(msg)
+        if j is None:
+            j = self._ids[msg] = len(self.mensajes)
+            self.mensajes.append(msg)
+        return j
+
+    def agregar(self, filas, h: Hallazgo) -> None:
+        m = len(filas)
+        self.filas.append(filas)
+        self.prios.append(np.full(m, h[0], dtype=np.int64))
+        self.idxs.append(np.full(m, h[1], dtype=np.int64))
+        self.msgs.append(np.full(m, self._id(h[2]), dtype=np.int64))
+
+    def agregar_fila(self, i: int, hallazgos: List[Hallazgo]) -> None:
+        for prio, idx, msg in hallazgos:
+            self.sueltos.append((i, prio, idx, self._id(msg)))
+
+    def por_fila(self, n: int) -> List[List[str]]:
+        if self.sueltos:
+            sueltos = np.array(self.sueltos, dtype=np.int64)
+            self.filas.append(sueltos[:, 0])
+            self.prios.append(sueltos[:, 1])
+            self.idxs.append(sueltos[:, 2])
+            self.msgs.append(sueltos[:, 3])
+            self.sueltos = []
+        if not self.filas:
+            return [[FALLO_NO_IDENTIFICADO] for _ in range(n)]
+        filas = np.concatenate(self.filas)
+        prios = np.concatenate(self.prios)
+        idxs = np.concatenate(self.idxs)
+        msgs = np.concatenate(self.msgs)
+        # Orden (fila, -prioridad, regla) con una sola clave entera si cabe en int64
+        rango_p, prios = np.unique(prios, return_inverse=True)
+        num_p, num_r = len(rango_p), int(idxs.max()) + 1
+        if n * num_p * num_r < 2 ** 62:
+            orden = np.argsort((filas * num_p + prios) * num_r + idxs, kind="stable")
+        else:
+            orden = np.lexsort((idxs, prios, filas))
+        mensajes = self.mensajes
+        textos = [mensajes[j] for j in msgs[orden].tolist()]
+        cortes = np.searchsorted(filas[orden], np.arange(n + 1)).tolist()
+        return [textos[cortes[i]:cortes[i + 1]] or [FALLO_NO_IDENTIFICADO] for i in range(n)]
+
+def _agrupar(clave):
+    """
+    (valores únicos, filas de cada valor) sin recorrer las filas en Python.
+    """
+    unicos, inversa = np.unique(clave, return_inverse=True)
+    orden = np.argsort(inversa, kind="stable")
+    cortes = np.searchsorted(inversa[orden], np.arange(len(unicos) + 1))
+    return unicos, [orden[cortes[j]:cortes[j + 1]] for j in range(len(unicos))]
+
+def _evaluar_nodo(nodo: NodoTabla, lote: Lote, salida: _Salida) -> None:
+    entradas = list(nodo.tabla.values())  # en el orden de itertools.product
+    clave = np.zeros(lote.n, dtype=np.int64)
+    otro = np.zeros(lote.n, dtype=np.bool_)
+    for h in nodo.hechos:
+        e = lote.estados(h)
+        otro |= e < 0
+        clave *= 3
+        clave += e
+    clave[otro] = -1
+    unicos, grupos = _agrupar(clave)
+    for u, filas in zip(unicos.tolist(), grupos):
+        if u < 0:
+            for i in filas.tolist():
+                hallazgos: List[Hallazgo] = []
+                nodo.evaluar(lote.fila(i, nodo.hechos), hallazgos)
+                salida.agregar_fila(i, hallazgos)
+            continue
+        for h in entradas[u]:
+            salida.agregar(filas, h)
+
+def _evaluar_directa(unidad, lote: Lote, salida: _Salida) -> None:
+    candidatas = np.ones(lote.n, dtype=np.bool_)
+    for h in unidad.requiere:
+        candidatas &= lote.presente(h)
+    mascara = getattr(unidad.fn, "mascara", None)
+    if mascara is not None:
+        try:
+            candidatas &= np.asarray(mascara(_VistaNumerica(lote)), dtype=np.bool_)
+        except (TypeError, ValueError):
+            pass  # columnas no numéricas: se prueba la regla en todas las candidatas
+    # Una regla declarada con reglas.regla sólo lee sus hechos: basta con construir esos
+    hechos = getattr(unidad.fn, "hechos", None)
+    for i in np.flatnonzero(candidatas).tolist():
+        hallazgos: List[Hallazgo] = []
+        unidad.evaluar(lote.fila(i, hechos), hallazgos)
+        salida.agregar_fila(i, hallazgos)
+
+def inferir_lote(columnas: Any, motor: Optional[MotorReglas] = None) -> List[List[str]]:
+    """
+    Inferencias priorizadas de cada fila (lista de mensajes, como engine.inferir).
+    'columnas' es un dict {hecho: array} o un Lote.
+    """
+    lote = columnas if isinstance(columnas, Lote) else Lote(columnas)
+    motor = motor or cargador_reglas.motor()
+    salida = _Salida()
+    if lote.n == 0:
+        return []
+    for unidad in motor.unidades:
+        if isinstance(unidad, NodoTabla):
+            _evaluar_nodo(unidad, lote, salida)
+        else:
+            _evaluar_directa(unidad, lote, salida)
+    return salida.por_fila(lote.n)
+
+def inferir_registros(registros: Iterable[Dict[str, Any]]) -> List[List[str]]:
+    """
+    Atajo para reprocesar una lista de dicts (flota, historial) por lotes.
+    """
+    return inferir_lote(columnas_desde_registros(registros))
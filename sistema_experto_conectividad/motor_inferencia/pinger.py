@@ -0,0 +1,375 @@
+# motor_inferencia/pinger.py
+import asyncio
+import os
+import random
+import selectors
+import socket
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+from ping3 import ping
+
+from sistema_experto_conectividad.motor_inferencia.resolutor import RESOLUTOR
+from sistema_experto_conectividad.motor_inferencia import sockets_async
+from sistema_experto_conectividad.motor_inferencia.estadisticas_rtt import EstadisticasRTT, CONFIANZA
+
+"""
+Ping por lotes: N echo requests a uno o varios hosts por un único socket ICMP.
+- Los echo salen seguidos sin esperar respuestas: la muestra i a todos los hosts a la vez y
+  'intervalo' (20 ms por defecto) entre una ronda y la siguiente;
+  cada respuesta se empareja con su petición por origen y número de secuencia (y por
+  identificador con SOCK_RAW; con SOCK_DGRAM el kernel lo reescribe).
+- Cada petición espera como mucho 'timeout' desde su envío, así que la prueba dura
+  ~(N-1)*intervalo + RTT si todo responde, y ~(N-1)*intervalo + timeout si no, en lugar de
+  N x (RTT + 150 ms) con ping3.
+- Se devuelven todas las muestras de RTT (None = perdida), no sólo la media.
+Si el sistema no permite sockets ICMP se recurre a ping3, con las peticiones en paralelo.
+
+Muestreo adaptativo (ping_adaptativo): en lugar de un número fijo de pings se envían rondas
+hasta que los intervalos de confianza de pérdida (Wilson) y latencia media (t de Student)
+son lo bastante estrechos, o se llega al máximo de muestras o de tiempo. Se para antes si el
+enlace está claramente sano (sin pérdidas y latencia estable) o muerto (ninguna respuesta).
+"""
+
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+INTERVALO_S = 0.02
+CONTEO_PING = 3              # pings de la prueba de conexión (no adaptativa)
+
+# Muestreo adaptativo
+RONDA_ADAPTATIVA = 5
+MIN_MUESTRAS = 5
+MAX_MUESTRAS = 50
+TIEMPO_MAX_S = 5.0
+ANCHO_PERDIDA_PCT = 30.0     # ancho máximo del intervalo de la pérdida (puntos porcentuales)
+PRECISION_LATENCIA = 0.10    # semiancho máximo del intervalo de la latencia, relativo a la media
+PRECISION_LATENCIA_MIN_MS = 1.0
+
+def _checksum(data: bytes) -> int:
+    if len(data) % 2:
+        data += b"\x00"
+    s = sum(struct.unpack("!%dH" % (len(data) // 2), data))
+    s = (s >> 16) + (s & 0xFFFF)
+    s += s >> 16
+    return ~s & 0xFFFF
+
+def _paquete_echo(ident: int, seq: int, payload: bytes = b"sistema-experto") -> bytes:
+    cab = struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, 0, ident, seq)
+    chk = _checksum(cab + payload)
+    return struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, chk, ident, seq) + payload
+
+def _abrir_socket_icmp() -> Tuple[socket.socket, bool]:
+    """
+    Devuelve (socket, es_raw). Intenta primero ICMP sin privilegios (Linux/macOS) y luego raw.
+    Lanza OSError si ninguno está permitido.
+    """
+    try:
+        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP)
+        raw = False
+    except OSError:
+        s = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP)
+        raw = True
+    s.setblocking(False)
+    return s, raw
+
+def _parsear_echo_reply(data: bytes, raw: bool) -> Optional[Tuple[int, int]]:
+    """
+    Devuelve (ident, seq) si data es un echo reply, o None.
+    Con SOCK_RAW el paquete incluye la cabecera IP.
+    """
+    if raw:
+        if not data:
+            return None
+        data = data[(data[0] & 0x0F) * 4:]
+    if len(data) < 8:
+        return None
+    tipo, _, _, ident, seq = struct.unpack("!BBHHH", data[:8])
+    if tipo != ICMP_ECHO_REPLY:
+        return None
+    return ident, seq
+
+def resumir(rtts: List[Optional[float]]) -> Tuple[bool, Optional[float], float]:
+    """
+    (hay_conexion, latencia_media_ms, perdida_pct) a partir de las muestras, como verificar_conexion.
+    """
+    recibidos = [t for t in rtts if t is not None]
+    perdida = (len(rtts) - len(recibidos)) / len(rtts) * 100.0 if rtts else 100.0
+    latencia = sum(recibidos) / len(recibidos) if recibidos else None
+    return (len(recibidos) > 0, latencia, perdida)
+
+class _Lote:
+    """
+    Peticiones en vuelo de un lote (compartido por la versión síncrona y la asíncrona).
+    """
+
+    def __init__(self, hosts: List[str], count: int, timeout: float):
+        self.count = count
+        self.timeout = timeout
+        self.ips: Dict[str, Optional[str]] = {}
+        for h in hosts:
+            try:
+                self.ips[h] = RESOLUTOR.ipv4(h)
+            except (OSError, UnicodeError):
+                self.ips[h] = None
+        self.rtts: Dict[str, List[Optional[float]]] = {h: [None] * count for h in hosts}
+        # seq -> (host, nº de muestra, ip, instante de envío)
+        self.pendientes: Dict[int, Tuple[str, int, str, float]] = {}
+        self._seq = random.getrandbits(16)
+        self.ident = 0
+        self.raw = False
+
+    def peticiones(self):
+        """
+        (host, ip, nº de muestra) en orden de envío: primero la muestra 0 de todos los hosts, etc.
+        """
+        for i in range(self.count):
+            for h, ip in self.ips.items():
+                if ip is not None:
+                    yield h, ip, i
+
+    def paquete(self, h: str, ip: str, i: int) -> bytes:
+        self._seq = (self._seq + 1) & 0xFFFF
+        self.pendientes[self._seq] = (h, i, ip, time.perf_counter())
+        return _paquete_echo(self.ident, self._seq)
+
+    def recibir(self, data: bytes, origen: Tuple) -> None:
+        t = time.perf_counter()
+        resp = _parsear_echo_reply(data, self.raw)
+        if resp is None or (self.raw and resp[0] != self.ident):
+            return
+        pet = self.pendientes.get(resp[1])
+        if pet is None or pet[2] != origen[0] or t - pet[3] > self.timeout:
+            return
+        del self.pendientes[resp[1]]
+        self.rtts[pet[0]][pet[1]] = (t - pet[3]) * 1000.0
+
+    def espera(self) -> float:
+        """
+        Segundos hasta que vence la petición pendiente más tardía (0 si ya no queda ninguna).
+        """
+        if not self.pendientes:
+            return 0.0
+        return max(p[3] for p in self.pendientes.values()) + self.timeout - time.perf_counter()
+
+    def resultado(self) -> Dict[str, Dict[str, Any]]:
+        salida = {}
+        for h, rtts in self.rtts.items():
+            ok, latencia, perdida = resumir(rtts)
+            salida[h] = {"ip": self.ips[h], "rtts_ms": rtts, "recibidos": sum(t is not None for t in rtts),
+                         "enviados": len(rtts), "latencia_ms": latencia, "perdida_pct": perdida}
+        return salida
+
+def _ping3(ip: str, timeout: float) -> Optional[float]:
+    try:
+        t = ping(ip, timeout=timeout, unit="ms")
+        return float(t) if t else None
+    except Exception:
+        return None
+
+def ping_lote(hosts: List[str], count: int = 3, timeout: float = 2.0,
+              intervalo: float = INTERVALO_S) -> Dict[str, Dict[str, Any]]:
+    """
+    Envía 'count' echo requests a cada host y devuelve por host:
+    {ip, rtts_ms (una muestra por petición, None = perdida), recibidos, enviados, latencia_ms, perdida_pct}.
+    """
+    lote = _Lote(hosts, count, timeout)
+    peticiones = list(lote.peticiones())
+    try:
+        sock, lote.raw = _abrir_socket_icmp()
+    except OSError:
+        # Sin permisos para ICMP: ping3 bloqueante, todas las peticiones a la vez
+        if peticiones:
+            with ThreadPoolExecutor(max_workers=min(32, len(peticiones)), thread_name_prefix="ping") as pool:
+                rtts = list(pool.map(lambda p: _ping3(p[1], timeout), peticiones))
+            for (h, _, i), t in zip(peticiones, rtts):
+                lote.rtts[h][i] = t
+        return lote.resultado()
+    lote.ident = (os.getpid() ^ id(sock)) & 0xFFFF
+    sel = selectors.DefaultSelector()
+    sel.register(sock, selectors.EVENT_READ)
+    try:
+        for n, (h, ip, i) in enumerate(peticiones):
+            if n and intervalo > 0 and i != peticiones[n - 1][2]:
+                # Entre rondas (muestra i a todos los hosts) se atienden las respuestas
+                _atender(sel, lote, sock, intervalo, hasta_vaciar=False)
+            try:
+                sock.sendto(lote.paquete(h, ip, i), (ip, 0))
+            except OSError:
+                pass
+        while lote.pendientes:
+            restante = lote.espera()
+            if restante <= 0:
+                break
+            _atender(sel, lote, sock, restante, hasta_vaciar=True)
+    finally:
+        sel.close()
+        sock.close()
+    return lote.resultado()
+
+def _atender(sel: selectors.BaseSelector, lote: _Lote, sock: socket.socket, segundos: float,
+             hasta_vaciar: bool) -> None:
+    """
+    Lee respuestas durante 'segundos' (o hasta que no quede nada pendiente, si hasta_vaciar).
+    """
+    limite = time.perf_counter() + segundos
+    while True:
+        restante = limite - time.perf_counter()
+        if restante <= 0:
+            return
+        if not sel.select(restante):
+            return
+        while True:
+            try:
+                data, origen = sock.recvfrom(1024)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                return
+            lote.recibir(data, origen)
+        if hasta_vaciar and not lote.pendientes:
+            return
+
+async def ping_lote_async(hosts: List[str], count: int = 3, timeout: float = 2.0,
+                          intervalo: float = INTERVALO_S) -> Dict[str, Dict[str, Any]]:
+    """
+    Versión asíncrona de ping_lote (las respuestas se leen en el bucle de eventos).
+    """
+    loop = asyncio.get_running_loop()
+    lote = await loop.run_in_executor(None, _Lote, hosts, count, timeout)
+    peticiones = list(lote.peticiones())
+    try:
+        sock, lote.raw = _abrir_socket_icmp()
+    except OSError:
+        rtts = await asyncio.gather(*(asyncio.to_thread(_ping3, ip, timeout) for _, ip, _ in peticiones))
+        for (h, _, i), t in zip(peticiones, rtts):
+            lote.rtts[h][i] = t
+        return lote.resultado()
+    lote.ident = (os.getpid() ^ id(sock)) & 0xFFFF
+
+    async def _leer() -> None:
+        while True:
+            try:
+                data, origen = await sockets_async.recvfrom(loop, sock, 1024)
+            except OSError:
+                return
+            lote.recibir(data, origen)
+            if not lote.pendientes and enviados.is_set():
+                return
+
+    enviados = asyncio.Event()
+    lector = asyncio.ensure_future(_leer())
+    try:
+        for n, (h, ip, i) in enumerate(peticiones):
+            if n and intervalo > 0 and i != peticiones[n - 1][2]:
+                await asyncio.sleep(intervalo)
+            try:
+                await sockets_async.sendto(loop, sock, lote.paquete(h, ip, i), (ip, 0))
+            except OSError:
+                pass
+        enviados.set()
+        while lote.pendientes and not lector.done():
+            restante = lote.espera()
+            if restante <= 0:
+                break
+            await asyncio.wait([lector], timeout=restante)
+    finally:
+        lector.cancel()
+        await asyncio.gather(lector, return_exceptions=True)
+        sock.close()
+    return lote.resultado()
+
+def _motivo_parada(est: EstadisticasRTT, min_muestras: int, ancho_perdida_pct: float,
+                   precision_latencia: float, confianza: float) -> Optional[str]:
+    """
+    Motivo para dejar de muestrear, o None si hay que seguir.
+    """
+    if est.enviados < min_muestras:
+        return None
+    if est.recibidos == 0:
+        return "sin_respuesta"
+    lat_inf, lat_sup = est.intervalo_latencia(confianza)
+    if lat_inf is None:
+        return None
+    latencia_estable = (lat_sup - lat_inf) / 2 <= max(precision_latencia * est.media, PRECISION_LATENCIA_MIN_MS)
+    if not latencia_estable:
+        return None
+    if est.recibidos == est.enviados:
+        return "sano"
+    perdida_inf, perdida_sup = est.intervalo_perdida(confianza)
+    if perdida_sup - perdida_inf <= ancho_perdida_pct:
+        return "convergido"
+    return None
+
+def _resultado_adaptativo(est: EstadisticasRTT, ip: Optional[str], rtts: List[Optional[float]],
+                          motivo: str, t0: float) -> Dict[str, Any]:
+    ok, latencia, perdida = resumir(rtts)
+    return {"ip": ip, "rtts_ms": rtts, "recibidos": est.recibidos, "enviados": est.enviados,
+            "latencia_ms": latencia, "perdida_pct": perdida, "motivo": motivo,
+            "duracion_ms": round((time.perf_counter() - t0) * 1000.0, 2)}
+
+def ping_adaptativo(host: str, timeout: float = 2.0, min_muestras: int = MIN_MUESTRAS,
+                    max_muestras: int = MAX_MUESTRAS, tiempo_max: float = TIEMPO_MAX_S,
+                    ronda: int = RONDA_ADAPTATIVA, ancho_perdida_pct: float = ANCHO_PERDIDA_PCT,
+                    precision_latencia: float = PRECISION_LATENCIA, confianza: float = CONFIANZA,
+                    intervalo: float = INTERVALO_S) -> Dict[str, Any]:
+    """
+    Pings por rondas de 'ronda' (con ping_lote) hasta que se cumple un criterio de parada.
+    Devuelve lo mismo que ping_lote para el host más 'motivo' (sano, sin_respuesta, convergido,
+    max_muestras, tiempo_max o sin_direccion) y 'duracion_ms'.
+    """
+    t0 = time.perf_counter()
+    limite = t0 + tiempo_max
+    est = EstadisticasRTT()
+    rtts: List[Optional[float]] = []
+    ip = None
+    while True:
+        restante = limite - time.perf_counter()
+        n = min(ronda, max_muestras - est.enviados)
+        if n <= 0:
+            return _resultado_adaptativo(est, ip, rtts, "max_muestras", t0)
+        # La ronda dura (n - 1) intervalos más el timeout: debe acabar dentro de tiempo_max
+        espera = min(timeout, restante - (n - 1) * intervalo)
+        if espera <= 0:
+            return _resultado_adaptativo(est, ip, rtts, "tiempo_max", t0)
+        res = ping_lote([host], count=n, timeout=espera, intervalo=intervalo)[host]
+        ip = res["ip"]
+        if ip is None:
+            return _resultado_adaptativo(est, ip, rtts, "sin_direccion", t0)
+        rtts.extend(res["rtts_ms"])
+        est.extender(res["rtts_ms"])
+        motivo = _motivo_parada(est, min_muestras, ancho_perdida_pct, precision_latencia, confianza)
+        if motivo is not None:
+            return _resultado_adaptativo(est, ip, rtts, motivo, t0)
+
+async def ping_adaptativo_async(host: str, timeout: float = 2.0, min_muestras: int = MIN_MUESTRAS,
+                                max_muestras: int = MAX_MUESTRAS, tiempo_max: float = TIEMPO_MAX_S,
+                                ronda: int = RONDA_ADAPTATIVA, ancho_perdida_pct: float = ANCHO_PERDIDA_PCT,
+                                precision_latencia: float = PRECISION_LATENCIA, confianza: float = CONFIANZA,
+                                intervalo: float = INTERVALO_S) -> Dict[str, Any]:
+    """
+    Versión asíncrona de ping_adaptativo.
+    """
+    t0 = time.perf_counter()
+    limite = t0 + tiempo_max
+    est = EstadisticasRTT()
+    rtts: List[Optional[float]] = []
+    ip = None
+    while True:
+        restante = limite - time.perf_counter()
+        n = min(ronda, max_muestras - est.enviados)
+        if n <= 0:
+            return _resultado_adaptativo(est, ip, rtts, "max_muestras", t0)
+        # La ronda dura (n - 1) intervalos más el timeout: debe acabar dentro de tiempo_max
+        espera = min(timeout, restante - (n - 1) * intervalo)
+        if espera <= 0:
+            return _resultado_adaptativo(est, ip, rtts, "tiempo_max", t0)
+        res = (await ping_lote_async([host], count=n, timeout=espera, intervalo=intervalo))[host]
+        ip = res["ip"]
+        if ip is None:
+            return _resultado_adaptativo(est, ip, rtts, "sin_direccion", t0)
+        rtts.extend(res["rtts_ms"])
+        est.extender(res["rtts_ms"])
+        motivo = _motivo_parada(est, min_muestras, ancho_perdida_pct, precision_latencia, confianza)
+        if motivo is not None:
+            return _resultado_adaptativo(est, ip, rtts, motivo, t0)
@@ -0,0 +1,241 @@
+# motor_inferencia/planificador.py
+import asyncio
+import itertools
+import logging
+import time
+from typing import Dict, Any, List, Optional, Callable, Tuple
+
+from sistema_experto_conectividad.base_de_conocimiento import cargador_reglas
+from sistema_experto_conectividad.motor_inferencia.compilador_reglas import MotorReglas
+from sistema_experto_conectividad.motor_inferencia.pruebas_red import DEFAULT_PING_HOST, DNS_TEST_DOMAINS, SERVICE_TESTS
+from sistema_experto_conectividad.motor_inferencia import pruebas_red_async as pra
+from sistema_experto_conectividad.motor_inferencia import pinger
+from sistema_experto_conectividad.motor_inferencia.engine import armar_datos, _sin_resultado
+from sistema_experto_conectividad.motor_inferencia.presupuesto import Presupuesto
+
+"""
+Planificación perezosa de las pruebas de red: sólo se ejecutan las que pueden cambiar las
+inferencias, empezando por las baratas y decisivas.
+- estado_adaptadores es local e inmediato: si no hay ninguna interfaz activa (aparte de
+  loopback) se deducen todos los hechos de red como fallidos sin lanzar pruebas.
+- Cada prueba declara qué hechos produce; con el motor compilado se sabe qué reglas los leen.
+- Antes de lanzar (o mientras espera) una prueba booleana se enumeran sus resultados posibles
+  (True/False/None) junto con los de las demás pruebas booleanas pendientes: si las inferencias
+  salen iguales en todos los casos, la prueba no puede cambiar el diagnóstico y se omite
+  (o se cancela si ya estaba en vuelo). Sus hechos quedan a None y se listan en 'pruebas_omitidas'.
+- Las pruebas con hechos numéricos (conexión: latencia/pérdida) no se omiten por enumeración
+  y, mientras estén pendientes, tampoco las demás (las reglas pueden usar cualquier umbral).
+Así, con el enlace caído, en cuanto fallan gateway y conexión se cancelan puertos y servicios
+y el diagnóstico tarda ~un timeout en lugar de la suma de todos.
+"""
+
+logger = logging.getLogger("planificador")
+
+MAX_EN_VUELO = 3
+
+class Sonda:
+    """
+    Prueba de red para el planificador: nombre (clave en 'resultados'), hechos que produce,
+    coste relativo estimado y resultado de relleno cuando se omite. 'booleanos' son los hechos
+    cuyos valores posibles (True/False/None) se enumeran para decidir si hace falta
+    (por defecto sólo el primero).
+    """
+
+    def __init__(self, nombre: str, hechos: Tuple[str, ...], costo: float, numerica: bool = False,
+                 omitida: Any = None, booleanos: Optional[Tuple[str, ...]] = None):
+        self.nombre = nombre
+        self.hechos = hechos
+        self.costo = costo
+        self.numerica = numerica
+        self.omitida = omitida
+        self.booleanos = booleanos or hechos[:1]
+
+    def hechos_de(self, resultado: Any) -> Dict[str, Any]:
+        if self.nombre == "gateway":
+            return {"gateway_ip": resultado[0], "gateway": resultado[1]}
+        if isinstance(resultado, tuple):
+            return dict(zip(self.hechos, resultado))
+        return {self.hechos[0]: resultado}
+
+SONDAS = [
+    Sonda("gateway", ("gateway",), 1.0, omitida=(None, None)),
+    Sonda("conexion", ("conexion", "latencia_ms", "perdida_pct", "rtts_ms"), 1.2, numerica=True,
+          omitida=(None, None, None, [])),
+    Sonda("dns", ("dns", "tiempo_dns_ms", "dns_resolutores"), 1.0, omitida=(None, None, {})),
+    Sonda("puertos_http", ("puertos_http",), 1.5),
+    Sonda("puertos_https", ("puertos_https", "tiempo_handshake_ms", "familia_ganadora", "conexion_ipv6_ms",
+                            "conexion_ipv4_ms", "ipv6_ok", "ipv4_ok"), 1.5, omitida=(None,) * 7,
+          booleanos=("puertos_https", "ipv6_ok", "ipv4_ok")),
+    Sonda("servicios", ("servicios",), 3.0, omitida={}),
+]
+
+def _es_loopback(nombre: str) -> bool:
+    n = nombre.lower()
+    return n == "lo" or n.startswith("lo:") or "loopback" in n
+
+def derivar_de_adaptadores(estado: Dict[str, bool], servicios: List[str]) -> Optional[Dict[str, Any]]:
+    """
+    Si ninguna interfaz (salvo loopback) está activa, resultados deducidos para todas las pruebas.
+    """
+    if not isinstance(estado, dict):
+        return None
+    if any(up for nombre, up in estado.items() if not _es_loopback(nombre)):
+        return None
+    return {
+        "gateway": (None, False),
+        "conexion": (False, None, 100.0, []),
+        "dns": (False, None, {}),
+        "puertos_http": False,
+        "puertos_https": (False, None, None, None, None, False, False),
+        "servicios": {d: False for d in servicios},
+    }
+
+class Planificador:
+    """
+    Decide qué pruebas faltan por ejecutar a partir de los hechos conocidos.
+    """
+
+    def __init__(self, motor: Optional[MotorReglas] = None, sondas: List[Sonda] = SONDAS):
+        self.motor = motor or cargador_reglas.motor()
+        self.sondas = {s.nombre: s for s in sondas}
+        # Decisividad: cuántas unidades del motor leen algún hecho de la prueba
+        self.decisividad = {
+            s.nombre: len({u for h in s.hechos for u in self.motor.dependencias.get(h, ())})
+            for s in sondas
+        }
+
+    def leida_por_reglas(self, sonda: Sonda) -> bool:
+        return bool(self.motor.sin_dependencias) or self.decisividad[sonda.nombre] > 0
+
+    def orden(self, nombres: List[str]) -> List[str]:
+        """
+        Primero las más decisivas por unidad de coste.
+        """
+        return sorted(nombres, key=lambda n: (-self.decisividad[n] / self.sondas[n].costo, self.sondas[n].costo))
+
+    def _inferencias(self, datos: Dict[str, Any]) -> Tuple:
+        return tuple(h[2] for h in self.motor.evaluar(datos))
+
+    def necesaria(self, nombre: str, conocidos: Dict[str, Any], abiertas: List[str]) -> bool:
+        """
+        True si algún resultado de la prueba puede cambiar las inferencias, dados los hechos
+        conocidos y cualquier resultado de las demás pruebas abiertas (pendientes o en vuelo).
+        """
+        sonda = self.sondas[nombre]
+        if not self.leida_por_reglas(sonda):
+            return False
+        otras = [self.sondas[n] for n in abiertas if n != nombre]
+        if sonda.numerica or any(o.numerica for o in otras):
+            return True
+        propios = sonda.booleanos
+        desconocidos = [h for o in otras for h in o.booleanos]
+        for combinacion in itertools.product((True, False, None), repeat=len(desconocidos)):
+            base = dict(conocidos)
+            base.update(zip(desconocidos, combinacion))
+            vistas = set()
+            for valores in itertools.product((True, False, None), repeat=len(propios)):
+                base.update(zip(propios, valores))
+                vistas.add(self._inferencias(base))
+                if len(vistas) > 1:
+                    return True
+        return False
+
+async def ejecutar_diagnostico_perezoso(gateway_ip: str = None, auto_detect_gateway: bool = True,
+                                        ping_host: str = DEFAULT_PING_HOST, host_puertos: str = "www.google.com",
+                                        puerto_http: int = 80, puerto_https: int = 443,
+                                        dns_domains: list = DNS_TEST_DOMAINS, servicios: list = SERVICE_TESTS,
+                                        timeout_ping: float = 2.0, timeout_puerto: float = 3.0,
+                                        max_en_vuelo: int = MAX_EN_VUELO,
+                                        motor: Optional[MotorReglas] = None,
+                                        presupuesto: Any = None, ping_adaptativo: bool = False) -> Dict[str, Any]:
+    """
+    Como pruebas_red_async.ejecutar_diagnostico_async pero ejecutando sólo las pruebas necesarias
+    (como mucho 'max_en_vuelo' a la vez, en orden de decisividad/coste).
+    'datos' incluye además 'pruebas_omitidas' y 'hechos_derivados'. Con presupuesto, las
+    pruebas que no han terminado al agotarse quedan en 'hechos_desconocidos'.
+    """
+    t0 = time.perf_counter()
+    presupuesto = Presupuesto.crear(presupuesto)
+    tiempo_max_ping = pinger.TIEMPO_MAX_S
+    if presupuesto is not None:
+        # Los pings de conexión duran además (CONTEO_PING - 1) intervalos
+        timeout_ping = presupuesto.timeout(timeout_ping, fijo=(pinger.CONTEO_PING - 1) * pinger.INTERVALO_S)
+        timeout_puerto = presupuesto.timeout(timeout_puerto)
+        tiempo_max_ping = presupuesto.timeout(tiempo_max_ping)
+    plan = Planificador(motor)
+    fabricas: Dict[str, Callable[[], Any]] = {
+        "gateway": lambda: pra._probar_gateway(gateway_ip, auto_detect_gateway, timeout_ping),
+        "conexion": lambda: pra.medir_conexion(ping_host, timeout=timeout_ping, adaptativo=ping_adaptativo,
+                                               tiempo_max=tiempo_max_ping),
+        "dns": lambda: pra.medir_dns(dns_domains, timeout=timeout_ping),
+        "puertos_http": lambda: pra.comprobar_puerto(host_puertos, puerto_http, timeout=timeout_puerto),
+        "puertos_https": lambda: pra.medir_doble_pila(host_puertos, puerto_https, timeout=timeout_puerto),
+        "servicios": lambda: pra.probar_servicios(servicios, timeout=timeout_puerto),
+    }
+    resultados: Dict[str, Any] = {}
+    tiempos: Dict[str, float] = {}
+    resultados["estado_adaptadores"], tiempos["estado_adaptadores"] = pra._estado_adaptadores_medido()
+
+    derivados = derivar_de_adaptadores(resultados["estado_adaptadores"], servicios)
+    omitidas: List[str] = []
+    desconocidas: List[str] = []
+    if derivados is not None:
+        resultados.update(derivados)
+        if gateway_ip:
+            resultados["gateway"] = (gateway_ip, False)
+        omitidas = list(fabricas)
+    else:
+        conocidos: Dict[str, Any] = {}
+        pendientes = plan.orden(list(fabricas))
+        en_vuelo: Dict[asyncio.Future, str] = {}
+        try:
+            while pendientes or en_vuelo:
+                abiertas = pendientes + list(en_vuelo.values())
+                for n in [n for n in abiertas if not plan.necesaria(n, conocidos, abiertas)]:
+                    omitidas.append(n)
+                    if n in pendientes:
+                        pendientes.remove(n)
+                    else:
+                        tarea = next(t for t, m in en_vuelo.items() if m == n)
+                        tarea.cancel()
+                        del en_vuelo[tarea]
+                    abiertas.remove(n)
+                while pendientes and len(en_vuelo) < max(1, max_en_vuelo):
+                    n = pendientes.pop(0)
+                    en_vuelo[asyncio.ensure_future(pra._medir(fabricas[n]()))] = n
+                if not en_vuelo:
+                    break
+                espera = None if presupuesto is None else presupuesto.restante()
+                hechas, _ = await asyncio.wait(list(en_vuelo), timeout=espera, return_when=asyncio.FIRST_COMPLETED)
+                if not hechas:
+                    # Presupuesto agotado: lo que queda sin medir es desconocido
+                    desconocidas = list(en_vuelo.values()) + pendientes
+                    break
+                for tarea in hechas:
+                    n = en_vuelo.pop(tarea)
+                    resultados[n], tiempos[n] = tarea.result()
+                    conocidos.update(plan.sondas[n].hechos_de(resultados[n]))
+        finally:
+            for tarea in en_vuelo:
+                tarea.cancel()
+        for n in omitidas + desconocidas:
+            resultados[n] = plan.sondas[n].omitida
+        if "gateway" in omitidas + desconocidas:
+            resultados["gateway"] = (gateway_ip, None)
+    # Como en engine.ejecutar_diagnostico: las que terminaron sin poder decidir también son desconocidas
+    desconocidas += [n for n, res in resultados.items()
+                     if n not in omitidas and n not in desconocidas and _sin_resultado(n, res)]
+    tiempos["total"] = (time.perf_counter() - t0) * 1000.0
+    datos = armar_datos(resultados, tiempos, desconocidas)
+    if presupuesto is not None:
+        datos.update(presupuesto.resumen())
+    datos["pruebas_omitidas"] = omitidas
+    datos["hechos_derivados"] = derivados is not None
+    logger.info("Diagnóstico perezoso en %.0f ms; omitidas: %s", tiempos["total"], omitidas)
+    return datos
+
+def diagnosticar_perezoso(gateway_ip: str = None, auto_detect_gateway: bool = True, **opciones) -> Dict[str, Any]:
+    """
+    Versión síncrona (con su propio bucle de eventos) de ejecutar_diagnostico_perezoso.
+    """
+    return asyncio.run(ejecutar_diagnostico_perezoso(gateway_ip, auto_detect_gateway, **opciones))
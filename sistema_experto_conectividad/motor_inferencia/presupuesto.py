@@ -0,0 +1,100 @@
+# motor_inferencia/presupuesto.py
+import threading
+import time
+from typing import Any, Callable, Optional, Tuple
+
+"""
+Presupuesto de tiempo (deadline) para un diagnóstico completo.
+Se crea con el tiempo total (p. ej. 3 s) y se pasa a las pruebas de pruebas_red: cada una usa
+como timeout su parte del tiempo restante en lugar del fijo (2 s / 3 s), y si el presupuesto
+ya se agotó no se lanza. Las pruebas seguidas reciben cada una un sub-presupuesto (parte()).
+Lo que no llega a medirse queda como hecho desconocido (None) y se lista en
+datos['hechos_desconocidos'].
+"""
+
+# Margen que se reserva para armar 'datos' e inferir una vez agotado el tiempo de pruebas
+RESERVA_S = 0.05
+# Holgura para que una prueba devuelva su resultado antes de que venza la espera de quien la lanzó
+MARGEN_S = 0.05
+
+class Presupuesto:
+    """
+    Tiempo límite absoluto (reloj monotónico) compartido por todas las pruebas.
+    """
+
+    def __init__(self, segundos: float, reserva: float = RESERVA_S):
+        if segundos <= 0:
+            raise ValueError("El presupuesto debe ser positivo")
+        self.segundos = float(segundos)
+        self.reserva = min(reserva, self.segundos / 2)
+        self.inicio = time.monotonic()
+        self.limite = self.inicio + self.segundos
+
+    @classmethod
+    def crear(cls, valor: Any) -> Optional["Presupuesto"]:
+        """
+        Acepta None (sin límite), segundos o un Presupuesto ya en marcha.
+        """
+        if valor is None or isinstance(valor, Presupuesto):
+            return valor
+        return cls(float(valor))
+
+    def restante(self) -> float:
+        """
+        Segundos disponibles para pruebas (descontada la reserva).
+        """
+        return max(0.0, self.limite - self.reserva - time.monotonic())
+
+    def agotado(self) -> bool:
+        return self.restante() <= 0.0
+
+    def timeout(self, maximo: float, partes: int = 1, fijo: float = 0.0) -> float:
+        """
+        Timeout para la siguiente prueba: su parte del tiempo restante (repartido entre las
+        'partes' que quedan por hacer), sin superar el timeout habitual 'maximo'. 0 = no lanzarla.
+        'fijo' es lo que la prueba dura además de su timeout (p. ej. los intervalos entre pings):
+        se descuenta, junto con MARGEN_S, para que la prueba entera quepa en su parte.
+        """
+        return max(0.0, min(maximo, self.restante() / max(1, partes) - fijo - MARGEN_S))
+
+    def parte(self, partes: int) -> "Presupuesto":
+        """
+        Presupuesto para la siguiente de 'partes' pruebas seguidas: vence cuando se le acaba su
+        parte del tiempo restante, así que una prueba lenta no se come el tiempo de las demás.
+        Lo que no gaste vuelve al total y se reparte entre las siguientes.
+        """
+        if partes <= 1 or self.agotado():
+            return self
+        return Presupuesto(self.restante() / partes + self.reserva, self.reserva)
+
+    def ejecutar(self, fn: Callable, *args, maximo: float = None) -> Tuple[bool, Any]:
+        """
+        Para llamadas bloqueantes sin timeout propio (p. ej. socket.gethostbyname): las ejecuta
+        en un hilo y espera como mucho el tiempo restante (o 'maximo').
+        Devuelve (terminada, resultado); una excepción de fn se relanza.
+        """
+        espera = self.restante() if maximo is None else self.timeout(maximo)
+        if espera <= 0:
+            return False, None
+        salida = {}
+
+        def _llamar():
+            try:
+                salida["resultado"] = fn(*args)
+            except BaseException as e:  # se relanza en el hilo que espera
+                salida["error"] = e
+
+        hilo = threading.Thread(target=_llamar, name="prueba-presupuesto", daemon=True)
+        hilo.start()
+        hilo.join(espera)
+        if hilo.is_alive():
+            return False, None
+        if "error" in salida:
+            raise salida["error"]
+        return True, salida["resultado"]
+
+    def resumen(self) -> dict:
+        return {
+            "presupuesto_ms": round(self.segundos * 1000.0, 1),
+            "consumido_ms": round((time.monotonic() - self.inicio) * 1000.0, 1),
+        }
@@ -3,11 +3,17 @@ import socket
 import subprocess
 import sys
 import re
-from typing import Dict, Any, Tuple, List
-from ping3 import ping
+from typing import Dict, Any, Tuple, List, Optional
 import psutil
 import time
 
+from sistema_experto_conectividad.motor_inferencia.presupuesto import Presupuesto
+from sistema_experto_conectividad.motor_inferencia.resolutor import RESOLUTOR
+from sistema_experto_conectividad.motor_inferencia import cliente_dns
+from sistema_experto_conectividad.motor_inferencia import pinger
+from sistema_experto_conectividad.motor_inferencia import escaner_tcp
+from sistema_experto_conectividad.motor_inferencia import rutas
+
 DEFAULT_PING_HOST = "8.8.8.8"
 DNS_TEST_DOMAINS = ["www.google.com", "www.cloudflare.com", "www.openai.com"]
 SERVICE_TESTS = ["mail.google.com", "facebook.com", "youtube.com"]
@@ -15,12 +21,15 @@ SERVICE_TESTS = ["mail.google.com", "facebook.com", "youtube.com"]
 def detectar_gateway_sistema() -> str:
     """
     Intenta detectar la puerta de enlace por varios métodos:
-    1) netifaces (si está instalado)
+    1) tabla de rutas del kernel en Linux (/proc/net/route, en caché hasta que cambian las rutas; ver rutas.py)
     2) 'ip route' en Linux/macOS
     3) 'ipconfig' / 'route print' en Windows (busca 'Default Gateway' o 'Puerta predeterminada')
     4) fallback heurístico: toma la IP local y pone .1 en el último octeto
     Retorna una IP string o None si falla.
     """
+    gw = rutas.gateway_ipv4()
+    if gw:
+        return gw
 
     try:
         out = subprocess.check_output(["ip", "route"], stderr=subprocess.DEVNULL, universal_newlines=True, timeout=2)
@@ -76,61 +85,163 @@ def detectar_gateway_sistema() -> str:
     return None
 
 
-def verificar_conexion(host: str = DEFAULT_PING_HOST, count: int = 3, timeout: float = 2.0) -> Tuple[bool, float, float]:
+def medir_conexion(host: str = DEFAULT_PING_HOST, count: int = pinger.CONTEO_PING, timeout: float = 2.0,
+                   presupuesto: Optional[Presupuesto] = None,
+                   adaptativo: bool = False) -> Tuple[bool, float, float, List[Optional[float]]]:
+    """
+    Envía 'count' pings por lotes (pinger.ping_lote) y devuelve
+    (hay_conexion, latencia_media_ms, perdida_pct, rtts_ms), con una muestra por ping (None = perdido).
+    Con adaptativo=True el número de pings no es fijo: se muestrea hasta que la pérdida y la
+    latencia tienen intervalos de confianza estrechos (pinger.ping_adaptativo).
+    Con presupuesto el timeout se recorta al tiempo restante; si ya no queda devuelve (None, None, None, []).
+    """
+    tiempo_max = pinger.TIEMPO_MAX_S
+    if presupuesto is not None:
+        # El lote dura (count - 1) intervalos más el timeout de la última petición
+        timeout = presupuesto.timeout(timeout, fijo=(count - 1) * pinger.INTERVALO_S)
+        tiempo_max = presupuesto.timeout(tiempo_max)
+        if timeout <= 0:
+            return (None, None, None, [])
+    if adaptativo:
+        rtts = pinger.ping_adaptativo(host, timeout=timeout, tiempo_max=tiempo_max)["rtts_ms"]
+    else:
+        rtts = pinger.ping_lote([host], count=count, timeout=timeout)[host]["rtts_ms"]
+    return pinger.resumir(rtts) + (rtts,)
+
+def verificar_conexion(host: str = DEFAULT_PING_HOST, count: int = 3, timeout: float = 2.0,
+                       presupuesto: Optional[Presupuesto] = None) -> Tuple[bool, float, float]:
     """
     Realiza varios pings y devuelve (hay_conexion, latencia_media_ms, perdida_pct).
     """
-    tiempos: List[float] = []
-    fallos = 0
-    for _ in range(count):
-        try:
-            t = ping(host, timeout=timeout, unit="ms")
-            if t is None:
-                fallos += 1
-            else:
-                tiempos.append(float(t))
-        except Exception:
-            fallos += 1
-        time.sleep(0.15)
-    total = count
-    perdida = (fallos / total) * 100.0
-    latencia = sum(tiempos) / len(tiempos) if tiempos else None
-    return (len(tiempos) > 0, latencia, perdida)
-
-def verificar_dns(domains: list = DNS_TEST_DOMAINS, timeout: float = 2.0) -> bool:
+    return medir_conexion(host, count, timeout, presupuesto)[:3]
+
+def medir_dns(domains: list = DNS_TEST_DOMAINS, timeout: float = 2.0,
+              presupuesto: Optional[Presupuesto] = None, usar_cache: bool = False,
+              resolutores: Optional[List[str]] = None) -> Tuple[Optional[bool], Optional[float], Dict[str, Optional[float]]]:
+    """
+    Prueba de DNS: (dns_ok, tiempo_dns_ms, {resolutor: tiempo_ms o None}).
+    Consulta todos los dominios a la vez a los resolutores de resolv.conf (cliente_dns) con
+    timeout real; esa vía siempre va a la red y no pasa por RESOLUTOR (sólo pide registros A y
+    el escáner TCP necesita las dos familias). Si no hay resolv.conf (Windows) usa el resolver
+    del sistema, sin tiempos por resolutor; sólo entonces cuenta usar_cache y la respuesta
+    queda en RESOLUTOR. Con presupuesto, (None, None, {}) si se agota antes de poder decidir.
+    """
+    if presupuesto is not None:
+        timeout = presupuesto.timeout(timeout)
+        if timeout <= 0:
+            return None, None, {}
+    resolutores = resolutores if resolutores is not None else cliente_dns.resolutores_sistema()
+    if resolutores:
+        return cliente_dns.medir(domains, resolutores, timeout=timeout)
+    t0 = time.perf_counter()
+    ok = _verificar_dns_sistema(domains, Presupuesto(timeout, reserva=0.0), usar_cache)
+    return ok, ((time.perf_counter() - t0) * 1000.0 if ok else None), {}
+
+def _verificar_dns_sistema(domains: list, presupuesto: Presupuesto, usar_cache: bool) -> Optional[bool]:
+    # getaddrinfo no tiene timeout: se espera sólo lo que queda de presupuesto.
+    # Por defecto sin caché (se está probando el DNS), pero la respuesta queda para las demás pruebas
     for d in domains:
         try:
-            socket.gethostbyname(d)
+            terminada, _ = presupuesto.ejecutar(RESOLUTOR.direcciones, d, socket.AF_UNSPEC, usar_cache)
+            if not terminada:
+                return None
             return True
         except Exception:
             continue
     return False
 
-def verificar_gateway(ip: str, timeout: float = 2.0) -> bool:
-    try:
-        resp = ping(ip, timeout=timeout, unit="ms")
-        return resp is not None
-    except Exception:
-        return False
+def verificar_dns(domains: list = DNS_TEST_DOMAINS, timeout: float = 2.0,
+                  presupuesto: Optional[Presupuesto] = None, usar_cache: bool = False) -> Optional[bool]:
+    """
+    True si resuelve algún dominio (ver medir_dns). None si no dio tiempo a decidir.
+    """
+    return medir_dns(domains, timeout, presupuesto, usar_cache)[0]
 
-def comprobar_puerto(host: str, port: int, timeout: float = 3.0) -> bool:
-    try:
-        socket.create_connection((host, port), timeout=timeout)
-        return True
-    except Exception:
-        return False
+def verificar_gateway(ip: str, timeout: float = 2.0, presupuesto: Optional[Presupuesto] = None) -> Optional[bool]:
+    if presupuesto is not None:
+        timeout = presupuesto.timeout(timeout)
+        if timeout <= 0:
+            return None
+    return pinger.ping_lote([ip], count=1, timeout=timeout)[ip]["recibidos"] > 0
+
+def medir_puerto(host: str, port: int, timeout: float = 3.0,
+                 presupuesto: Optional[Presupuesto] = None) -> Tuple[Optional[bool], Optional[float]]:
+    """
+    (abierto, tiempo_handshake_ms) con el escáner TCP (escaner_tcp). Las direcciones del host se
+    prueban en orden hasta que una conecta; abierto es None si no dio tiempo a resolver el nombre
+    o ya no queda presupuesto.
+    """
+    if presupuesto is not None:
+        timeout = presupuesto.timeout(timeout)
+        if timeout <= 0:
+            return None, None
+    res = escaner_tcp.escanear([(host, port)], timeout=timeout)[(host, port)]
+    return res["abierto"], res["tiempo_ms"]
+
+def comprobar_puerto(host: str, port: int, timeout: float = 3.0,
+                     presupuesto: Optional[Presupuesto] = None) -> Optional[bool]:
+    return medir_puerto(host, port, timeout, presupuesto)[0]
+
+def resultado_doble_pila(res: Dict[str, Any]) -> Tuple:
+    """
+    Resultado crudo de la prueba HTTPS a partir de un objetivo del escáner:
+    (abierto, tiempo_handshake_ms, familia_ganadora, conexion_ipv6_ms, conexion_ipv4_ms, ipv6_ok, ipv4_ok).
+    ipv6_ok/ipv4_ok son None si el host no tiene direcciones de esa familia o la máquina no tiene ruta.
+    """
+    v6 = res.get("familias", {}).get("ipv6", {})
+    v4 = res.get("familias", {}).get("ipv4", {})
+    return (res["abierto"], res["tiempo_ms"], res.get("familia"),
+            v6.get("tiempo_ms"), v4.get("tiempo_ms"), v6.get("abierto"), v4.get("abierto"))
+
+def medir_doble_pila(host: str, port: int = 443, timeout: float = 3.0,
+                     presupuesto: Optional[Presupuesto] = None) -> Tuple:
+    """
+    Conexión happy eyeballs (IPv6 e IPv4 en carrera, escaner_tcp) con el resultado de resultado_doble_pila.
+    """
+    if presupuesto is not None:
+        timeout = presupuesto.timeout(timeout)
+        if timeout <= 0:
+            return (None,) * 7
+    return resultado_doble_pila(escaner_tcp.escanear([(host, port)], timeout=timeout)[(host, port)])
+
+def escanear_puertos_y_servicios(host: str = "www.google.com", puerto_http: int = 80, puerto_https: int = 443,
+                                 domains: list = SERVICE_TESTS, timeout: float = 3.0,
+                                 presupuesto: Optional[Presupuesto] = None) -> Dict[str, Any]:
+    """
+    Pruebas de puertos y servicios en una sola pasada del escáner TCP. Devuelve los resultados
+    crudos de 'puertos_http' (bool), 'puertos_https' (tupla de resultado_doble_pila) y
+    'servicios' ({dominio: bool}); None donde no dio tiempo a decidir.
+    """
+    objetivos = [(host, puerto_http), (host, puerto_https)] + [(d, 443) for d in domains]
+    if presupuesto is not None:
+        timeout = presupuesto.timeout(timeout)
+    if timeout <= 0:
+        res = {obj: {"abierto": None, "tiempo_ms": None} for obj in objetivos}
+    else:
+        res = escaner_tcp.escanear(objetivos, timeout=timeout)
+    return repartir_escaneo(res, host, puerto_http, puerto_https, domains)
+
+def repartir_escaneo(res: Dict[Tuple[str, int], Dict[str, Any]], host: str, puerto_http: int, puerto_https: int,
+                     domains: list) -> Dict[str, Any]:
+    return {
+        "puertos_http": res[(host, puerto_http)]["abierto"],
+        "puertos_https": resultado_doble_pila(res[(host, puerto_https)]),
+        "servicios": {d: res[(d, 443)]["abierto"] for d in domains},
+    }
 
 def estado_adaptadores() -> Dict[str, bool]:
     stats = psutil.net_if_stats()
     return {name: stats[name].isup for name in stats}
 
-def probar_servicios(domains: list = SERVICE_TESTS) -> Dict[str, bool]:
-    resultados = {}
-    for d in domains:
-        try:
-            host = socket.gethostbyname(d)
-            ok = comprobar_puerto(host, 443, timeout=3.0)
-            resultados[d] = ok
-        except Exception:
-            resultados[d] = False
-    return resultados
+def probar_servicios(domains: list = SERVICE_TESTS, presupuesto: Optional[Presupuesto] = None,
+                     timeout: float = 3.0) -> Dict[str, bool]:
+    """
+    Conecta al 443 de todos los dominios a la vez (escaner_tcp).
+    Con presupuesto, los servicios que no dé tiempo a probar quedan a None.
+    """
+    if presupuesto is not None:
+        timeout = presupuesto.timeout(timeout)
+        if timeout <= 0:
+            return {d: None for d in domains}
+    res = escaner_tcp.escanear([(d, 443) for d in domains], timeout=timeout)
+    return {d: res[(d, 443)]["abierto"] for d in domains}
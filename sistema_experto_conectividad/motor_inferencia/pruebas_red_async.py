@@ -0,0 +1,208 @@
+# motor_inferencia/pruebas_red_async.py
+import asyncio
+import socket
+import time
+from typing import Dict, Any, Tuple, List, Optional
+
+import sistema_experto_conectividad.motor_inferencia.pruebas_red as pruebas_red
+from sistema_experto_conectividad.motor_inferencia.pruebas_red import (
+    DEFAULT_PING_HOST, DNS_TEST_DOMAINS, SERVICE_TESTS
+)
+from sistema_experto_conectividad.motor_inferencia.engine import armar_datos, repartir_tcp, SIN_RESULTADO, _sin_resultado
+from sistema_experto_conectividad.motor_inferencia.presupuesto import Presupuesto
+from sistema_experto_conectividad.motor_inferencia.resolutor import RESOLUTOR
+from sistema_experto_conectividad.motor_inferencia import cliente_dns
+from sistema_experto_conectividad.motor_inferencia import pinger
+from sistema_experto_conectividad.motor_inferencia import escaner_tcp
+
+"""
+Versiones asíncronas (asyncio) de las pruebas de pruebas_red.
+Un mismo bucle de eventos puede mantener miles de pruebas en vuelo sin un hilo por prueba:
+- ping: pinger.ping_lote_async, socket ICMP no bloqueante (SOCK_DGRAM sin privilegios o
+  SOCK_RAW); si el sistema no lo permite se recurre a ping3 en hilos.
+- DNS: cliente_dns.medir_async, consultas UDP a todos los resolutores del sistema en paralelo
+  desde un solo socket por familia (sin caché); si no se conocen resolutores, getaddrinfo
+  vía resolutor.RESOLUTOR con timeout por llamada.
+- puertos y servicios: escaner_tcp.escanear_async, connect() no bloqueantes atendidos por el
+  propio bucle; todos los sockets se cierran al terminar.
+Todos los hosts/puertos son parámetros, así que se pueden probar contra servidores locales.
+"""
+
+async def _resolver_ipv4(host: str, timeout: float) -> str:
+    direcciones = await asyncio.wait_for(RESOLUTOR.direcciones_async(host, socket.AF_INET), timeout)
+    return direcciones[0]
+
+async def ping_async(host: str, timeout: float = 2.0) -> Optional[float]:
+    """
+    Envía un echo request y devuelve el RTT en ms, o None si no hay respuesta en 'timeout'.
+    """
+    limite = time.perf_counter() + timeout
+    try:
+        ip = await _resolver_ipv4(host, timeout)
+    except Exception:
+        return None
+    # La resolución cuenta dentro del mismo timeout
+    restante = limite - time.perf_counter()
+    if restante <= 0:
+        return None
+    return (await pinger.ping_lote_async([ip], count=1, timeout=restante))[ip]["rtts_ms"][0]
+
+async def medir_conexion(host: str = DEFAULT_PING_HOST, count: int = pinger.CONTEO_PING, timeout: float = 2.0,
+                         intervalo: float = pinger.INTERVALO_S, adaptativo: bool = False,
+                         tiempo_max: float = pinger.TIEMPO_MAX_S) -> Tuple[bool, float, float, List[Optional[float]]]:
+    """
+    Versión asíncrona de pruebas_red.medir_conexion: (hay_conexion, latencia_media_ms, perdida_pct, rtts_ms).
+    """
+    if adaptativo:
+        rtts = (await pinger.ping_adaptativo_async(host, timeout=timeout, tiempo_max=tiempo_max,
+                                                   intervalo=intervalo))["rtts_ms"]
+        return pinger.resumir(rtts) + (rtts,)
+    rtts = (await pinger.ping_lote_async([host], count=count, timeout=timeout, intervalo=intervalo))[host]["rtts_ms"]
+    return pinger.resumir(rtts) + (rtts,)
+
+async def verificar_conexion(host: str = DEFAULT_PING_HOST, count: int = 3, timeout: float = 2.0,
+                             intervalo: float = pinger.INTERVALO_S) -> Tuple[bool, float, float]:
+    """
+    Versión asíncrona de pruebas_red.verificar_conexion: (hay_conexion, latencia_media_ms, perdida_pct).
+    Los pings salen por lotes (pinger): la prueba tarda ~RTT, o ~timeout si no hay respuesta.
+    """
+    return (await medir_conexion(host, count, timeout, intervalo))[:3]
+
+async def verificar_dns(domains: list = DNS_TEST_DOMAINS, timeout: float = 2.0, usar_cache: bool = False) -> bool:
+    """
+    Resuelve todos los dominios a la vez; True en cuanto uno responde.
+    Por defecto sin caché (se está probando el DNS); las respuestas sí quedan en el caché.
+    """
+    tareas = [asyncio.ensure_future(asyncio.wait_for(
+        RESOLUTOR.direcciones_async(d, socket.AF_UNSPEC, usar_cache), timeout)) for d in domains]
+    try:
+        for fut in asyncio.as_completed(tareas):
+            try:
+                if await fut:
+                    return True
+            except Exception:
+                continue
+        return False
+    finally:
+        for t in tareas:
+            t.cancel()
+
+async def medir_dns(domains: list = DNS_TEST_DOMAINS, timeout: float = 2.0,
+                    resolutores: Optional[List[str]] = None) -> Tuple[Optional[bool], Optional[float], Dict[str, Optional[float]]]:
+    """
+    Versión asíncrona de pruebas_red.medir_dns: (dns_ok, tiempo_dns_ms, {resolutor: tiempo_ms o None}).
+    """
+    resolutores = resolutores if resolutores is not None else cliente_dns.resolutores_sistema()
+    if resolutores:
+        return await cliente_dns.medir_async(domains, resolutores, timeout=timeout)
+    t0 = time.perf_counter()
+    ok = await verificar_dns(domains, timeout=timeout)
+    return ok, ((time.perf_counter() - t0) * 1000.0 if ok else None), {}
+
+async def verificar_gateway(ip: str, timeout: float = 2.0) -> bool:
+    return await ping_async(ip, timeout=timeout) is not None
+
+async def medir_puerto(host: str, port: int, timeout: float = 3.0) -> Tuple[Optional[bool], Optional[float]]:
+    """
+    Versión asíncrona de pruebas_red.medir_puerto: (abierto, tiempo_handshake_ms).
+    """
+    res = (await escaner_tcp.escanear_async([(host, port)], timeout=timeout))[(host, port)]
+    return res["abierto"], res["tiempo_ms"]
+
+async def comprobar_puerto(host: str, port: int, timeout: float = 3.0) -> Optional[bool]:
+    return (await medir_puerto(host, port, timeout))[0]
+
+async def medir_doble_pila(host: str, port: int = 443, timeout: float = 3.0) -> Tuple:
+    """
+    Versión asíncrona de pruebas_red.medir_doble_pila.
+    """
+    res = await escaner_tcp.escanear_async([(host, port)], timeout=timeout)
+    return pruebas_red.resultado_doble_pila(res[(host, port)])
+
+async def probar_servicios(domains: list = SERVICE_TESTS, puerto: int = 443, timeout: float = 3.0) -> Dict[str, bool]:
+    res = await escaner_tcp.escanear_async([(d, puerto) for d in domains], timeout=timeout)
+    return {d: res[(d, puerto)]["abierto"] for d in domains}
+
+async def escanear_puertos_y_servicios(host: str = "www.google.com", puerto_http: int = 80, puerto_https: int = 443,
+                                       domains: list = SERVICE_TESTS, timeout: float = 3.0) -> Dict[str, Any]:
+    """
+    Versión asíncrona de pruebas_red.escanear_puertos_y_servicios (una sola pasada del escáner).
+    """
+    objetivos = [(host, puerto_http), (host, puerto_https)] + [(d, 443) for d in domains]
+    res = await escaner_tcp.escanear_async(objetivos, timeout=timeout)
+    return pruebas_red.repartir_escaneo(res, host, puerto_http, puerto_https, domains)
+
+async def _medir(coro) -> Tuple[Any, float]:
+    t0 = time.perf_counter()
+    res = await coro
+    return res, (time.perf_counter() - t0) * 1000.0
+
+async def _probar_gateway(gateway_ip: str, auto_detect_gateway: bool, timeout: float) -> Tuple[str, bool]:
+    used_gateway = gateway_ip
+    if not gateway_ip and auto_detect_gateway:
+        used_gateway = await asyncio.to_thread(pruebas_red.detectar_gateway_sistema)
+    gw_ok = False
+    if used_gateway:
+        gw_ok = await verificar_gateway(used_gateway, timeout=timeout)
+    return used_gateway, gw_ok
+
+async def ejecutar_diagnostico_async(gateway_ip: str = None, auto_detect_gateway: bool = True,
+                                     ping_host: str = DEFAULT_PING_HOST, host_puertos: str = "www.google.com",
+                                     puerto_http: int = 80, puerto_https: int = 443,
+                                     dns_domains: list = DNS_TEST_DOMAINS, servicios: list = SERVICE_TESTS,
+                                     timeout_ping: float = 2.0, timeout_puerto: float = 3.0,
+                                     presupuesto: Any = None, ping_adaptativo: bool = False) -> Dict[str, Any]:
+    """
+    Equivalente asíncrono de engine.ejecutar_diagnostico: lanza todas las pruebas en el bucle
+    actual y devuelve el mismo dict 'datos' (incluido 'tiempos_pruebas').
+    Con presupuesto los timeouts se recortan al tiempo restante y las pruebas que no terminan
+    a tiempo se cancelan y quedan en 'hechos_desconocidos'.
+    """
+    t0 = time.perf_counter()
+    presupuesto = Presupuesto.crear(presupuesto)
+    tiempo_max_ping = pinger.TIEMPO_MAX_S
+    if presupuesto is not None:
+        # Los pings de conexión duran además (CONTEO_PING - 1) intervalos
+        timeout_ping = presupuesto.timeout(timeout_ping, fijo=(pinger.CONTEO_PING - 1) * pinger.INTERVALO_S)
+        timeout_puerto = presupuesto.timeout(timeout_puerto)
+        tiempo_max_ping = presupuesto.timeout(tiempo_max_ping)
+    tareas = {
+        "gateway": _probar_gateway(gateway_ip, auto_detect_gateway, timeout_ping),
+        "conexion": medir_conexion(ping_host, timeout=timeout_ping, adaptativo=ping_adaptativo,
+                                   tiempo_max=tiempo_max_ping),
+        "dns": medir_dns(dns_domains, timeout=timeout_ping),
+        "tcp": escanear_puertos_y_servicios(host_puertos, puerto_http, puerto_https, servicios,
+                                            timeout=timeout_puerto),
+    }
+    resultados: Dict[str, Any] = {}
+    tiempos: Dict[str, float] = {}
+    desconocidas = set()
+    if presupuesto is None:
+        salidas = await asyncio.gather(*(_medir(c) for c in tareas.values()))
+        for n, (r, t) in zip(tareas, salidas):
+            resultados[n], tiempos[n] = r, t
+    else:
+        futuros = {n: asyncio.ensure_future(_medir(c)) for n, c in tareas.items()}
+        await asyncio.wait(list(futuros.values()), timeout=presupuesto.restante())
+        for n, fut in futuros.items():
+            if fut.done():
+                resultados[n], tiempos[n] = fut.result()
+            else:
+                fut.cancel()
+                resultados[n] = SIN_RESULTADO[n]
+                desconocidas.add(n)
+    repartir_tcp(resultados, tiempos, desconocidas)
+    # Las que terminaron sin poder decidir (p. ej. resolución agotada) también son desconocidas
+    desconocidas.update(n for n, res in resultados.items() if _sin_resultado(n, res))
+    # psutil es local y rápido: no merece un hilo
+    resultados["estado_adaptadores"], tiempos["estado_adaptadores"] = _estado_adaptadores_medido()
+    tiempos["total"] = (time.perf_counter() - t0) * 1000.0
+    datos = armar_datos(resultados, tiempos, desconocidas)
+    if presupuesto is not None:
+        datos.update(presupuesto.resumen())
+    return datos
+
+def _estado_adaptadores_medido() -> Tuple[Dict[str, bool], float]:
+    t0 = time.perf_counter()
+    res = pruebas_red.estado_adaptadores()
+    return res, (time.perf_counter() - t0) * 1000.0
@@ -0,0 +1,152 @@
+# motor_inferencia/resolutor.py
+import asyncio
+import ipaddress
+import socket
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+"""
+Resolución de nombres compartida por las pruebas de pruebas_red / pruebas_red_async.
+Un diagnóstico resuelve los mismos dominios varias veces (verificar_dns, comprobar_puerto
+para HTTP y HTTPS, probar_servicios); con este caché se consultan una sola vez.
+- TTL fijo para respuestas (getaddrinfo no da el TTL del registro) y otro más corto para
+  errores de resolución (caché negativo).
+- Tamaño acotado: al llenarse se expulsa la entrada usada hace más tiempo (LRU).
+- Single-flight: si varios hilos piden a la vez el mismo nombre sin caché, sólo uno
+  consulta y los demás esperan su resultado.
+- usar_cache=False consulta siempre (cuando la prueba es el propio DNS), pero la respuesta
+  sí se guarda para las pruebas siguientes.
+"""
+
+TTL_S = 60.0
+TTL_NEGATIVO_S = 10.0
+MAX_ENTRADAS = 1024
+
+Clave = Tuple[str, int]
+
+class _Vuelo:
+    """
+    Consulta en curso a la que se suman las peticiones concurrentes del mismo nombre.
+    """
+
+    def __init__(self):
+        self.listo = threading.Event()
+        self.direcciones: Optional[List[str]] = None
+        self.error: Optional[BaseException] = None
+
+class Resolutor:
+    """
+    Caché de getaddrinfo con TTL, tamaño máximo, caché negativo y single-flight.
+    """
+
+    def __init__(self, ttl: float = TTL_S, ttl_negativo: float = TTL_NEGATIVO_S, max_entradas: int = MAX_ENTRADAS):
+        self.ttl = ttl
+        self.ttl_negativo = ttl_negativo
+        self.max_entradas = max(1, max_entradas)
+        # clave -> (expira, direcciones o None, error o None)
+        self._cache: "OrderedDict[Clave, Tuple[float, Optional[List[str]], Optional[BaseException]]]" = OrderedDict()
+        self._vuelos: Dict[Clave, _Vuelo] = {}
+        self._lock = threading.Lock()
+        self._stats = dict.fromkeys(
+            ("consultas", "aciertos", "aciertos_negativos", "fallos", "compartidas", "expiradas", "expulsadas", "directas"), 0)
+
+    @staticmethod
+    def _consultar(host: str, familia: int) -> List[str]:
+        infos = socket.getaddrinfo(host, None, familia, socket.SOCK_STREAM)
+        return list(dict.fromkeys(info[4][0] for info in infos))
+
+    def _guardar(self, clave: Clave, direcciones: Optional[List[str]], error: Optional[BaseException]) -> None:
+        ttl = self.ttl if error is None else self.ttl_negativo
+        self._cache[clave] = (time.monotonic() + ttl, direcciones, error)
+        self._cache.move_to_end(clave)
+        while len(self._cache) > self.max_entradas:
+            self._cache.popitem(last=False)
+            self._stats["expulsadas"] += 1
+
+    def direcciones(self, host: str, familia: int = socket.AF_UNSPEC, usar_cache: bool = True) -> List[str]:
+        """
+        Direcciones IP de host (en el orden de getaddrinfo). Lanza socket.gaierror si no resuelve
+        (también desde el caché negativo). Un host que ya es una IP se devuelve tal cual.
+        """
+        try:
+            ip = ipaddress.ip_address(host)
+            if familia == socket.AF_UNSPEC or familia == (socket.AF_INET6 if ip.version == 6 else socket.AF_INET):
+                with self._lock:
+                    self._stats["directas"] += 1
+                return [host]
+        except ValueError:
+            pass
+        clave = (host.lower(), familia)
+        with self._lock:
+            self._stats["consultas"] += 1
+            if usar_cache:
+                entrada = self._cache.get(clave)
+                if entrada is not None:
+                    expira, direcciones, error = entrada
+                    if expira > time.monotonic():
+                        self._cache.move_to_end(clave)
+                        if error is not None:
+                            self._stats["aciertos_negativos"] += 1
+                            raise error
+                        self._stats["aciertos"] += 1
+                        return list(direcciones)
+                    del self._cache[clave]
+                    self._stats["expiradas"] += 1
+            vuelo = self._vuelos.get(clave)
+            lider = vuelo is None
+            if lider:
+                vuelo = self._vuelos[clave] = _Vuelo()
+                self._stats["fallos"] += 1
+            else:
+                self._stats["compartidas"] += 1
+        if not lider:
+            vuelo.listo.wait()
+        else:
+            try:
+                vuelo.direcciones = self._consultar(host, familia)
+            except socket.gaierror as e:
+                vuelo.error = e
+            except BaseException as e:
+                # Errores que no son del DNS (p. ej. interrupción): no se cachean
+                vuelo.error = e
+                with self._lock:
+                    del self._vuelos[clave]
+                vuelo.listo.set()
+                raise
+            with self._lock:
+                self._guardar(clave, vuelo.direcciones, vuelo.error)
+                del self._vuelos[clave]
+            vuelo.listo.set()
+        if vuelo.error is not None:
+            raise vuelo.error
+        return list(vuelo.direcciones)
+
+    def ipv4(self, host: str, usar_cache: bool = True) -> str:
+        """
+        Equivalente cacheado de socket.gethostbyname.
+        """
+        return self.direcciones(host, socket.AF_INET, usar_cache)[0]
+
+    async def direcciones_async(self, host: str, familia: int = socket.AF_UNSPEC, usar_cache: bool = True) -> List[str]:
+        # loop.getaddrinfo también usa un hilo del executor: mismo coste, pero con caché compartido
+        return await asyncio.get_running_loop().run_in_executor(None, self.direcciones, host, familia, usar_cache)
+
+    def limpiar(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def estadisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entradas"] = len(self._cache)
+        resueltas = stats["aciertos"] + stats["aciertos_negativos"] + stats["fallos"] + stats["compartidas"]
+        stats["tasa_aciertos"] = round((resueltas - stats["fallos"]) / resueltas, 3) if resueltas else None
+        return stats
+
+# Instancia compartida por todas las pruebas del proceso
+RESOLUTOR = Resolutor()
+
+def estadisticas() -> Dict[str, Any]:
+    return RESOLUTOR.estadisticas()
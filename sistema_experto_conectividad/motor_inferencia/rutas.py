@@ -0,0 +1,205 @@
+# motor_inferencia/rutas.py
+import errno
+import ipaddress
+import socket
+import struct
+import threading
+import time
+from typing import Dict, Any, List, Optional
+
+"""
+Puerta de enlace por defecto leída directamente de la tabla de rutas del kernel (Linux).
+detectar_gateway_sistema lanzaba 'ip route' en cada diagnóstico (fork + exec, hasta 2 s de
+timeout); con flota o monitor continuo ese coste domina. Aquí:
+- se leen /proc/net/route (IPv4) y /proc/net/ipv6_route (IPv6) y se toma la ruta por defecto
+  activa de menor métrica (las de tipo 'reject', como la 'unreachable' de lo, no cuentan);
+- el resultado se guarda en caché y se invalida cuando cambian las rutas: un socket netlink
+  suscrito a los grupos de rutas IPv4/IPv6 recibe un aviso por cada cambio y basta con
+  vaciarlo (una llamada no bloqueante) antes de usar el caché;
+- si no se puede abrir el socket netlink (contenedores restringidos) el caché caduca por TTL;
+- fuera de Linux (sin /proc/net/route) no hay tabla que leer y se devuelve None, para que
+  quien llame use su método de siempre.
+"""
+
+RUTA_IPV4 = "/proc/net/route"
+RUTA_IPV6 = "/proc/net/ipv6_route"
+TTL_SIN_NETLINK_S = 30.0
+
+# Flags de ruta (linux/route.h, linux/ipv6_route.h)
+RTF_UP = 0x0001
+RTF_GATEWAY = 0x0002
+RTF_REJECT = 0x0200
+# Grupos multicast de rtnetlink con los cambios de rutas
+RTMGRP_IPV4_ROUTE = 0x40
+RTMGRP_IPV6_ROUTE = 0x400
+
+def parsear_ipv4(texto: str) -> List[Dict[str, Any]]:
+    """
+    Rutas por defecto de /proc/net/route como [{gateway, interfaz, metrica}], de menor a mayor métrica.
+    Las direcciones están en hexadecimal con el orden de bytes de la máquina.
+    """
+    rutas = []
+    for linea in texto.splitlines()[1:]:
+        campos = linea.split()
+        if len(campos) < 8:
+            continue
+        interfaz, destino, gateway, flags, metrica, mascara = (campos[0], campos[1], campos[2],
+                                                               int(campos[3], 16), int(campos[6]), campos[7])
+        if int(destino, 16) or int(mascara, 16) or flags & (RTF_UP | RTF_GATEWAY) != RTF_UP | RTF_GATEWAY \
+                or flags & RTF_REJECT:
+            continue
+        ip = socket.inet_ntoa(struct.pack("=I", int(gateway, 16)))
+        rutas.append({"gateway": ip, "interfaz": interfaz, "metrica": metrica})
+    rutas.sort(key=lambda r: r["metrica"])
+    return rutas
+
+def parsear_ipv6(texto: str) -> List[Dict[str, Any]]:
+    """
+    Rutas por defecto de /proc/net/ipv6_route como [{gateway, interfaz, metrica}], de menor a mayor
+    métrica. Los gateways link-local llevan la interfaz ('fe80::1%eth0').
+    """
+    rutas = []
+    for linea in texto.splitlines():
+        campos = linea.split()
+        if len(campos) < 10:
+            continue
+        destino, prefijo, siguiente, metrica, flags, interfaz = (campos[0], int(campos[1], 16), campos[4],
+                                                                 int(campos[5], 16), int(campos[8], 16), campos[9])
+        if int(destino, 16) or prefijo or not int(siguiente, 16) or not flags & RTF_UP or flags & RTF_REJECT:
+            continue
+        ip = ipaddress.IPv6Address(bytes.fromhex(siguiente))
+        gateway = f"{ip}%{interfaz}" if ip.is_link_local else str(ip)
+        rutas.append({"gateway": gateway, "interfaz": interfaz, "metrica": metrica})
+    rutas.sort(key=lambda r: r["metrica"])
+    return rutas
+
+def _leer(ruta: str) -> Optional[str]:
+    try:
+        with open(ruta, "r", encoding="ascii") as f:
+            return f.read()
+    except OSError:
+        return None
+
+def _abrir_netlink() -> Optional[socket.socket]:
+    if not hasattr(socket, "AF_NETLINK"):
+        return None
+    try:
+        sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE)
+    except OSError:
+        return None
+    try:
+        sock.bind((0, RTMGRP_IPV4_ROUTE | RTMGRP_IPV6_ROUTE))
+        sock.setblocking(False)
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+class TablaRutas:
+    """
+    Gateways por defecto (IPv4 e IPv6) con caché invalidado por avisos netlink de cambio de rutas.
+    """
+
+    def __init__(self, ruta_ipv4: str = RUTA_IPV4, ruta_ipv6: str = RUTA_IPV6,
+                 ttl_sin_netlink: float = TTL_SIN_NETLINK_S, usar_netlink: bool = True):
+        self.ruta_ipv4 = ruta_ipv4
+        self.ruta_ipv6 = ruta_ipv6
+        self.ttl_sin_netlink = ttl_sin_netlink
+        self.usar_netlink = usar_netlink
+        self._netlink: Optional[socket.socket] = None
+        self._netlink_abierto = False
+        # (expira o None si lo invalida netlink, {'ipv4': [...], 'ipv6': [...]})
+        self._cache: Optional[tuple] = None
+        self._lock = threading.Lock()
+        self._stats = dict.fromkeys(("consultas", "aciertos", "lecturas", "cambios"), 0)
+
+    def _hubo_cambios(self) -> bool:
+        """
+        Vacía la cola del socket netlink; True si llegó algún aviso (o se desbordó y pudo perderse alguno).
+        """
+        cambios = False
+        while True:
+            try:
+                if not self._netlink.recv(65536):
+                    return cambios
+                cambios = True
+            except BlockingIOError:
+                return cambios
+            except OSError as e:
+                if e.errno != errno.ENOBUFS:
+                    # El socket ya no sirve: a partir de ahora, TTL
+                    self._netlink.close()
+                    self._netlink = None
+                return True
+
+    def _vigente(self) -> bool:
+        if self._cache is None:
+            return False
+        expira = self._cache[0]
+        if self._netlink is not None:
+            if self._hubo_cambios():
+                self._stats["cambios"] += 1
+                return False
+            return True
+        return expira is not None and time.monotonic() < expira
+
+    def rutas(self) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Rutas por defecto {'ipv4': [...], 'ipv6': [...]} (listas vacías si no hay o no es Linux).
+        """
+        with self._lock:
+            self._stats["consultas"] += 1
+            if self.usar_netlink and not self._netlink_abierto:
+                # Suscribirse antes de la primera lectura para no perder cambios intermedios
+                self._netlink = _abrir_netlink()
+                self._netlink_abierto = True
+            if self._vigente():
+                self._stats["aciertos"] += 1
+                return {f: list(r) for f, r in self._cache[1].items()}
+            self._stats["lecturas"] += 1
+            texto4 = _leer(self.ruta_ipv4)
+            texto6 = _leer(self.ruta_ipv6)
+            rutas = {
+                "ipv4": parsear_ipv4(texto4) if texto4 else [],
+                "ipv6": parsear_ipv6(texto6) if texto6 else [],
+            }
+            expira = None if self._netlink is not None else time.monotonic() + self.ttl_sin_netlink
+            self._cache = (expira, rutas)
+            return {f: list(r) for f, r in rutas.items()}
+
+    def gateway(self, familia: str = "ipv4") -> Optional[str]:
+        """
+        Gateway de la ruta por defecto de menor métrica de la familia ('ipv4' o 'ipv6'), o None.
+        """
+        rutas = self.rutas()[familia]
+        return rutas[0]["gateway"] if rutas else None
+
+    def invalidar(self) -> None:
+        with self._lock:
+            self._cache = None
+
+    def cerrar(self) -> None:
+        with self._lock:
+            if self._netlink is not None:
+                self._netlink.close()
+            self._netlink = None
+            self._netlink_abierto = False
+            self._cache = None
+
+    def estadisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["netlink"] = self._netlink is not None
+        return stats
+
+# Instancia compartida por todas las pruebas del proceso
+TABLA = TablaRutas()
+
+def gateway_ipv4() -> Optional[str]:
+    return TABLA.gateway("ipv4")
+
+def gateway_ipv6() -> Optional[str]:
+    return TABLA.gateway("ipv6")
+
+def estadisticas() -> Dict[str, Any]:
+    return TABLA.estadisticas()
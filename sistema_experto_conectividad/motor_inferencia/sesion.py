@@ -0,0 +1,131 @@
+# motor_inferencia/sesion.py
+import time
+from collections import Counter
+from typing import Dict, Any, List, Optional
+
+from sistema_experto_conectividad.base_de_conocimiento import cargador_reglas
+from sistema_experto_conectividad.motor_inferencia import engine
+from sistema_experto_conectividad.motor_inferencia.estadisticas_rtt import EstadisticasRTT
+from sistema_experto_conectividad.motor_inferencia.fuzzificacion import membership_latencia, membership_perdida
+from sistema_experto_conectividad.storage.historial import CLAVES_SIMILITUD
+
+"""
+Inferencia incremental para monitorizar un mismo objetivo cada pocos segundos.
+La sesión guarda los últimos hechos, los hallazgos de cada unidad del motor compilado
+(compilador_reglas: nodos de tablas y reglas directas) y los pasos de acción.
+En cada observación:
+- sólo se reevalúan las unidades que leen algún hecho que cambió;
+- los pasos (que incluyen la búsqueda de casos similares en el historial) sólo se regeneran
+  si cambian las inferencias, algún hecho booleano que puntúa la búsqueda o el nivel difuso
+  (baja/media/alta) de latencia o pérdida: la latencia medida varía en cada observación y
+  compararla tal cual rehacía la búsqueda casi siempre;
+- se devuelve el delta: inferencias agregadas y eliminadas respecto a la observación anterior.
+Si el motor cambia (REGLAS modificadas o recarga de reglas en archivo) se reevalúa todo.
+Las muestras de ping de todas las observaciones alimentan unas estadísticas de RTT de la
+sesión (estadisticas_rtt, memoria constante aunque se monitorice durante horas).
+"""
+
+def _distinto(a: Any, b: Any) -> bool:
+    # 1 == True pero una regla puede distinguirlos: también cuenta el cambio de tipo
+    return type(a) is not type(b) or a != b
+
+_AUSENTE = object()
+
+def _nivel(grados: Dict[str, float]) -> int:
+    # Mismos umbrales que fuzzificacion.evaluar_severidad
+    return 2 if grados["alta"] > 0.6 else 1 if grados["media"] > 0.5 else 0
+
+def _valor_similitud(datos: Dict[str, Any], clave: str) -> Any:
+    v = datos.get(clave, _AUSENTE)
+    if v is _AUSENTE or v is None:
+        return v
+    if clave == "latencia_ms":
+        return _nivel(membership_latencia(v))
+    if clave == "perdida_pct":
+        return _nivel(membership_perdida(v))
+    return v
+
+class SesionInferencia:
+    """
+    Mantiene el estado de inferencia de un objetivo entre observaciones sucesivas.
+    """
+
+    def __init__(self, generar_pasos: bool = True):
+        self.generar_pasos = generar_pasos
+        self.datos: Dict[str, Any] = {}
+        self.inferencias: List[str] = []
+        self.pasos: List[Dict[str, Any]] = []
+        self.observaciones = 0
+        self._motor = None
+        self._por_unidad: List[List[Any]] = []
+        self.rtt = EstadisticasRTT()
+
+    def _reevaluar(self, motor, datos: Dict[str, Any], cambiados: set) -> int:
+        if motor is not self._motor:
+            self._motor = motor
+            self._por_unidad = [motor.evaluar_unidad(i, datos) for i in range(len(motor.unidades))]
+            return len(motor.unidades)
+        afectadas = set(motor.sin_dependencias)
+        for h in cambiados:
+            afectadas.update(motor.dependencias.get(h, ()))
+        for i in afectadas:
+            self._por_unidad[i] = motor.evaluar_unidad(i, datos)
+        return len(afectadas)
+
+    def observar(self, datos: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Procesa una nueva observación y devuelve:
+        {agregados, eliminados, cambio, inferencias, pasos, hechos_cambiados, unidades_reevaluadas, rtt, tiempo_ms}
+        """
+        t0 = time.perf_counter()
+        datos = dict(datos)
+        anteriores = self.datos
+        cambiados = {k for k in anteriores.keys() | datos.keys()
+                     if k not in anteriores or k not in datos or _distinto(anteriores[k], datos[k])}
+        primera = self.observaciones == 0
+
+        reevaluadas = self._reevaluar(cargador_reglas.motor(), datos, cambiados)
+        hallazgos = sorted(h for hs in self._por_unidad for h in hs)
+        inferencias = [h[2] for h in hallazgos] if hallazgos else ["Fallo no identificado: requiere diagnóstico avanzado."]
+
+        antes, ahora = Counter(self.inferencias), Counter(inferencias)
+        agregados = [m for m in inferencias if m in ahora - antes]
+        eliminados = [m for m in self.inferencias if m in antes - ahora]
+        cambio = primera or inferencias != self.inferencias
+
+        similitud = any(_distinto(_valor_similitud(anteriores, k), _valor_similitud(datos, k))
+                        for k in cambiados.intersection(CLAVES_SIMILITUD))
+        if self.generar_pasos and (cambio or similitud):
+            self.pasos = engine.generar_pasos_accion(datos, inferencias)
+
+        self.rtt.extender(datos.get("rtts_ms") or ())
+        self.datos = datos
+        self.inferencias = inferencias
+        self.observaciones += 1
+        return {
+            "agregados": agregados,
+            "eliminados": eliminados,
+            "cambio": cambio,
+            "inferencias": inferencias,
+            "pasos": self.pasos,
+            "hechos_cambiados": sorted(cambiados),
+            "unidades_reevaluadas": reevaluadas,
+            "rtt": self.rtt.hechos(),
+            "tiempo_ms": round((time.perf_counter() - t0) * 1000.0, 3),
+        }
+
+    def reiniciar(self) -> None:
+        self.__init__(self.generar_pasos)
+
+def monitorizar(gateway_ip: Optional[str] = None, intervalo: float = 5.0, concurrente: bool = True,
+                auto_detect_gateway: bool = True):
+    """
+    Generador: diagnostica el objetivo cada 'intervalo' segundos y entrega (datos, delta).
+    """
+    sesion = SesionInferencia()
+    while True:
+        t0 = time.monotonic()
+        datos = engine.ejecutar_diagnostico(gateway_ip=gateway_ip, auto_detect_gateway=auto_detect_gateway,
+                                            concurrente=concurrente)
+        yield datos, sesion.observar(datos)
+        time.sleep(max(0.0, intervalo - (time.monotonic() - t0)))
@@ -0,0 +1,63 @@
+# motor_inferencia/sockets_async.py
+import asyncio
+import select
+import socket
+from typing import Any, Tuple
+
+"""
+recvfrom/sendto de datagramas en el bucle de eventos para cliente_dns y pinger.
+loop.sock_recvfrom y loop.sock_sendto sólo existen desde Python 3.11; en versiones anteriores
+se espera a que el socket (no bloqueante) sea legible con loop.add_reader, y si el bucle no lo
+permite (Proactor en Windows) la espera se hace en un hilo del executor.
+"""
+
+def _recvfrom_en_hilo(sock: socket.socket, n: int) -> Tuple[bytes, Any]:
+    while True:
+        try:
+            select.select([sock], [], [], 0.1)
+        except ValueError:
+            # El socket se cerró mientras se esperaba
+            raise OSError("socket cerrado")
+        try:
+            return sock.recvfrom(n)
+        except (BlockingIOError, InterruptedError):
+            continue
+
+async def recvfrom(loop: asyncio.AbstractEventLoop, sock: socket.socket, n: int) -> Tuple[bytes, Any]:
+    if hasattr(loop, "sock_recvfrom"):
+        return await loop.sock_recvfrom(sock, n)
+    try:
+        return sock.recvfrom(n)
+    except (BlockingIOError, InterruptedError):
+        pass
+    fut = loop.create_future()
+
+    def _legible() -> None:
+        if fut.done():
+            return
+        try:
+            fut.set_result(sock.recvfrom(n))
+        except (BlockingIOError, InterruptedError):
+            return
+        except BaseException as e:
+            fut.set_exception(e)
+
+    fd = sock.fileno()
+    try:
+        loop.add_reader(fd, _legible)
+    except NotImplementedError:
+        return await loop.run_in_executor(None, _recvfrom_en_hilo, sock, n)
+    try:
+        return await fut
+    finally:
+        loop.remove_reader(fd)
+
+async def sendto(loop: asyncio.AbstractEventLoop, sock: socket.socket, data: bytes, destino: Any) -> int:
+    if hasattr(loop, "sock_sendto"):
+        return await loop.sock_sendto(sock, data, destino)
+    while True:
+        try:
+            return sock.sendto(data, destino)
+        except (BlockingIOError, InterruptedError):
+            # Búfer de envío lleno (raro con datagramas pequeños): se reintenta enseguida
+            await asyncio.sleep(0.001)
@@ -1,36 +1,494 @@
-# storage/history.py
+# storage/historial.py
+import atexit
 import json
+import logging
 import os
+import time
 from typing import Dict, Any, List, Optional
 from datetime import datetime
 import math
+import threading
 
-HISTORY_FILE = os.path.join(os.path.dirname(__file__), "historial_diagnosticos.json")
+from sistema_experto_conectividad.storage.indice_firmas import IndiceFirmas
 
-def _leer_raw() -> List[Dict[str, Any]]:
-    if not os.path.exists(HISTORY_FILE):
-        return []
+HISTORY_FILE = os.path.join(os.path.dirname(__file__), "historial_diagnosticos.jsonl")
+# Formato anterior (array JSON reescrito entero en cada diagnóstico); se migra una sola vez
+LEGACY_HISTORY_FILE = os.path.join(os.path.dirname(__file__), "historial_diagnosticos.json")
+
+# fsync por lotes: se sincroniza cada FSYNC_CADA registros o cada FSYNC_INTERVALO_S segundos
+FSYNC_CADA = 16
+FSYNC_INTERVALO_S = 2.0
+# Número de actualizaciones pendientes (p. ej. soluciones aplicadas) que dispara la compactación
+UMBRAL_COMPACTACION = 64
+
+# Campo que marca una línea de actualización (no es un diagnóstico)
+_OP = "_op"
+
+# Hechos booleanos comparados por _score_similitud
+CLAVES_BOOL = ["conexion", "dns", "gateway", "puertos_http", "puertos_https"]
+# Todos los hechos que lee _score_similitud
+CLAVES_SIMILITUD = CLAVES_BOOL + ["latencia_ms", "perdida_pct"]
+# _PUNTOS_BOOL[m]: puntuación tras m coincidencias booleanas, sumada igual que en _score_similitud
+_PUNTOS_BOOL = [0.0]
+for _ in CLAVES_BOOL:
+    _PUNTOS_BOOL.append(_PUNTOS_BOOL[-1] + 0.6 / len(CLAVES_BOOL))
+
+# Backend alternativo opcional ("sqlite"); None = log JSONL de este módulo
+BACKEND_ENV = "SISTEMA_EXPERTO_HISTORIAL"
+
+logger = logging.getLogger("historial")
+
+# Serializa escrituras y compactación cuando varios hilos registran a la vez (flota)
+_LOCK = threading.RLock()
+_fh = None
+_sin_sync = 0
+_ultimo_sync = 0.0
+_ops_pendientes = 0
+_compactando = False
+_backend = None
+# Índice por firmas para buscar casos similares (se construye al primer uso)
+_indice = None
+
+def migrar_desde_json(origen: str = None, destino: str = None) -> int:
+    """
+    Convierte el historial antiguo (array JSON) al log JSONL. Solo actúa si el destino no existe.
+    El archivo original se conserva. Devuelve el número de registros migrados.
+    """
+    origen = origen or LEGACY_HISTORY_FILE
+    destino = destino or HISTORY_FILE
+    if os.path.exists(destino) or not os.path.exists(origen):
+        return 0
     try:
-        with open(HISTORY_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
+        with open(origen, "r", encoding="utf-8") as f:
+            items = json.load(f)
     except Exception:
-        return []
+        logger.exception("No se pudo leer el historial antiguo %s", origen)
+        return 0
+    _escribir_atomico(destino, items)
+    logger.info("Historial migrado a JSONL: %d registros", len(items))
+    return len(items)
+
+def _escribir_atomico(ruta: str, items: List[Dict[str, Any]]) -> None:
+    tmp = ruta + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        for it in items:
+            f.write(json.dumps(it, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, ruta)
+
+class _CacheHistorial:
+    """
+    Registros ya parseados del log, compartidos por todas las lecturas del proceso.
+    Se valida con (inodo, tamaño, mtime) del archivo: si sólo creció (mismo inodo) se parsean
+    únicamente los bytes nuevos; si cambió de otra forma se vuelve a leer entero.
+    """
+
+    def __init__(self):
+        self.ruta: Optional[str] = None
+        self.firma: Optional[tuple] = None
+        self.offset = 0
+        self.registros: List[Dict[str, Any]] = []
+        self.por_ts: Dict[str, Dict[str, Any]] = {}
+        self.aciertos = 0
+        self.lecturas_incrementales = 0
+        self.recargas = 0
+
+    def reiniciar(self) -> None:
+        self.ruta = None
+        self.firma = None
+        self.offset = 0
+        self.registros = []
+        self.por_ts = {}
+
+    @staticmethod
+    def firma_de(ruta: str) -> Optional[tuple]:
+        try:
+            st = os.stat(ruta)
+        except OSError:
+            return None
+        return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def _aplicar_linea(self, obj: Dict[str, Any], nuevos: List[Dict[str, Any]]) -> None:
+        if obj.get(_OP) == "solucion":
+            it = self.por_ts.get(obj.get("timestamp"))
+            if it is not None:
+                it["solucion_aplicada"] = obj.get("solucion_aplicada")
+            return
+        self.registros.append(obj)
+        nuevos.append(obj)
+        if "timestamp" in obj:
+            self.por_ts.setdefault(obj["timestamp"], obj)
+
+    def _parsear_desde(self, ruta: str, offset: int) -> List[Dict[str, Any]]:
+        nuevos: List[Dict[str, Any]] = []
+        with open(ruta, "rb") as f:
+            f.seek(offset)
+            bloque = f.read()
+        # Sólo se consumen líneas completas; una línea a medio escribir se lee en la próxima vuelta
+        fin = bloque.rfind(b"\n") + 1
+        for linea in bloque[:fin].splitlines():
+            linea = linea.strip()
+            if not linea:
+                continue
+            try:
+                obj = json.loads(linea)
+            except ValueError:
+                # Línea truncada por un corte a mitad de escritura: se ignora
+                logger.warning("Línea corrupta ignorada en el historial")
+                continue
+            self._aplicar_linea(obj, nuevos)
+        self.offset = offset + fin
+        return nuevos
+
+    def obtener(self, ruta: str) -> List[Dict[str, Any]]:
+        firma = self.firma_de(ruta)
+        if firma is None:
+            if self.ruta != ruta or self.registros:
+                self.reiniciar()
+                invalidar_indice()
+            self.ruta = ruta
+            return self.registros
+        if self.ruta == ruta and firma == self.firma:
+            self.aciertos += 1
+            return self.registros
+        if self.ruta == ruta and self.firma is not None and firma[0] == self.firma[0] and firma[1] >= self.offset:
+            # Mismo archivo que sólo ha crecido (append-only): se parsea la cola
+            self.lecturas_incrementales += 1
+            nuevos = self._parsear_desde(ruta, self.offset)
+            _indexar(nuevos)
+        else:
+            self.recargas += 1
+            self.reiniciar()
+            invalidar_indice()
+            self._parsear_desde(ruta, 0)
+        self.ruta = ruta
+        self.firma = firma
+        return self.registros
+
+    def adoptar(self, ruta: str) -> None:
+        """
+        El archivo se reescribió con exactamente los registros en caché (compactación).
+        """
+        self.ruta = ruta
+        self.firma = self.firma_de(ruta)
+        self.offset = self.firma[1] if self.firma else 0
+
+_cache = _CacheHistorial()
+
+def _leer_raw() -> List[Dict[str, Any]]:
+    """
+    Registros del log (con las actualizaciones ya aplicadas), servidos desde la caché del proceso.
+    La lista es compartida: quien la reciba no debe modificarla.
+    """
+    with _LOCK:
+        migrar_desde_json()
+        if _fh is not None:
+            _fh.flush()
+        return _cache.obtener(HISTORY_FILE)
+
+# Tamaño de bloque al leer el log hacia atrás
+BLOQUE_COLA = 64 * 1024
+
+class CursorHistorial:
+    """
+    Posición para seguir paginando hacia registros más antiguos (ver leer_pagina).
+    'pendientes' son las actualizaciones ya vistas cuyo registro aún no ha salido
+    (acotadas por la compactación).
+    """
+    __slots__ = ("ruta", "inodo", "offset", "pendientes")
+
+    def __init__(self, ruta: str, inodo: int, offset: int, pendientes: Dict[str, Any]):
+        self.ruta = ruta
+        self.inodo = inodo
+        self.offset = offset
+        self.pendientes = pendientes
+
+    @property
+    def agotado(self) -> bool:
+        return self.offset <= 0
+
+def _lineas_hacia_atras(f, fin: int):
+    """
+    Genera (inicio, bytes_linea) desde la posición 'fin' hacia el principio del archivo,
+    de la línea más nueva a la más antigua.
+    """
+    resto = b""
+    pos = fin
+    while pos > 0:
+        leer = min(BLOQUE_COLA, pos)
+        pos -= leer
+        f.seek(pos)
+        partes = (f.read(leer) + resto).split(b"\n")
+        # El primer trozo puede ser el final de una línea que empieza en el bloque anterior
+        resto = partes[0]
+        inicio = pos + len(resto) + 1
+        lineas = []
+        for linea in partes[1:]:
+            lineas.append((inicio, linea))
+            inicio += len(linea) + 1
+        yield from reversed(lineas)
+    if resto:
+        yield 0, resto
+
+def _leer_cola(limit: int, cursor: Optional[CursorHistorial] = None):
+    """
+    Decodifica sólo los últimos 'limit' registros (antes de 'cursor' si se da), leyendo el log
+    hacia atrás por bloques. Devuelve (registros de más antiguo a más nuevo, cursor siguiente).
+    """
+    with _LOCK:
+        migrar_desde_json()
+        if _fh is not None:
+            _fh.flush()
+        firma = _CacheHistorial.firma_de(HISTORY_FILE)
+        if firma is None:
+            return [], None
+        if cursor is None:
+            # Se ignora una última línea sin '\n' (escritura a medias)
+            with open(HISTORY_FILE, "rb") as f:
+                fin = firma[1]
+                if fin > 0:
+                    f.seek(fin - 1)
+                    if f.read(1) != b"\n":
+                        f.seek(max(0, fin - BLOQUE_COLA))
+                        cola = f.read(fin - max(0, fin - BLOQUE_COLA))
+                        fin = max(0, fin - BLOQUE_COLA) + cola.rfind(b"\n") + 1
+            cursor = CursorHistorial(HISTORY_FILE, firma[0], fin, {})
+        elif cursor.ruta != HISTORY_FILE or cursor.inodo != firma[0]:
+            raise ValueError("El historial se reescribió (compactación); vuelve a pedir la primera página")
+        pendientes = dict(cursor.pendientes)
+        items: List[Dict[str, Any]] = []
+        siguiente = 0
+        with open(HISTORY_FILE, "rb") as f:
+            for inicio, linea in _lineas_hacia_atras(f, cursor.offset):
+                if len(items) >= limit:
+                    break
+                siguiente = inicio
+                linea = linea.strip()
+                if not linea:
+                    continue
+                try:
+                    obj = json.loads(linea)
+                except ValueError:
+                    logger.warning("Línea corrupta ignorada en el historial")
+                    continue
+                if obj.get(_OP) == "solucion":
+                    # La actualización más reciente es la primera que se ve
+                    pendientes.setdefault(obj.get("timestamp"), obj.get("solucion_aplicada"))
+                    continue
+                ts = obj.get("timestamp")
+                if ts in pendientes:
+                    obj["solucion_aplicada"] = pendientes[ts]
+                items.append(obj)
+            else:
+                siguiente = 0
+        items.reverse()
+        return items, CursorHistorial(HISTORY_FILE, firma[0], siguiente, pendientes)
+
+def estadisticas_cache() -> Dict[str, int]:
+    """
+    Contadores de la caché del historial: aciertos, lecturas incrementales y recargas completas.
+    """
+    with _LOCK:
+        return {
+            "aciertos": _cache.aciertos,
+            "fallos": _cache.lecturas_incrementales + _cache.recargas,
+            "lecturas_incrementales": _cache.lecturas_incrementales,
+            "recargas": _cache.recargas,
+            "registros": len(_cache.registros),
+        }
 
 def _escribir_raw(items: List[Dict[str, Any]]) -> None:
-    with open(HISTORY_FILE, "w", encoding="utf-8") as f:
-        json.dump(items, f, indent=2, ensure_ascii=False)
+    """
+    Reescribe el log completo de forma atómica con 'items'.
+    """
+    global _ops_pendientes
+    with _LOCK:
+        _cerrar()
+        _escribir_atomico(HISTORY_FILE, items)
+        _ops_pendientes = 0
+        _cache.reiniciar()
+        invalidar_indice()
+
+def invalidar_indice() -> None:
+    """
+    Descarta el índice de similitud en memoria; se reconstruye en la siguiente búsqueda.
+    """
+    global _indice
+    with _LOCK:
+        _indice = None
+
+def _obtener_indice() -> IndiceFirmas:
+    global _indice
+    with _LOCK:
+        registros = _leer_raw()
+        if _indice is None:
+            idx = IndiceFirmas(CLAVES_BOOL, _PUNTOS_BOOL, _score_similitud)
+            idx.agregar_muchos(registros)
+            _indice = idx
+        return _indice
+
+def _indexar(nuevos: List[Dict[str, Any]]) -> None:
+    # Registros recién leídos de la cola del log: se añaden al índice ya construido
+    if _indice is not None:
+        for r in nuevos:
+            _indice.agregar(r)
+
+def _abrir_para_anexar():
+    global _fh, _ultimo_sync
+    if _fh is None:
+        migrar_desde_json()
+        _fh = open(HISTORY_FILE, "a+", encoding="utf-8")
+        # Si la última línea quedó truncada, se cierra antes de anexar
+        if _fh.tell() > 0:
+            _fh.seek(_fh.tell() - 1)
+            if _fh.read(1) != "\n":
+                _fh.write("\n")
+        _ultimo_sync = time.monotonic()
+    return _fh
+
+def _anexar(obj: Dict[str, Any]) -> None:
+    """
+    Añade una línea al log en O(1). El fsync se hace por lotes.
+    """
+    global _sin_sync
+    with _LOCK:
+        fh = _abrir_para_anexar()
+        fh.write(json.dumps(obj, ensure_ascii=False) + "\n")
+        fh.flush()
+        _sin_sync += 1
+        if _sin_sync >= FSYNC_CADA or time.monotonic() - _ultimo_sync >= FSYNC_INTERVALO_S:
+            sincronizar()
+
+def sincronizar() -> None:
+    """
+    Fuerza a disco (fsync) todo lo anexado hasta ahora.
+    """
+    global _sin_sync, _ultimo_sync
+    with _LOCK:
+        if _fh is not None:
+            _fh.flush()
+            os.fsync(_fh.fileno())
+        _sin_sync = 0
+        _ultimo_sync = time.monotonic()
+
+def _cerrar() -> None:
+    global _fh
+    with _LOCK:
+        if _fh is not None:
+            sincronizar()
+            _fh.close()
+            _fh = None
+
+atexit.register(_cerrar)
+
+def compactar() -> int:
+    """
+    Pliega las actualizaciones en sus registros y reescribe el log. Devuelve los registros escritos.
+    """
+    global _ops_pendientes
+    with _LOCK:
+        items = _leer_raw()
+        _cerrar()
+        _escribir_atomico(HISTORY_FILE, items)
+        _ops_pendientes = 0
+        # El contenido no cambia: la caché y los índices siguen siendo válidos
+        _cache.adoptar(HISTORY_FILE)
+        return len(items)
+
+def _compactar_en_segundo_plano() -> None:
+    global _compactando
+    with _LOCK:
+        if _compactando:
+            return
+        _compactando = True
+
+    def _tarea():
+        global _compactando
+        try:
+            compactar()
+        except Exception:
+            logger.exception("Error compactando el historial")
+        finally:
+            _compactando = False
+
+    threading.Thread(target=_tarea, name="historial-compactacion", daemon=True).start()
+
+def configurar_backend(nombre: Optional[str] = None, ruta: Optional[str] = None) -> None:
+    """
+    Selecciona dónde se guarda el historial: None/"jsonl" (por defecto) o "sqlite".
+    Al pasar a SQLite por primera vez se copian los registros del log JSONL.
+    """
+    global _backend
+    with _LOCK:
+        invalidar_indice()
+        if not nombre or nombre == "jsonl":
+            _backend = None
+            return
+        if nombre != "sqlite":
+            raise ValueError(f"Backend de historial desconocido: {nombre}")
+        from sistema_experto_conectividad.storage import historial_sqlite
+        if ruta:
+            historial_sqlite.DB_FILE = ruta
+        if historial_sqlite.contar() == 0:
+            items = _leer_raw()
+            if items:
+                historial_sqlite.insertar_muchos(items)
+                logger.info("Historial copiado a SQLite: %d registros", len(items))
+        _backend = historial_sqlite
 
 def registrar_diagnostico(datos: Dict[str, Any], resultado: str, solucion_aplicada: Optional[str] = None) -> None:
     registro = dict(datos)
     registro["diagnostico"] = resultado
     registro["solucion_aplicada"] = solucion_aplicada
     registro["timestamp"] = datetime.utcnow().isoformat() + "Z"
-    historico = _leer_raw()
-    historico.append(registro)
-    _escribir_raw(historico)
+    if _backend is not None:
+        _backend.insertar(registro)
+        return
+    # La caché (y los índices) recogen el registro al leer la cola del log
+    _anexar(registro)
 
 def leer_historial(limit: int = 100) -> List[Dict[str, Any]]:
-    return _leer_raw()[-limit:]
+    if _backend is not None:
+        return _backend.leer_historial(limit)
+    with _LOCK:
+        if limit <= 0 or (_cache.ruta == HISTORY_FILE and _cache.firma is not None):
+            # Caché ya cargada: ponerla al día sólo cuesta leer lo anexado.
+            # Se devuelven copias para que quien llame no pueda alterar la caché
+            return [dict(it) for it in _leer_raw()[-limit:]]
+        return _leer_cola(limit)[0]
+
+def leer_pagina(limit: int = 50, cursor: Any = None):
+    """
+    Página de hasta 'limit' registros (de más antiguo a más nuevo) y el cursor para la página
+    anterior; cursor None = la más reciente. Sólo se decodifica la página pedida.
+    Devuelve (registros, cursor_siguiente); cursor_siguiente es None cuando no quedan más.
+    """
+    if _backend is not None:
+        return _backend.leer_pagina(limit, cursor)
+    items, siguiente = _leer_cola(limit, cursor)
+    if siguiente is None or siguiente.agotado:
+        siguiente = None
+    return items, siguiente
+
+def buscar_historial(texto: str, limit: int = 50) -> List[Dict[str, Any]]:
+    """
+    Casos cuyo timestamp, severidad o diagnóstico contienen 'texto' (sin distinguir mayúsculas),
+    del más reciente al más antiguo. Con SQLite se añaden las coincidencias del índice FTS
+    (prefijos de palabra, también en solucion_aplicada).
+    """
+    if _backend is not None:
+        return _backend.buscar_historial(texto, limit)
+    texto = texto.lower()
+    res = []
+    for item in reversed(_leer_raw()):
+        if (texto in (item.get("timestamp") or "").lower() or
+                texto in (item.get("diagnostico") or "").lower() or
+                texto in (item.get("severidad") or "").lower()):
+            res.append(dict(item))
+            if len(res) >= limit:
+                break
+    return res
 
 def _score_similitud(a: Dict[str, Any], b: Dict[str, Any]) -> float:
     """
@@ -40,7 +498,7 @@ def _score_similitud(a: Dict[str, Any], b: Dict[str, Any]) -> float:
     """
     score = 0.0
     # Booleans (peso total 0.6)
-    keys_bool = ["conexion", "dns", "gateway", "puertos_http", "puertos_https"]
+    keys_bool = CLAVES_BOOL
     per_key = 0.6 / len(keys_bool)
     for k in keys_bool:
         if k in a and k in b and a[k] == b[k]:
@@ -67,14 +525,11 @@ def _score_similitud(a: Dict[str, Any], b: Dict[str, Any]) -> float:
     return min(1.0, score)
 
 def buscar_casos_similares(datos: Dict[str, Any], top_n: int = 3, min_score: float = 0.4) -> List[Dict[str, Any]]:
-    historico = _leer_raw()
-    scored = []
-    for item in historico:
-        s = _score_similitud(datos, item)
-        if s >= min_score:
-            scored.append((s, item))
-    scored.sort(key=lambda x: -x[0])
-    return [dict(item, similitud=round(score, 3)) for score, item in scored[:top_n]]
+    if _backend is not None:
+        return _backend.buscar_casos_similares(datos, top_n=top_n, min_score=min_score, puntos_bool=_PUNTOS_BOOL)
+    # Búsqueda acotada por firmas: mismo resultado que puntuar y ordenar todo el historial
+    scored = _obtener_indice().buscar(datos, top_n=top_n, min_score=min_score)
+    return [dict(item, similitud=round(score, 3)) for score, item in scored]
 
 def aplicar_solucion_a_caso(caso: Dict[str, Any], solucion: str) -> None:
     """
@@ -83,12 +538,16 @@ def aplicar_solucion_a_caso(caso: Dict[str, Any], solucion: str) -> None:
     """
     if "timestamp" not in caso:
         return
-    historico = _leer_raw()
-    updated = False
-    for it in historico:
-        if it.get("timestamp") == caso["timestamp"]:
-            it["solucion_aplicada"] = solucion
-            updated = True
-            break
-    if updated:
-        _escribir_raw(historico)
+    if _backend is not None:
+        _backend.aplicar_solucion_a_caso(caso, solucion)
+        return
+    global _ops_pendientes
+    with _LOCK:
+        # Se anexa una línea de actualización; la compactación la pliega después
+        _anexar({_OP: "solucion", "timestamp": caso["timestamp"], "solucion_aplicada": solucion})
+        _ops_pendientes += 1
+        if _ops_pendientes >= UMBRAL_COMPACTACION:
+            _compactar_en_segundo_plano()
+
+if os.environ.get(BACKEND_ENV):
+    configurar_backend(os.environ[BACKEND_ENV])
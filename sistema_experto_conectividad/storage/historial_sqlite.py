@@ -0,0 +1,238 @@
+# storage/historial_sqlite.py
+import json
+import logging
+import os
+import sqlite3
+import threading
+from typing import Dict, Any, List, Optional, Iterable
+
+"""
+Backend opcional del historial sobre sqlite3 (biblioteca estándar).
+- Columnas indexadas: timestamp, severidad, gateway_ip y los hechos booleanos.
+- Índice FTS5 sobre diagnostico/solucion_aplicada (si el sqlite del sistema lo incluye;
+  si no, la búsqueda de texto cae a LIKE).
+- buscar_casos_similares calcula la puntuación en SQL con la misma aritmética que
+  historial._score_similitud, así que no se carga el historial en Python.
+El registro completo se guarda también como JSON en la columna 'datos'.
+"""
+
+DB_FILE = os.path.join(os.path.dirname(__file__), "historial_diagnosticos.sqlite3")
+
+logger = logging.getLogger("historial")
+
+CLAVES_BOOL = ["conexion", "dns", "gateway", "puertos_http", "puertos_https"]
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS diagnosticos (
+    id INTEGER PRIMARY KEY,
+    timestamp TEXT,
+    severidad TEXT,
+    gateway_ip TEXT,
+    conexion INTEGER,
+    dns INTEGER,
+    gateway INTEGER,
+    puertos_http INTEGER,
+    puertos_https INTEGER,
+    latencia_ms REAL,
+    perdida_pct REAL,
+    diagnostico TEXT,
+    solucion_aplicada TEXT,
+    datos TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_diag_timestamp ON diagnosticos(timestamp);
+CREATE INDEX IF NOT EXISTS idx_diag_severidad ON diagnosticos(severidad);
+CREATE INDEX IF NOT EXISTS idx_diag_gateway_ip ON diagnosticos(gateway_ip);
+CREATE INDEX IF NOT EXISTS idx_diag_hechos ON diagnosticos(conexion, dns, gateway, puertos_http, puertos_https);
+"""
+
+_ESQUEMA_FTS = """
+CREATE VIRTUAL TABLE IF NOT EXISTS diagnosticos_fts USING fts5(
+    diagnostico, solucion_aplicada, content='diagnosticos', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS diagnosticos_ai AFTER INSERT ON diagnosticos BEGIN
+    INSERT INTO diagnosticos_fts(rowid, diagnostico, solucion_aplicada)
+    VALUES (new.id, new.diagnostico, new.solucion_aplicada);
+END;
+CREATE TRIGGER IF NOT EXISTS diagnosticos_au AFTER UPDATE OF diagnostico, solucion_aplicada ON diagnosticos BEGIN
+    INSERT INTO diagnosticos_fts(diagnosticos_fts, rowid, diagnostico, solucion_aplicada)
+    VALUES ('delete', old.id, old.diagnostico, old.solucion_aplicada);
+    INSERT INTO diagnosticos_fts(rowid, diagnostico, solucion_aplicada)
+    VALUES (new.id, new.diagnostico, new.solucion_aplicada);
+END;
+"""
+
+_LOCK = threading.RLock()
+_con: Optional[sqlite3.Connection] = None
+_con_ruta: Optional[str] = None
+_fts = False
+
+def _conexion() -> sqlite3.Connection:
+    global _con, _con_ruta, _fts
+    with _LOCK:
+        if _con is not None and _con_ruta == DB_FILE:
+            return _con
+        if _con is not None:
+            _con.close()
+        _con = sqlite3.connect(DB_FILE, check_same_thread=False)
+        _con_ruta = DB_FILE
+        _con.execute("PRAGMA journal_mode=WAL")
+        _con.execute("PRAGMA synchronous=NORMAL")
+        _con.executescript(_ESQUEMA)
+        try:
+            _con.executescript(_ESQUEMA_FTS)
+            _fts = True
+        except sqlite3.OperationalError:
+            logger.warning("SQLite sin FTS5: la búsqueda de texto usará LIKE")
+            _fts = False
+        return _con
+
+def cerrar() -> None:
+    global _con, _con_ruta
+    with _LOCK:
+        if _con is not None:
+            _con.close()
+        _con = None
+        _con_ruta = None
+
+def _bool_sql(v: Any) -> Optional[int]:
+    return None if v is None else int(bool(v))
+
+def _fila(registro: Dict[str, Any]) -> tuple:
+    return (
+        registro.get("timestamp"), registro.get("severidad"), registro.get("gateway_ip"),
+        *(_bool_sql(registro.get(k)) for k in CLAVES_BOOL),
+        registro.get("latencia_ms"), registro.get("perdida_pct"),
+        registro.get("diagnostico"), registro.get("solucion_aplicada"),
+        json.dumps(registro, ensure_ascii=False),
+    )
+
+_INSERT = ("INSERT INTO diagnosticos (timestamp, severidad, gateway_ip, conexion, dns, gateway, puertos_http, "
+           "puertos_https, latencia_ms, perdida_pct, diagnostico, solucion_aplicada, datos) "
+           "VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)")
+
+def _registro(datos: str, solucion: Optional[str]) -> Dict[str, Any]:
+    it = json.loads(datos)
+    it["solucion_aplicada"] = solucion
+    return it
+
+def insertar(registro: Dict[str, Any]) -> None:
+    """
+    Inserta un registro ya completo (con diagnostico/timestamp).
+    """
+    con = _conexion()
+    with _LOCK, con:
+        con.execute(_INSERT, _fila(registro))
+
+def insertar_muchos(registros: Iterable[Dict[str, Any]]) -> int:
+    con = _conexion()
+    with _LOCK, con:
+        cur = con.executemany(_INSERT, (_fila(r) for r in registros))
+        return cur.rowcount
+
+def contar() -> int:
+    return _conexion().execute("SELECT COUNT(*) FROM diagnosticos").fetchone()[0]
+
+def leer_historial(limit: int = 100) -> List[Dict[str, Any]]:
+    filas = _conexion().execute(
+        "SELECT datos, solucion_aplicada FROM diagnosticos ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+    return [_registro(d, s) for d, s in reversed(filas)]
+
+def leer_pagina(limit: int = 50, cursor: Optional[int] = None):
+    """
+    Página de registros anteriores al id 'cursor' (None = los más recientes).
+    Devuelve (registros de más antiguo a más nuevo, cursor siguiente o None).
+    """
+    if cursor is None:
+        filas = _conexion().execute(
+            "SELECT id, datos, solucion_aplicada FROM diagnosticos ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+    else:
+        filas = _conexion().execute(
+            "SELECT id, datos, solucion_aplicada FROM diagnosticos WHERE id < ? ORDER BY id DESC LIMIT ?",
+            (cursor, limit)).fetchall()
+    if not filas:
+        return [], None
+    siguiente = filas[-1][0]
+    hay_mas = _conexion().execute("SELECT 1 FROM diagnosticos WHERE id < ? LIMIT 1", (siguiente,)).fetchone()
+    return [_registro(d, s) for _, d, s in reversed(filas)], (siguiente if hay_mas else None)
+
+def buscar_casos_similares(datos: Dict[str, Any], top_n: int = 3, min_score: float = 0.4,
+                           puntos_bool: List[float] = None) -> List[Dict[str, Any]]:
+    """
+    Igual que historial.buscar_casos_similares pero puntuando dentro de SQLite.
+    puntos_bool[m] es la puntuación acumulada con m coincidencias booleanas (la misma suma
+    en coma flotante que hace _score_similitud), para que los resultados coincidan exactamente.
+    """
+    params: List[Any] = []
+    coincidencias = []
+    for k in CLAVES_BOOL:
+        if k not in datos:
+            continue
+        if datos[k] is None:
+            # NULL en la columna es tanto None como clave ausente; sólo cuenta si estaba en el JSON
+            coincidencias.append(f"({k} IS NULL AND json_type(datos, '$.{k}') IS NOT NULL)")
+        else:
+            coincidencias.append(f"({k} IS ?)")
+            params.append(_bool_sql(datos[k]))
+    m = " + ".join(coincidencias) if coincidencias else "0"
+    casos_bool = " ".join(f"WHEN {i} THEN ?" for i in range(len(puntos_bool)))
+    expr = f"(CASE {m} {casos_bool} END)"
+    params += list(puntos_bool)
+
+    lat = datos.get("latencia_ms")
+    if lat is None:
+        expr += " + 0.05"
+    else:
+        expr += (" + (CASE WHEN latencia_ms IS NULL THEN 0.05 ELSE "
+                 "MAX(0.0, 0.25 * (1.0 - MIN(ABS(? - latencia_ms) / MAX(1.0, (? + latencia_ms) / 2.0), 1.0))) END)")
+        params += [lat, lat]
+    per = datos.get("perdida_pct")
+    if per is None:
+        expr += " + 0.02"
+    else:
+        expr += (" + (CASE WHEN perdida_pct IS NULL THEN 0.02 ELSE "
+                 "MAX(0.0, 0.15 * (1.0 - MIN(ABS(? - perdida_pct) / MAX(1.0, (? + perdida_pct) / 2.0), 1.0))) END)")
+        params += [per, per]
+
+    # Se ordenan solo (id, score); el JSON se lee únicamente para los top_n
+    sql = (f"WITH t AS (SELECT id, score FROM (SELECT id, MIN(1.0, {expr}) AS score FROM diagnosticos) "
+           f"WHERE score >= ? ORDER BY score DESC, id ASC LIMIT ?) "
+           f"SELECT d.datos, d.solucion_aplicada, t.score FROM t JOIN diagnosticos d ON d.id = t.id "
+           f"ORDER BY t.score DESC, t.id ASC")
+    params += [min_score, top_n]
+    filas = _conexion().execute(sql, params).fetchall()
+    return [dict(_registro(d, s), similitud=round(score, 3)) for d, s, score in filas]
+
+def aplicar_solucion_a_caso(caso: Dict[str, Any], solucion: str) -> None:
+    if "timestamp" not in caso:
+        return
+    con = _conexion()
+    with _LOCK, con:
+        con.execute(
+            "UPDATE diagnosticos SET solucion_aplicada = ? WHERE id = "
+            "(SELECT id FROM diagnosticos WHERE timestamp = ? ORDER BY id LIMIT 1)",
+            (solucion, caso["timestamp"]))
+
+def _consulta_fts(texto: str) -> str:
+    # Cada palabra como prefijo entre comillas (evita que el usuario escriba sintaxis FTS)
+    return " ".join('"' + t.replace('"', '""') + '"*' for t in texto.split())
+
+def buscar_historial(texto: str, limit: int = 50) -> List[Dict[str, Any]]:
+    """
+    Búsqueda de texto en diagnostico/solucion_aplicada (FTS5, por prefijo de palabra) y por
+    subcadena en diagnostico/timestamp/severidad. FTS no encuentra trozos del interior de una
+    palabra ('onexión'), así que el LIKE sobre diagnostico se mantiene para devolver lo mismo
+    que el historial JSONL. Devuelve los 'limit' casos más recientes que coinciden, del más
+    nuevo al más antiguo.
+    """
+    con = _conexion()
+    like = f"%{texto}%"
+    if _fts and texto.split():
+        sql = ("SELECT datos, solucion_aplicada FROM diagnosticos WHERE "
+               "id IN (SELECT rowid FROM diagnosticos_fts WHERE diagnosticos_fts MATCH ?) "
+               "OR diagnostico LIKE ? OR timestamp LIKE ? OR severidad LIKE ? ORDER BY id DESC LIMIT ?")
+        params = (_consulta_fts(texto), like, like, like, limit)
+    else:
+        sql = ("SELECT datos, solucion_aplicada FROM diagnosticos WHERE diagnostico LIKE ? "
+               "OR timestamp LIKE ? OR severidad LIKE ? ORDER BY id DESC LIMIT ?")
+        params = (like, like, like, limit)
+    return [_registro(d, s) for d, s in con.execute(sql, params).fetchall()]
@@ -0,0 +1,195 @@
+# storage/indice_firmas.py
+import bisect
+from typing import Dict, Any, List, Tuple, Callable
+
+"""
+Índice por firmas para la recuperación de casos (búsqueda acotada en lugar de recorrido completo).
+Los hechos booleanos de _score_similitud forman una firma (32 combinaciones si todos son bool);
+cada cubeta agrupa los registros de una firma y mantiene latencia y pérdida ordenadas.
+Para una consulta:
+- la parte booleana de la puntuación es la misma para toda la cubeta, así que se calcula una
+  cota superior por cubeta y se descartan las que no alcanzan min_score o el top-n actual;
+- dentro de una cubeta se recorre hacia fuera desde la latencia (o pérdida) de la consulta:
+  el término de latencia no crece al alejarse, por lo que se corta en cuanto la cota cae.
+La puntuación final de cada candidato la calcula la misma función que usa historial,
+así que el resultado es idéntico al recorrido completo (empates por orden de inserción).
+"""
+
+# Margen para que un redondeo en la cota nunca descarte un empate
+_EPS = 1e-9
+
+# Códigos de los hechos booleanos en la firma
+_AUSENTE, _FALSO, _VERDADERO, _NULO, CODIGO_OTRO = -1, 0, 1, 2, 3
+
+def codificar_hecho(registro: Dict[str, Any], clave: str) -> int:
+    if clave not in registro:
+        return _AUSENTE
+    v = registro[clave]
+    if v is None:
+        return _NULO
+    if v is True or v is False or v in (0, 1):
+        return _VERDADERO if v else _FALSO
+    return CODIGO_OTRO
+
+def _termino(q: float, x: float, peso: float) -> float:
+    diff = abs(q - x) / max(1.0, (q + x) / 2.0)
+    return max(0.0, peso * (1.0 - min(diff, 1.0)))
+
+class _Cubeta:
+    __slots__ = ("firma", "seqs", "por_lat", "por_per", "sin_lat", "sin_lat_por_per", "sin_lat_sin_per", "sin_per")
+
+    def __init__(self, firma: Tuple[int, ...]):
+        self.firma = firma
+        self.seqs: List[int] = []                          # todos, en orden de inserción
+        self.por_lat: List[Tuple[float, int]] = []         # (latencia, seq) ordenado
+        self.por_per: List[Tuple[float, int]] = []         # (pérdida, seq) ordenado
+        self.sin_lat: List[int] = []                       # sin latencia, en orden de inserción
+        self.sin_lat_por_per: List[Tuple[float, int]] = [] # sin latencia, ordenado por pérdida
+        self.sin_lat_sin_per: List[int] = []
+        self.sin_per: List[int] = []
+
+    def agregar(self, seq: int, lat: Any, per: Any, ordenar: bool = True) -> None:
+        if not ordenar:
+            # Carga masiva: se añade al final y se ordena una sola vez en ordenar()
+            self.seqs.append(seq)
+            if lat is not None:
+                self.por_lat.append((lat, seq))
+            else:
+                self.sin_lat.append(seq)
+                if per is not None:
+                    self.sin_lat_por_per.append((per, seq))
+                else:
+                    self.sin_lat_sin_per.append(seq)
+            if per is not None:
+                self.por_per.append((per, seq))
+            else:
+                self.sin_per.append(seq)
+            return
+        self.seqs.append(seq)
+        if lat is not None:
+            bisect.insort(self.por_lat, (lat, seq))
+        else:
+            self.sin_lat.append(seq)
+            if per is not None:
+                bisect.insort(self.sin_lat_por_per, (per, seq))
+            else:
+                self.sin_lat_sin_per.append(seq)
+        if per is not None:
+            bisect.insort(self.por_per, (per, seq))
+        else:
+            self.sin_per.append(seq)
+
+    def ordenar(self) -> None:
+        self.por_lat.sort()
+        self.por_per.sort()
+        self.sin_lat_por_per.sort()
+
+class IndiceFirmas:
+    """
+    Registros agrupados por firma booleana; se actualiza de forma incremental con agregar().
+    """
+
+    def __init__(self, claves_bool: List[str], puntos_bool: List[float],
+                 puntuar: Callable[[Dict[str, Any], Dict[str, Any]], float]):
+        self.claves_bool = list(claves_bool)
+        self._puntos_bool = list(puntos_bool)
+        self._puntuar = puntuar
+        self._cubetas: Dict[Tuple[int, ...], _Cubeta] = {}
+        self.registros: List[Dict[str, Any]] = []
+
+    def __len__(self) -> int:
+        return len(self.registros)
+
+    def agregar(self, registro: Dict[str, Any], _ordenar: bool = True) -> None:
+        seq = len(self.registros)
+        firma = tuple(codificar_hecho(registro, k) for k in self.claves_bool)
+        cub = self._cubetas.get(firma)
+        if cub is None:
+            cub = self._cubetas[firma] = _Cubeta(firma)
+        lat, per = registro.get("latencia_ms"), registro.get("perdida_pct")
+        cub.agregar(seq, None if lat is None else float(lat), None if per is None else float(per), _ordenar)
+        self.registros.append(registro)
+
+    def agregar_muchos(self, registros) -> None:
+        for r in registros:
+            self.agregar(r, _ordenar=False)
+        for cub in self._cubetas.values():
+            cub.ordenar()
+
+    def buscar(self, datos: Dict[str, Any], top_n: int = 3, min_score: float = 0.4) -> List[Tuple[float, Dict[str, Any]]]:
+        """
+        Top-n (puntuación, registro) con puntuación >= min_score, igual que ordenar todo el historial.
+        """
+        if top_n <= 0 or not self.registros:
+            return []
+        consulta = [(j, codificar_hecho(datos, k)) for j, k in enumerate(self.claves_bool) if k in datos]
+        q_lat, q_per = datos.get("latencia_ms"), datos.get("perdida_pct")
+        cota_per = 0.02 if q_per is None else 0.15
+
+        cubetas = []
+        for firma, cub in self._cubetas.items():
+            b = self._puntos_bool[sum(1 for j, c in consulta if firma[j] == c)]
+            cota_lat = 0.05 if q_lat is None or not cub.por_lat else 0.25
+            cubetas.append((min(1.0, b + cota_lat + cota_per), b, cub))
+        cubetas.sort(key=lambda x: -x[0])
+
+        mejores: List[Tuple[float, int]] = []  # (-score, seq) ordenado
+
+        def umbral() -> float:
+            return -mejores[-1][0] if len(mejores) >= top_n else min_score
+
+        def considerar(seq: int) -> None:
+            s = self._puntuar(datos, self.registros[seq])
+            if s < min_score:
+                return
+            clave = (-s, seq)
+            if len(mejores) >= top_n and clave >= mejores[-1]:
+                return
+            bisect.insort(mejores, clave)
+            del mejores[top_n:]
+
+        def recorrer(ordenada: List[Tuple[float, int]], q: float, peso: float, base: float, resto: float) -> None:
+            # Desde la posición de q hacia ambos lados; el término sólo decrece al alejarse
+            if q < 0:
+                for _, seq in ordenada:
+                    considerar(seq)
+                return
+            medio = bisect.bisect_left(ordenada, (q, -1))
+            for paso, inicio in ((-1, medio - 1), (1, medio)):
+                i = inicio
+                while 0 <= i < len(ordenada):
+                    x, seq = ordenada[i]
+                    if x >= 0 and base + _termino(q, x, peso) + resto < umbral() - _EPS:
+                        break
+                    considerar(seq)
+                    i += paso
+
+        def constantes(seqs: List[int], cota: float) -> None:
+            # Misma puntuación máxima para todos: sólo los de menor seq pueden entrar
+            if cota < umbral() - _EPS:
+                return
+            for seq in seqs[:top_n]:
+                considerar(seq)
+
+        for cota, b, cub in cubetas:
+            if cota < umbral() - _EPS:
+                break
+            if CODIGO_OTRO in cub.firma:
+                # Valores no booleanos: la parte booleana puede variar dentro de la cubeta
+                for seq in cub.seqs:
+                    considerar(seq)
+                continue
+            if q_lat is not None:
+                recorrer(cub.por_lat, q_lat, 0.25, b, cota_per)
+                if q_per is not None:
+                    recorrer(cub.sin_lat_por_per, q_per, 0.15, b + 0.05, 0.0)
+                    constantes(cub.sin_lat_sin_per, b + 0.05 + 0.02)
+                else:
+                    constantes(cub.sin_lat, b + 0.05 + 0.02)
+            elif q_per is not None:
+                recorrer(cub.por_per, q_per, 0.15, b + 0.05, 0.0)
+                constantes(cub.sin_per, b + 0.05 + 0.02)
+            else:
+                constantes(cub.seqs, b + 0.05 + 0.02)
+
+        return [(-s, self.registros[seq]) for s, seq in mejores]
@@ -8,9 +8,13 @@ from storage.historial import leer_historial
 import pprint
 from sistema_experto_conectividad.motor_inferencia import engine
 from sistema_experto_conectividad.storage.historial import leer_historial
+from sistema_experto_conectividad.motor_inferencia import flota
+from sistema_experto_conectividad.base_de_conocimiento import cargador_reglas
+from sistema_experto_conectividad.motor_inferencia import sesion
 
 
-def menu_interactivo():
+def menu_interactivo(concurrente: bool = False, perezoso: bool = False, presupuesto: float = None,
+                     ping_adaptativo: bool = False):
     while True:
         print("\n--- SISTEMA EXPERTO DE CONECTIVIDAD ---")
         print("1) Ejecutar diagnóstico automático")
@@ -20,7 +24,8 @@ def menu_interactivo():
         if o == "1":
             gateway = input("Introduce IP del gateway (default 192.168.1.1): ").strip() or "192.168.1.1"
             print("\nEjecutando diagnóstico... (puede tardar unos segundos)")
-            resultado = engine.diagnosticar_y_registrar(gateway)
+            resultado = engine.diagnosticar_y_registrar(gateway, concurrente=concurrente, perezoso=perezoso,
+                                                        presupuesto=presupuesto, ping_adaptativo=ping_adaptativo)
             print("\n=== RESULTADO ===")
             pprint.pprint(resultado)
             print("=================")
@@ -37,15 +42,60 @@ def menu_interactivo():
         else:
             print("Opción inválida.")
 
+def modo_flota(ruta: str, concurrencia: int, registrar: bool):
+    objetivos = flota.cargar_objetivos(ruta)
+    print(f"Diagnosticando {len(objetivos)} objetivos (concurrencia={concurrencia})...")
+    ultimo = None
+    for res in flota.diagnosticar_flota(objetivos, concurrencia=concurrencia, registrar=registrar):
+        prog = res["flota"]
+        print(f"[{prog['completados']}/{prog['total']}] {res['objetivo']['nombre']} "
+              f"({res['duracion_ms']:.0f} ms) | {res.get('diagnostico')}")
+        ultimo = prog
+    if ultimo:
+        print(f"\nCompletado en {ultimo['transcurrido_s']} s — {ultimo['objetivos_por_s']} objetivos/s")
+
+def modo_monitor(gateway: str, intervalo: float):
+    print(f"Monitorizando {gateway or 'gateway detectado'} cada {intervalo} s (Ctrl+C para salir)...")
+    try:
+        for datos, delta in sesion.monitorizar(gateway, intervalo=intervalo):
+            if not delta["cambio"]:
+                continue
+            for m in delta["eliminados"]:
+                print(f"  - {m}")
+            for m in delta["agregados"]:
+                print(f"  + {m}")
+    except KeyboardInterrupt:
+        print("Monitorización detenida.")
+
 def main():
     parser = argparse.ArgumentParser(prog="red-expert")
     parser.add_argument("--auto", action="store_true", help="Ejecuta una prueba rápida con gateway por defecto")
+    parser.add_argument("--concurrente", action="store_true", help="Lanza las pruebas de red en paralelo")
+    parser.add_argument("--perezoso", action="store_true", help="Ejecuta sólo las pruebas que pueden cambiar el diagnóstico")
+    parser.add_argument("--presupuesto", type=float, metavar="SEGUNDOS", help="Tiempo máximo del diagnóstico (resultado parcial si se agota)")
+    parser.add_argument("--ping-adaptativo", action="store_true", help="Pings hasta que pérdida y latencia tienen intervalos de confianza estrechos")
+    parser.add_argument("--flota", metavar="ARCHIVO", help="Diagnostica todos los objetivos del archivo (.json o texto)")
+    parser.add_argument("--concurrencia", type=int, default=flota.DEFAULT_CONCURRENCIA, help="Objetivos en vuelo (modo flota)")
+    parser.add_argument("--registrar", action="store_true", help="Guarda en el historial cada resultado de la flota")
+    parser.add_argument("--reglas", metavar="RUTA", help="Reglas extra en JSON/TOML (archivo o directorio); se recargan al cambiar")
+    parser.add_argument("--monitor", type=float, metavar="SEGUNDOS", help="Diagnostica en bucle y muestra sólo los cambios")
+    parser.add_argument("--gateway", help="IP del gateway (modo monitor; por defecto se detecta)")
     args = parser.parse_args()
-    if args.auto:
-        resultado = engine.diagnosticar_y_registrar("192.168.1.1")
+    if args.reglas:
+        cargador_reglas.vigilar(args.reglas)
+        print(f"Reglas de {args.reglas}: {cargador_reglas.activo().estadisticas()}")
+    if args.monitor:
+        modo_monitor(args.gateway, args.monitor)
+    elif args.flota:
+        modo_flota(args.flota, args.concurrencia, args.registrar)
+    elif args.auto:
+        resultado = engine.diagnosticar_y_registrar("192.168.1.1", concurrente=args.concurrente,
+                                                    perezoso=args.perezoso, presupuesto=args.presupuesto,
+                                                    ping_adaptativo=args.ping_adaptativo)
         import pprint; pprint.pprint(resultado)
     else:
-        menu_interactivo()
+        menu_interactivo(concurrente=args.concurrente, perezoso=args.perezoso, presupuesto=args.presupuesto,
+                         ping_adaptativo=args.ping_adaptativo)
 
 if __name__ == "__main__":
     main()
@@ -844,7 +844,8 @@ class ModernApp(tk.Tk):
         try:
             datos = engine.diagnosticar_y_registrar(
                 gateway_ip=gw,
-                auto_detect_gateway=auto
+                auto_detect_gateway=auto,
+                concurrente=True
             )
             self._last_diagnosis = datos
             logging.info("Diagnóstico recibido, preparando mostrar resultados")
@@ -1113,33 +1114,27 @@ class ModernApp(tk.Tk):
         self.list_hist.delete(0, 'end')
         
         try:
-            if not hasattr(self, '_history_items'):
-                items = historial.leer_historial(50)
-                self._history_items = list(reversed(items))
-                
+            # La búsqueda la resuelve el backend del historial (FTS en SQLite)
+            self._history_items = historial.buscar_historial(search_text, 50)
+
             for item in self._history_items:
                 timestamp = item.get('timestamp', '')
                 diagnostico = item.get('diagnostico', '')
                 severidad = item.get('severidad', '')
 
-                # Buscar en todos los campos
-                if (search_text in timestamp.lower() or 
-                    search_text in diagnostico.lower() or 
-                    search_text in severidad.lower()):
+                entry = f"[{timestamp[:19]}] {severidad} | {diagnostico[:60]}..."
+                self.list_hist.insert('end', entry)
+                try:
+                    idx = self.list_hist.size() - 1
+                    if 'crítico' in severidad.lower():
+                        self.list_hist.itemconfig(idx, fg=COLORS['error'])
+                    elif 'moderado' in severidad.lower():
+                        self.list_hist.itemconfig(idx, fg=COLORS['warning'])
+                    else:
+                        self.list_hist.itemconfig(idx, fg=COLORS['success'])
+                except Exception:
+                    logging.exception("No se pudo aplicar color al historial (filtro)")
 
-                    entry = f"[{timestamp[:19]}] {severidad} | {diagnostico[:60]}..."
-                    self.list_hist.insert('end', entry)
-                    try:
-                        idx = self.list_hist.size() - 1
-                        if 'crítico' in severidad.lower():
-                            self.list_hist.itemconfig(idx, fg=COLORS['error'])
-                        elif 'moderado' in severidad.lower():
-                            self.list_hist.itemconfig(idx, fg=COLORS['warning'])
-                        else:
-                            self.list_hist.itemconfig(idx, fg=COLORS['success'])
-                    except Exception:
-                        logging.exception("No se pudo aplicar color al historial (filtro)")
-                        
         except Exception as e:
             print(f"Error filtrando historial: {e}")
             